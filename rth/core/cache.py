@@ -0,0 +1,200 @@
+import os
+import json
+import pickle
+import hashlib
+from collections import OrderedDict
+## @package cache
+#
+#  The package of the cache of the results of the Dispatcher, keyed by the network they were calculated from.
+
+
+class ResultCache:
+    """
+    Cache of the results of Dispatcher.execute
+
+    The subnetworks, routers and links data, with the options that change the results, are turned into a canonical JSON
+    document whose SHA-256 digest is the key of the results. The order of the data is part of it: the UIDs, and thus
+    the hops, follow the order in which the subnetworks, routers and links are given.
+
+    The results are kept pickled in two tiers: a few in memory, the least recently used going first, and optionally
+    more in a directory, the least recently used files going first when the directory grows over its size limit. A
+    result found on disk is brought back in memory.
+    """
+
+    ## The pickled results kept in memory, keyed by digest, the least recently used first
+    memory = None
+
+    ## The extension of the result files
+    extension = '.pickle'
+
+    ## The version of the layout of the pickled results, part of the digests. To increase whenever the classes of the
+    #  results (RoutingTable, PredecessorHops...) change, so that older result files are never read
+    format_version = 1
+
+    def __init__(self, directory=None, memory_size=32, disk_size=256 * 2 ** 20):
+        """
+        Init
+
+        Args:
+            directory: The directory of the result files, created if needed. None means no disk tier
+            memory_size: The number of results kept in memory
+            disk_size: The maximum size of the result files, in bytes
+        """
+
+        self.directory = directory
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self.memory = OrderedDict()
+        self.memory_hits, self.disk_hits, self.misses = 0, 0, 0
+
+    @staticmethod
+    def digest(subnetworks, routers, links, **options):
+        """
+        Get the key of a network
+
+        Names are compared as strings, like in the virtual network. The format version of the results is part of the
+        key.
+
+        Args:
+            subnetworks: The subnetworks data
+            routers: The routers data
+            links: The links data
+            **options: The options the results depend on (engine, hops storage...)
+
+        Returns:
+            The SHA-256 hexadecimal digest of the canonical network
+        """
+
+        document = {
+            'subnets': [[str(name), subnetworks[name]] for name in subnetworks],
+            'routers': [[str(name), routers[name]] for name in routers],
+            'links': [[str(router), [[str(subnet), links[router][subnet]] for subnet in links[router]]]
+                      for router in links],
+            'options': {key: options[key] for key in sorted(options)},
+            'format': ResultCache.format_version
+        }
+
+        canonical = json.dumps(document, separators=(',', ':'), ensure_ascii=True)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def path(self, digest):
+        """
+        Args:
+            digest: The key of a result
+
+        Returns:
+            The path of its file
+        """
+
+        return os.path.join(self.directory, digest + self.extension)
+
+    def get(self, digest):
+        """
+        Get a result
+
+        Args:
+            digest: The key of the result
+
+        Returns:
+            A new copy of the result, or None if it is not cached
+        """
+
+        data = self.memory.get(digest)
+        if data is not None:
+            self.memory_hits += 1
+            self.memory.move_to_end(digest)
+            return pickle.loads(data)
+
+        if self.directory is not None:
+            try:
+                with open(self.path(digest), 'rb') as f:
+                    data = f.read()
+                result = pickle.loads(data)
+            except FileNotFoundError:
+                pass
+            except Exception:
+                # e.g. a file cut short, or written with classes that changed since: it is calculated again
+                self.__remove(self.path(digest))
+            else:
+                self.disk_hits += 1
+                os.utime(self.path(digest))
+                self.__remember(digest, data)
+                return result
+
+        self.misses += 1
+        return None
+
+    def put(self, digest, result):
+        """
+        Stores a result
+
+        Args:
+            digest: The key of the result
+            result: The result, any picklable object
+        """
+
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self.__remember(digest, data)
+
+        if self.directory is not None:
+            # written aside, then moved, so that a file is never seen half-written
+            temporary = f"{self.path(digest)}.{os.getpid()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, self.path(digest))
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used result files until they fit in the size limit
+        """
+
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(file[1] for file in files)
+        for _, file_size, path in sorted(files):
+            if size <= self.disk_size:
+                break
+            self.__remove(path)
+            size -= file_size
+
+    def cache_info(self):
+        """
+        Returns:
+            The hits of each tier, the misses and the number of results kept in memory, as a dictionary
+        """
+
+        return {'memory_hits': self.memory_hits, 'disk_hits': self.disk_hits, 'misses': self.misses,
+                'memory_size': self.memory_size, 'size': len(self.memory)}
+
+    def clear(self):
+        """
+        Empties both tiers, the hits and misses counters are kept
+        """
+
+        self.memory.clear()
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(self.extension):
+                    self.__remove(entry.path)
+
+    def __remember(self, digest, data):
+        self.memory[digest] = data
+        self.memory.move_to_end(digest)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -1,8 +1,20 @@
+import os
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from rth.virtual_building.network_creator import NetworkCreator
 from rth.virtual_building.ants import AntsDiscovery
+from rth.virtual_building.matrix_discovery import MatrixDiscovery
+from rth.virtual_building.hops import PredecessorHops, LazyHops
 from rth.virtual_building.routing_tables_generator import RoutingTablesGenerator
-from .errors import WronglyFormedSubnetworksData, WronglyFormedRoutersData, WronglyFormedLinksData
-from nettools.utils.ip_class import FourBytesLiteral
+from .stats import Stats
+from .errors import WronglyFormedSubnetworksData, WronglyFormedRoutersData, WronglyFormedLinksData, \
+    UnreachableNetwork, MasterRouterError, NameNotFound
+from rth.virtual_building.ipv4 import ip_to_int
+from rth.virtual_building.route_lookup import RouteTrie
+from rth.virtual_building.route_export import exporters
+from rth.virtual_building.route_compression import compress, equivalent
+from rth.virtual_building.connectivity import raise_if_disconnected
 
 ## @package dispatcher
 #
@@ -25,30 +37,93 @@ class Dispatcher:
     ## Whether the program has been entirely executed and processed (used for display and output functions)
     __executed = None
 
+    ## The discovery (AntsDiscovery or MatrixDiscovery) instance, kept to follow the changes of the network
+    __discovery_instance = None
+    ## The RoutingTablesGenerator instance, kept to follow the changes of the network
+    __generator_instance = None
+
+    ## The cache of the results (ResultCache instance), if any
+    cache = None
+    ## The raw output of the network, when the results come from the cache instead of the virtual network
+    __cached_network_output = None
+
+    ## The timings and counters of the process (Stats instance), see stats
+    __stats = None
+
+    ## The compiled routing tables used by lookup, with the routing tables they were compiled from, keyed by router name
+    __route_tries = None
+
     subnetworks, routers, links = None, None, None
     equitemporality = None
+    ## The number of processes used to calculate the hops and the routing tables
+    workers = 1
+    ## Whether the routing tables are only calculated when asked for (see iter_routing_tables and routing_table)
+    defer_routing_tables = False
 
     gend_subnetworks, gend_routers, gend_routers_names = None, None, None
+    gend_subnetworks_names = None
     hops = None
 
-    ## The raw routing tables returned by the RoutingTablesGenerator instance
+    ## The routing tables returned by the RoutingTablesGenerator instance (RoutingTable instances, read like
+    #  dictionaries), indexed by router UID. Deferred ones are None until calculated
     routing_tables = None
-    ## The formatted routing tables, prepared for either display or output (with i.e. names instead of IDs)
+    ## The same routing tables, keyed by router name, prepared for either display or output
     formatted_raw_routing_tables = None
 
-    def __init__(self, debug=False):
+    ## The available hops discovery engines
+    engines = ('ants', 'numpy')
+
+    ## The size of the buffer of output_routing_tables, in bytes
+    output_buffer_size = 1 << 20
+
+    def __init__(self, debug=False, max_ants=None, engine='ants', hops_storage='dict', hops_cache_size=256,
+                 cache=None, trace_memory=False, tracer=None):
         """
         The init function
 
         Args:
             debug: Triggers the whole debug system if set to True
+            max_ants: The maximum number of ants allowed at once during the Ants process. None (the default) means
+                no limit
+            engine: The engine used to discover the hops, either 'ants' (the default) or 'numpy' (vectorized, requires
+                numpy)
+            hops_storage: How the hops are stored. Either 'dict' (the default, a dictionary of paths), 'array' or
+                'numpy' (compact storage, one predecessor array per starting subnetwork, with paths rebuilt on demand),
+                or 'lazy' (paths calculated on first access, and kept in a cache. Only with the 'ants' engine)
+            hops_cache_size: With lazy hops, the number of starting subnetworks whose paths are kept in the cache. None
+                means no limit
+            cache: A ResultCache instance, to reuse the results of networks already executed. Not used with lazy hops
+            trace_memory: Whether to measure the peak memory of each stage of the process with tracemalloc (see
+                stats). Slows the process down
+            tracer: A tracer receiving the events of the ants discoveries (see rth.virtual_building.tracing), e.g. a
+                JsonlTracer or a BinaryTracer writing them to a trace file. Only with the 'ants' engine. The hops are
+                then always calculated by a single process
+
+        Raises:
+            ValueError: if the engine or the hops storage is unknown, or if lazy hops are used with the numpy engine
         """
 
+        if engine not in self.engines:
+            raise ValueError(f"Unknown engine '{engine}'. Available engines: {', '.join(self.engines)}")
+        if hops_storage not in ('dict', 'lazy') and hops_storage not in PredecessorHops.storages:
+            raise ValueError(f"Unknown hops storage '{hops_storage}'. Available storages: dict, lazy, "
+                             f"{', '.join(PredecessorHops.storages)}")
+        if hops_storage == 'lazy' and engine == 'numpy':
+            raise ValueError("Lazy hops are only available with the 'ants' engine")
+
         self.__virtual_network_instance = NetworkCreator()
         self.debug = debug
+        self.tracer = tracer
+        self.max_ants = max_ants
+        self.engine = engine
+        self.hops_storage = hops_storage
+        self.hops_cache_size = hops_cache_size
+        self.cache = cache
+        self.__stats = Stats(trace_memory)
+        self.__route_tries = {}
         self.__executed = False
 
-    def execute(self, subnetworks, routers, links, equitemporality=True):
+    def execute(self, subnetworks, routers, links, equitemporality=True, workers=1, defer_routing_tables=False):
         """
         Function that triggers everything
 
@@ -57,17 +132,72 @@ class Dispatcher:
             routers: The routers data
             links: The links data
             equitemporality: Whether to switch equitemporality on or off (for now, is always to True)
+            workers: The number of processes used to calculate the hops and the routing tables. None means as many as
+                there are CPUs. Small networks are always processed by a single process
+            defer_routing_tables: Whether to only calculate the hops, the routing tables being calculated when asked
+                for (see iter_routing_tables and routing_table). Always the case with lazy hops
 
+        With a cache, the results of a network already executed are read from it, and the virtual network is only
+        built if the network is then changed. Deferred routing tables are not cached.
         """
 
         self.subnetworks = subnetworks
         self.routers = routers
         self.links = links
+        self.workers = workers
+        self.defer_routing_tables = defer_routing_tables or self.hops_storage == 'lazy'
 
         self.equitemporality = True  # TODO: Do not forget to replace with equitemporality param
-        self.__flow()
+        self.__stats = Stats(self.__stats.trace_memory)
+
+        if self.cache is None or self.defer_routing_tables:
+            self.__flow()
+        else:
+            self.__cached_flow()
         self.__executed = True
 
+    def __cached_flow(self):
+        """
+        Flow function, reading the results from the cache when they are in it, and storing them when they are not
+        """
+
+        with self.__stats.measure('cache_lookup'):
+            self.__checks()
+            digest = self.cache.digest(self.subnetworks, self.routers, self.links, engine=self.engine,
+                                       hops_storage=self.hops_storage)
+            result = self.cache.get(digest)
+
+        if result is not None:
+            self.hops = result['hops']
+            self.routing_tables = result['routing_tables']
+            self.gend_subnetworks_names = result['subnets_names']
+            self.gend_routers_names = result['routers_names']
+            self.formatted_raw_routing_tables = {self.gend_routers_names[i]: self.routing_tables[i]
+                                                 for i in range(len(self.routing_tables))
+                                                 if self.routing_tables[i] is not None}
+            self.__cached_network_output = result['network_raw_output']
+            return
+
+        self.__flow()
+        self.cache.put(digest, {
+            'hops': self.hops,
+            'routing_tables': self.routing_tables,
+            'subnets_names': self.gend_subnetworks_names,
+            'routers_names': self.gend_routers_names,
+            'network_raw_output': self.__virtual_network_instance.network_raw_output()
+        })
+
+    def __build_from_cache(self):
+        """
+        Builds the virtual network, hops and routing tables of results read from the cache, so that they can be changed
+        """
+
+        if self.__cached_network_output is None:
+            return
+
+        self.__cached_network_output = None
+        self.__flow()
+
     def __flow(self):
         """
         Flow function
@@ -76,10 +206,48 @@ class Dispatcher:
         It is detached from the execute function for more readability
         """
 
-        self.__checks()
-        self.__build_virtual_network()
-        self.__discover_hops()
-        self.__calculate_routing_tables()
+        with self.__stats.measure('checks'):
+            self.__checks()
+        with self.__stats.measure('virtual_network'):
+            self.__build_virtual_network()
+        with self.__stats.measure('hops'):
+            self.__discover_hops()
+        with self.__stats.measure('routing_tables'):
+            self.__calculate_routing_tables()
+
+    @property
+    def stats(self):
+        """
+        The timings and counters of the process, since the last execution
+
+        The stages measured are 'checks', 'virtual_network', 'hops' and 'routing_tables' (or 'cache_lookup' when the
+        results are read from the cache), and 'change' for the changes of the network. The CPU time of a stage includes
+        the worker processes it ran (see Stats). The counters are read when the stats are asked for: the subnetworks
+        and routers, the discoveries run, the ants spawned, the largest frontier, the hops found, the routing tables
+        calculated, and the hits and misses of the caches.
+
+        Returns:
+            A snapshot of the stats, as a new Stats instance. Use as_dict or to_prometheus to export it
+        """
+
+        stats = self.__stats.copy()
+        counters = stats.counters
+        if self.gend_subnetworks_names is not None:
+            counters['subnetworks'] = sum(name is not None for name in self.gend_subnetworks_names)
+            counters['routers'] = sum(name is not None for name in self.gend_routers_names)
+        if self.__discovery_instance is not None:
+            counters.update(self.__discovery_instance.counters)
+        if self.routing_tables is not None:
+            counters['routing_tables'] = sum(routing_table is not None for routing_table in self.routing_tables)
+        if self.cache is not None:
+            info = self.cache.cache_info()
+            counters['result_cache_hits'] = info['memory_hits'] + info['disk_hits']
+            counters['result_cache_misses'] = info['misses']
+        if isinstance(self.hops, LazyHops):
+            info = self.hops.cache_info()
+            counters['hops_cache_hits'], counters['hops_cache_misses'] = info['hits'], info['misses']
+
+        return stats
 
     def __checks(self):
         """
@@ -97,7 +265,7 @@ class Dispatcher:
             v = s[name]
             try:
                 ip, _ = v.split("/")
-                FourBytesLiteral().set_from_string_literal(ip)
+                ip_to_int(ip)
             except:
                 raise WronglyFormedSubnetworksData()
 
@@ -145,65 +313,537 @@ class Dispatcher:
 
         self.gend_subnetworks = inst.subnetworks
         self.gend_routers = inst.routers
+        self.gend_subnetworks_names = inst.subnets_names
         self.gend_routers_names = inst.routers_names
 
+    def addresses_usage(self):
+        """
+        Get the usage of the host addresses of the subnetworks
+
+        Returns:
+            The number of host addresses, of the used and free ones, and the share of the used ones, keyed by
+            subnetwork name. None if the network has not been executed yet
+        """
+
+        if not self.__executed:
+            return None
+        self.__build_from_cache()
+
+        usage = self.__virtual_network_instance.addresses_usage()
+        return {self.gend_subnetworks_names[uid]: usage[uid] for uid in usage}
+
     def network_raw_output(self):
         """
         Outputs the raw network
         """
 
-        return self.__virtual_network_instance.network_raw_output() if self.__executed else None
+        if not self.__executed:
+            return None
+        if self.__cached_network_output is not None:
+            return self.__cached_network_output
+
+        return self.__virtual_network_instance.network_raw_output()
 
     def __discover_hops(self):
         """
         AntsDiscovery related
 
-        Takes the prepared virtual network and runs the Ants process to create virtual links between the subnetworks
-        and routers.
+        Takes the prepared virtual network and runs the Ants process (or its numpy counterpart, depending on the
+        engine) to create virtual links between the subnetworks and routers.
         """
 
-        ants_inst = AntsDiscovery(self.gend_subnetworks, self.gend_routers, self.equitemporality, debug=self.debug)
+        if self.engine == 'numpy':
+            ants_inst = MatrixDiscovery(self.gend_subnetworks, self.gend_routers, self.equitemporality,
+                                        debug=self.debug, hops_storage=self.hops_storage)
+        else:
+            ants_inst = AntsDiscovery(self.gend_subnetworks, self.gend_routers, self.equitemporality,
+                                      debug=self.debug, max_ants=self.max_ants, hops_storage=self.hops_storage,
+                                      cache_size=self.hops_cache_size, tracer=self.tracer)
 
         ants_inst.sweep_network()
-        ants_inst.calculate_hops()
+        ants_inst.calculate_hops(workers=self.workers)
 
         self.links = ants_inst.links
         self.hops = ants_inst.hops
+        self.__discovery_instance = ants_inst
 
     def __calculate_routing_tables(self):
         """
         RoutingTablesGenerator related
 
-        Generates the routing tables based on the paths ("hops") found by the Ants process.
+        Generates the routing tables based on the paths ("hops") found by the Ants process. Deferred routing tables
+        are only generated when asked for (see iter_routing_tables and routing_table).
         """
 
-        if not self.links or self.hops:
+        if not self.links or not self.hops:
             self.__discover_hops()
 
         rtg_inst = RoutingTablesGenerator(self.__virtual_network_instance, self.gend_subnetworks, self.gend_routers,
-                                          self.links, self.hops, equitemporality=self.equitemporality)
+                                          self.links, self.hops, equitemporality=self.equitemporality,
+                                          on_demand=self.defer_routing_tables)
+        self.__generator_instance = rtg_inst
+
+        if self.defer_routing_tables:
+            self.routing_tables = [None] * len(self.gend_routers_names)
+            self.formatted_raw_routing_tables = {}
+            return
 
-        # getting routing tables
+        rtg_inst.build_next_hops(workers=self.workers)
+
+        # getting routing tables, None for the UIDs of removed routers
         routing_tables = []
-        for i in range(len(self.routers)):
-            routing_tables.append(rtg_inst.get_routing_table(i))
+        for i in range(len(self.gend_routers_names)):
+            routing_tables.append(rtg_inst.get_routing_table(i) if i in self.gend_routers else None)
 
         self.routing_tables = routing_tables
 
-        # formatting them to be displayed
+        # keyed by name to be displayed
         final = {}
-        for i in range(len(self.routers)):
-            name = self.gend_routers_names[i]
-            final[name] = routing_tables[i]
-
-        # reformatting final table to print in strings the router IP instead of having a FBL instance
-        for router in final:
-            for key in final[router]:
-                final[router][key]['gateway'] = str(final[router][key]['gateway'])
-                final[router][key]['interface'] = str(final[router][key]['interface'])
+        for i in range(len(routing_tables)):
+            if routing_tables[i] is not None:
+                final[self.gend_routers_names[i]] = routing_tables[i]
 
         self.formatted_raw_routing_tables = final
 
+    def routing_table(self, router_name):
+        """
+        Get the routing table of a router
+
+        Deferred routing tables are calculated on the first call, from the hops of the subnetworks attached to the
+        router only, and kept.
+
+        Args:
+            router_name: The name of the router
+
+        Returns:
+            The formatted routing table
+
+        Raises:
+            NameNotFound: if the router does not exist
+            Exception: if the network has not been executed yet
+        """
+
+        if self.formatted_raw_routing_tables and str(router_name) in self.formatted_raw_routing_tables:
+            return self.formatted_raw_routing_tables[str(router_name)]
+
+        router = self.__uid('router', router_name)
+
+        if self.routing_tables[router] is None:
+            routing_table = self.__generator_instance.get_routing_table(router)
+            self.routing_tables[router] = routing_table
+            self.formatted_raw_routing_tables[self.gend_routers_names[router]] = routing_table
+
+        return self.routing_tables[router]
+
+    def lookup(self, router_name, ip):
+        """
+        Get the route a router uses to reach an address
+
+        The routing table of the router is compiled on the first lookup (see RouteTrie), and again once it changes.
+
+        Args:
+            router_name: The name of the router
+            ip: The address, either a dotted string or an integer
+
+        Returns:
+            The route of the longest prefix matching the address, as {'gateway': GATEWAY, 'interface': INTERFACE}
+
+        Raises:
+            NameNotFound: if the router does not exist
+            ValueError: if the address is wrongly formed
+        """
+
+        return self.__route_trie(router_name).lookup(ip)
+
+    def lookup_many(self, router_name, ips):
+        """
+        Get the routes a router uses to reach many addresses
+
+        Args:
+            router_name: The name of the router
+            ips: The addresses, either dotted strings or integers
+
+        Returns:
+            The list of the routes, in the order of the addresses
+
+        Raises:
+            NameNotFound: if the router does not exist
+            ValueError: if an address is wrongly formed
+        """
+
+        return self.__route_trie(router_name).lookup_many(ips)
+
+    def __route_trie(self, router_name):
+        """
+        Get the compiled routing table of a router, compiling it if it is new or has changed
+
+        Args:
+            router_name: The name of the router
+
+        Returns:
+            The RouteTrie instance
+        """
+
+        routing_table = self.routing_table(router_name)
+
+        compiled = self.__route_tries.get(str(router_name))
+        # a change of the network gives the routers it affects new routing tables
+        if compiled is None or compiled[0] is not routing_table:
+            compiled = routing_table, RouteTrie.from_routing_table(routing_table)
+            self.__route_tries[str(router_name)] = compiled
+
+        return compiled[1]
+
+    def iter_routing_tables(self):
+        """
+        Yields the routing tables one by one, in the order of the routers
+
+        The routing tables already calculated are yielded as they are. Deferred ones are calculated as they are
+        yielded, and not kept, so that a consumer can start with the first routing table, and only hold one at a time.
+
+        Returns:
+            A generator of (ROUTER_NAME, FORMATTED_ROUTING_TABLE) tuples. Empty if the network has not been executed
+        """
+
+        if not self.__executed:
+            return
+
+        names = self.gend_routers_names
+        pending = [i for i in range(len(names)) if names[i] is not None and self.routing_tables[i] is None]
+        calculated = self.__generator_instance.iter_routing_tables(pending) if pending else iter(())
+
+        for i in range(len(names)):
+            if names[i] is None:
+                continue
+            if self.routing_tables[i] is not None:
+                yield names[i], self.routing_tables[i]
+            else:
+                _, routing_table = next(calculated)
+                yield names[i], routing_table
+
+    def compress_routing_tables(self, verify=False):
+        """
+        Compresses the routing tables (see route_compression.compress)
+
+        The routes made redundant by a shorter one, e.g. the default route, are dropped, and the sibling prefixes with
+        the same next hop are merged. Deferred routing tables are calculated, to be compressed. The routing tables
+        changed afterwards by a change of the network are not compressed again.
+
+        Args:
+            verify: Whether to check that each compressed routing table routes every address like the original one
+
+        Returns:
+            The number of routes saved, keyed by router name
+        """
+
+        if not self.__executed:
+            return {}
+
+        saved = {}
+        uids = {self.gend_routers_names[i]: i for i in range(len(self.gend_routers_names))}
+        for name, routing_table in list(self.iter_routing_tables()):
+            compressed = compress(routing_table)
+            if verify and not equivalent(routing_table, compressed):
+                raise Exception(f"The compressed routing table of router {name} does not route every address like "
+                                f"the original one")
+
+            self.routing_tables[uids[name]] = compressed
+            self.formatted_raw_routing_tables[name] = compressed
+            saved[name] = len(routing_table) - len(compressed)
+
+        return saved
+
+    def __uid(self, type_, name):
+        """
+        Get the UID of an existing router or subnetwork
+
+        Args:
+            type_: Either 'subnet' or 'router'
+            name: The name
+
+        Returns:
+            The UID
+
+        Raises:
+            NameNotFound: if there is no such router or subnetwork
+            Exception: if the network has not been executed yet
+        """
+
+        if not self.__executed:
+            raise Exception("The network must be executed before being changed")
+        self.__build_from_cache()
+
+        return self.__virtual_network_instance.name_to_uid(type_, name)
+
+    def __check_reachable(self, groups):
+        """
+        Raises UnreachableNetwork if a change would leave subnetworks unreachable, like the sweep of the network
+
+        Args:
+            groups: The groups of the subnetworks UIDs the change would leave unreachable
+        """
+
+        raise_if_disconnected(self.gend_subnetworks, groups)
+
+    def __apply_change(self, change, affected=None, routers=(), added=None, removed=None):
+        """
+        Applies a change to the virtual network, then recalculates the hops and routing tables it affects
+
+        With the numpy engine, the hops are calculated again in full, the engine handling all the subnetworks at once.
+        With lazy hops, the cache and the routing tables are simply dropped, to be calculated again when asked for.
+        Other deferred routing tables are dropped once the hops are recalculated.
+
+        Args:
+            change: The function that changes the virtual network
+            affected: A function that returns, for a DiscoveryOrder, whether the change affects its discovery. With a
+                new router or subnetwork, it also returns the neighbour it is discovered from
+            routers: The UIDs of the routers whose links change, or whose neighbours links change
+            added: The type ('subnets' or 'routers') of what the change adds, if any
+            removed: The type and the UID of what the change removes, if any
+        """
+
+        with self.__stats.measure('change'):
+            if self.engine == 'numpy' or self.hops_storage == 'lazy':
+                change()
+                self.__discover_hops()
+                self.__calculate_routing_tables()
+                return
+
+            discovery = self.__discovery_instance
+            sources, parents = [], {}
+            for s, order in discovery.orders().items():
+                if removed == ('subnets', s):
+                    continue
+                result = affected(order)
+                if added:
+                    result, parents[s] = result
+                if result:
+                    sources.append(s)
+
+            old = discovery.hops_from(sources)
+            uid = change()
+
+            if removed:
+                discovery.forget(*removed)
+            if added:
+                discovery.learn(added, uid)
+                discovery.discover_leaf(added, uid,
+                                        {s: p for s, p in parents.items() if p is not None and s not in sources})
+
+            destinations = discovery.recalculate_hops(sources, old)
+            if added == 'subnets':
+                discovery.recalculate_hops([uid])
+                destinations.add(uid)
+
+            if self.defer_routing_tables:
+                self.__generator_instance.next_hops = None
+                self.routing_tables = [None] * len(self.gend_routers_names)
+                self.formatted_raw_routing_tables = {}
+                return
+
+            for router in self.__generator_instance.update_next_hops(destinations, routers):
+                if router not in self.gend_routers:
+                    continue
+                routing_table = self.__generator_instance.get_routing_table(router)
+                if router < len(self.routing_tables):
+                    self.routing_tables[router] = routing_table
+                else:
+                    self.routing_tables.append(routing_table)
+                self.formatted_raw_routing_tables[self.gend_routers_names[router]] = routing_table
+
+    def add_link(self, router_name, subnet_name, ip=None):
+        """
+        Links a router to a subnetwork, and recalculates what it affects
+
+        Args:
+            router_name: The name of the router
+            subnet_name: The name of the subnetwork
+            ip: The IP assigned to the router on the subnetwork. If None, the program sets it
+
+        Raises:
+            NameNotFound: if the router or the subnetwork does not exist
+            WronglyFormedLinksData: if the router is already linked to the subnetwork
+            MasterRouterError: if the router is the master router
+        """
+
+        router, subnet = self.__uid('router', router_name), self.__uid('subnet', subnet_name)
+        if subnet in self.links['routers'][router]:
+            raise WronglyFormedLinksData()
+        if router == self.__discovery_instance.master_router:
+            raise MasterRouterError(False)
+
+        def change():
+            self.__virtual_network_instance.connect_router_to_networks(router_name, {subnet_name: ip})
+
+        self.__apply_change(change, lambda order: order.affected_by_new_link(router, subnet),
+                            routers=[router, *self.links['subnets'][subnet]])
+
+    def remove_link(self, router_name, subnet_name):
+        """
+        Unlinks a router from a subnetwork, and recalculates what it affects
+
+        Args:
+            router_name: The name of the router
+            subnet_name: The name of the subnetwork
+
+        Raises:
+            NameNotFound: if the router or the subnetwork does not exist, or if they are not linked
+            MasterRouterError: if the router is the master router
+            WronglyFormedLinksData: if it is the last link of the router (remove the router instead)
+            UnreachableNetwork: if a subnetwork would become unreachable
+        """
+
+        router, subnet = self.__uid('router', router_name), self.__uid('subnet', subnet_name)
+        if subnet not in self.links['routers'][router]:
+            raise NameNotFound(f"{router_name} - {subnet_name}")
+        if router == self.__discovery_instance.master_router:
+            raise MasterRouterError(False)
+        if len(self.links['routers'][router]) == 1:
+            raise WronglyFormedLinksData()
+        self.__check_reachable(self.__discovery_instance.disconnected_without(links={(router, subnet)}))
+
+        def change():
+            self.gend_subnetworks[subnet]['instance'].disconnect(router)
+            self.gend_routers[router].disconnect(subnet)
+
+        self.__apply_change(change, lambda order: order.affected_by_removed_link(router, subnet),
+                            routers=[router, *self.links['subnets'][subnet]])
+
+    def add_subnetwork(self, name, cidr, links):
+        """
+        Adds a subnetwork linked to existing routers, and calculates what it affects
+
+        Args:
+            name: The name of the subnetwork
+            cidr: The CIDR of the subnetwork
+            links: The routers linked to the subnetwork, with the IP to assign them. Format is {ROUTER_NAME: IP, ...}
+
+        Raises:
+            WronglyFormedSubnetworksData: if the CIDR is wrongly formed
+            NameNotFound: if one of the routers does not exist
+            MasterRouterError: if one of the routers is the master router
+            UnreachableNetwork: if none of the routers leads to the master router
+        """
+
+        try:
+            ip, mask = cidr.split("/")
+            ip_to_int(ip)
+        except:
+            raise WronglyFormedSubnetworksData()
+
+        routers = [self.__uid('router', router_name) for router_name in links]
+        if self.__discovery_instance.master_router in routers:
+            raise MasterRouterError(False)
+        if not any(self.links['routers'][router] for router in routers):
+            raise UnreachableNetwork(name, cidr, 1, [[name]])
+
+        def change():
+            inst = self.__virtual_network_instance
+            uid = inst.create_network(ip, int(mask), str(name))
+            try:
+                for router_name in links:
+                    inst.connect_router_to_networks(router_name, {name: links[router_name]})
+            except Exception:
+                # e.g. an IP already attributed: the new subnetwork goes, leaving the network as it was
+                inst.remove_network(uid)
+                raise
+            self.subnetworks = {**self.subnetworks, name: cidr}
+            return uid
+
+        self.__apply_change(change, lambda order: order.affected_by_addition('subnets', routers), routers=routers,
+                            added='subnets')
+
+    def remove_subnetwork(self, name):
+        """
+        Removes a subnetwork, and recalculates what it affects
+
+        Args:
+            name: The name of the subnetwork
+
+        Raises:
+            NameNotFound: if the subnetwork does not exist
+            MasterRouterError: if the master router is linked to the subnetwork
+            WronglyFormedLinksData: if a router is only linked to the subnetwork (remove the router first)
+            UnreachableNetwork: if another subnetwork would become unreachable
+        """
+
+        subnet = self.__uid('subnet', name)
+        routers = list(self.links['subnets'][subnet])
+        if self.__discovery_instance.master_router in routers:
+            raise MasterRouterError(False)
+        if any(len(self.links['routers'][router]) == 1 for router in routers):
+            raise WronglyFormedLinksData()
+        self.__check_reachable(self.__discovery_instance.disconnected_without(subnets={subnet}))
+
+        def change():
+            self.__virtual_network_instance.remove_network(subnet)
+            self.subnetworks = {k: v for k, v in self.subnetworks.items() if str(k) != str(name)}
+
+        self.__apply_change(change, lambda order: order.affected_by_removal(('subnets', subnet)), routers=routers,
+                            removed=('subnets', subnet))
+
+    def add_router(self, name, links):
+        """
+        Adds a router linked to existing subnetworks, and calculates what it affects
+
+        The master router cannot be added this way.
+
+        Args:
+            name: The name of the router
+            links: The subnetworks linked to the router, with the IP to assign it. Format is {SUBNET_NAME: IP, ...}
+
+        Raises:
+            NameNotFound: if one of the subnetworks does not exist
+            WronglyFormedLinksData: if the router is not linked to any subnetwork
+        """
+
+        subnets = [self.__uid('subnet', subnet_name) for subnet_name in links]
+        if not subnets:
+            raise WronglyFormedLinksData()
+        neighbours = {router for subnet in subnets for router in self.links['subnets'][subnet]}
+
+        def change():
+            inst = self.__virtual_network_instance
+            uid = inst.create_router(name=str(name))
+            try:
+                inst.connect_router_to_networks(name, links)
+            except Exception:
+                inst.remove_router(uid)
+                raise
+            self.routers = {**self.routers, name: None}
+            return uid
+
+        self.__apply_change(change, lambda order: order.affected_by_addition('routers', subnets),
+                            routers=[len(self.gend_routers_names), *neighbours], added='routers')
+
+    def remove_router(self, name):
+        """
+        Removes a router, and recalculates what it affects
+
+        Args:
+            name: The name of the router
+
+        Raises:
+            NameNotFound: if the router does not exist
+            MasterRouterError: if the router is the master router
+            UnreachableNetwork: if a subnetwork would become unreachable
+        """
+
+        router = self.__uid('router', name)
+        if router == self.__discovery_instance.master_router:
+            raise MasterRouterError(False)
+        self.__check_reachable(self.__discovery_instance.disconnected_without(routers={router}))
+        neighbours = {other for subnet in self.links['routers'][router] for other in self.links['subnets'][subnet]}
+
+        def change():
+            self.__virtual_network_instance.remove_router(router)
+            self.routers = {k: v for k, v in self.routers.items() if str(k) != str(name)}
+            self.routing_tables[router] = None
+            self.formatted_raw_routing_tables.pop(str(name), None)
+
+        self.__apply_change(change, lambda order: order.affected_by_removal(('routers', router)),
+                            routers=neighbours - {router}, removed=('routers', router))
+
     def display_routing_tables(self):
         """
         Displays in the console
@@ -212,68 +852,98 @@ class Dispatcher:
         """
 
         if self.__executed:
-            # Hops
-            print("----- HOPS -----")
-            for tup in self.hops:
-                s, e = tup
-                path = self.hops[tup]
-                string = f"From subnetwork {self.__virtual_network_instance.uid_to_name('subnet', s)} " \
-                         f"to subnetwork {self.__virtual_network_instance.uid_to_name('subnet', e)}: "
-
-                if len(path) == 1:
-                    string += f"router {self.__virtual_network_instance.uid_to_name('router', path[0])}"
-                else:
-                    for i in range(len(path)):
-                        if i > 0:
-                            string += " > "
-                        string += f"router {self.__virtual_network_instance.uid_to_name('router', path[i])}"
-
-                print(string)
-
-            # Routing tables
-            print("\n\n----- ROUTING TABLES -----")
-            for name in self.formatted_raw_routing_tables:
-                print(f"Router {name}")
-                for subnet in self.formatted_raw_routing_tables[name]:
-                    print(f"  - {subnet}", ''.join([' ' for _ in range(18 - len(subnet))]),
-                          f": {self.formatted_raw_routing_tables[name][subnet]['gateway']} "
-                          f"via {self.formatted_raw_routing_tables[name][subnet]['interface']}")
+            sys.stdout.writelines(self.__render_lines(console=True))
 
     def output_routing_tables(self, file_path):
         """
         Outputs to a file
 
-        Outputs the formatted paths and routing tables to a given file path.
+        Outputs the formatted paths and routing tables to a given file path. The lines are streamed through a large
+        buffer, the whole output is never held in memory.
 
         Args:
             file_path: The file path where all the data will be outputted. Preferably a .txt file.
         """
 
         if self.__executed:
-            with open(file_path, encoding="utf-8", mode="w") as f:
-                # Hops
-                f.write("----- HOPS -----\n")
-                for tup in self.hops:
-                    s, e = tup
-                    path = self.hops[tup]
-                    string = f"Subnet {self.__virtual_network_instance.uid_to_name('subnet', s)} " \
-                             f"to subnet {self.__virtual_network_instance.uid_to_name('subnet', e)}: "
-
-                    if len(path) == 1:
-                        string += f"router {self.__virtual_network_instance.uid_to_name('router', path[0])}"
-                    else:
-                        for i in range(len(path)):
-                            if i > 0:
-                                string += " > "
-                            string += f"router {self.__virtual_network_instance.uid_to_name('router', path[i])}"
-
-                    f.write(string + '\n')
-
-                # Routing tables
-                f.write("\n\n----- ROUTING TABLES -----\n")
-                for name in self.formatted_raw_routing_tables:
-                    f.write(f"\nRouter {name}\n")
-                    for subnet in self.formatted_raw_routing_tables[name]:
-                        f.write(f"  - {subnet} {''.join([' ' for _ in range(18 - len(subnet))])} : "
-                                f"{self.formatted_raw_routing_tables[name][subnet]['gateway']} "
-                                f"via {self.formatted_raw_routing_tables[name][subnet]['interface']}\n")
+            with open(file_path, encoding="utf-8", mode="w", buffering=self.output_buffer_size) as f:
+                f.writelines(self.__render_lines(console=False))
+
+    def export_routing_tables(self, directory, format_='ip', workers=4):
+        """
+        Exports the routing tables to the configuration of real routers, one file per router
+
+        The routing tables are rendered from their arrays and written by a pool of threads, while the next ones are
+        calculated. Only a few routing tables wait for their writing at once.
+
+        Args:
+            directory: The directory of the files, created if needed
+            format_: Either 'ip' (files for `ip -batch`, named ROUTER.batch) or 'frr' (FRR static routes, named
+                ROUTER.conf)
+            workers: The number of threads writing the files
+
+        Returns:
+            The paths of the written files, in the order of the routers
+
+        Raises:
+            ValueError: if the format is unknown
+        """
+
+        if format_ not in exporters:
+            raise ValueError(f"Unknown export format '{format_}'. Available formats: {', '.join(exporters)}")
+        if not self.__executed:
+            return []
+
+        render, extension = exporters[format_]
+        os.makedirs(directory, exist_ok=True)
+
+        def write(path, name, routing_table):
+            with open(path, encoding="utf-8", mode="w", buffering=self.output_buffer_size) as f:
+                f.writelines(render(name, routing_table))
+            return path
+
+        paths, pending = [], deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for name, routing_table in self.iter_routing_tables():
+                path = os.path.join(directory, str(name).replace(os.sep, '_') + extension)
+                pending.append(executor.submit(write, path, name, routing_table))
+                if len(pending) >= 2 * workers:
+                    paths.append(pending.popleft().result())
+            paths.extend(future.result() for future in pending)
+
+        return paths
+
+    def __render_lines(self, console):
+        """
+        Renders the paths and routing tables, line by line
+
+        The console and the file differ slightly in their wording, everything else is shared. The labels of the
+        subnetworks and routers are prepared once, every line of the paths then being a few joins.
+
+        Args:
+            console: Whether the lines are displayed in the console, else outputted to a file
+
+        Returns:
+            A generator of the lines, each ending with a line break
+        """
+
+        if console:
+            start_label, end_label, router_header = "From subnetwork {} ", "to subnetwork {}: ", "Router {}\n"
+        else:
+            start_label, end_label, router_header = "Subnet {} ", "to subnet {}: ", "\nRouter {}\n"
+
+        starts = [None if name is None else start_label.format(name) for name in self.gend_subnetworks_names]
+        ends = [None if name is None else end_label.format(name) for name in self.gend_subnetworks_names]
+        routers = [None if name is None else f"router {name}" for name in self.gend_routers_names]
+
+        # Hops
+        yield "----- HOPS -----\n"
+        for s, e in self.hops:
+            yield f"{starts[s]}{ends[e]}{' > '.join([routers[router] for router in self.hops[(s, e)]])}\n"
+
+        # Routing tables
+        yield "\n\n----- ROUTING TABLES -----\n"
+        for name, routing_table in self.iter_routing_tables():
+            yield router_header.format(name)
+            for subnet, route in routing_table.items():
+                yield f"  - {subnet} {' ' * (18 - len(subnet))} : {route['gateway']} via {route['interface']}\n"
@@ -166,7 +166,7 @@ class UnreachableNetwork(Exception):
     Thrown during the AntsDiscovery process if a subnetwork is unreachable from the master router.
     """
 
-    def __init__(self, name, cidr, total):
+    def __init__(self, name, cidr, total, groups=None):
         """
         Init the new Exception
 
@@ -174,21 +174,31 @@ class UnreachableNetwork(Exception):
             name: The name of the unreachable subnetwork.
             cidr: Its CIDR.
             total: The total number of unreachable subnetworks.
+            groups: The groups of subnetworks disconnected from the master router, as lists of names, if known.
 
         Examples:
             >>> raise UnreachableNetwork("My subnet", "192.168.1.0/24", 4)
             Traceback (most recent call last):
                 ...
             rth.core.errors.UnreachableNetwork: The subnetwork 'My subnet' (CIDR 192.168.1.0/24) is unreachable from master router. Total number of unreachable subnetworks: 4
+            >>> raise UnreachableNetwork("A", "10.0.0.0/24", 3, [['A', 'B'], ['C']])
+            Traceback (most recent call last):
+                ...
+            rth.core.errors.UnreachableNetwork: The subnetwork 'A' (CIDR 10.0.0.0/24) is unreachable from master router. Total number of unreachable subnetworks: 3. Disconnected groups: [A, B], [C]
         """
 
         self.name = name
         self.cidr = cidr
         self.total = total
+        self.groups = groups
 
     def __str__(self):
-        return f"The subnetwork '{self.name}' (CIDR {self.cidr}) is unreachable from master router. " \
-               f"Total number of unreachable subnetworks: {self.total}"
+        message = f"The subnetwork '{self.name}' (CIDR {self.cidr}) is unreachable from master router. " \
+                  f"Total number of unreachable subnetworks: {self.total}"
+        if self.groups:
+            message += ". Disconnected groups: " + ", ".join(f"[{', '.join(map(str, group))}]"
+                                                             for group in self.groups)
+        return message
 
 
 class MasterRouterError(Exception):
@@ -225,3 +235,30 @@ class MasterRouterError(Exception):
 
     def __str__(self):
         return self.text
+
+
+class NameNotFound(NameError):
+    """
+    The name of the subnetwork or router does not exist
+
+    Thrown when the user refers to a subnetwork or a router that is not part of the network.
+    """
+
+    def __init__(self, name):
+        """
+        Init the new Exception
+
+        Args:
+            name: The name that does not exist.
+
+        Examples:
+            >>> raise NameNotFound("This name")
+            Traceback (most recent call last):
+              ...
+            rth.core.errors.NameNotFound: Name 'This name' does not exist
+        """
+
+        self.name = name
+
+    def __str__(self):
+        return f"Name '{self.name}' does not exist"
@@ -0,0 +1,162 @@
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+## @package stats
+#
+#  The package of the instrumentation of the Dispatcher: the time and memory of each stage, and the counters of the
+#  process.
+
+
+class Stats:
+    """
+    Timings and counters of the executions of a Dispatcher
+
+    Each stage (checks, building of the virtual network, discovery of the hops...) is measured in wall time and CPU
+    time. The CPU time is the one of the process plus the one of its worker processes which exited during the stage
+    (the process pools are closed by the stage that opens them). Windows does not report the CPU time of the workers,
+    so it only counts the process there. The peak memory allocated during a stage is measured with tracemalloc, only
+    when asked for, as tracing the allocations slows Python down. A stage run several times (e.g. after changes of the
+    network) adds up.
+
+    The counters are set by the Dispatcher (ants spawned, hops found, cache hits...).
+    """
+
+    ## The measures of each stage, as {STAGE: {'calls': N, 'wall': SECONDS, 'cpu': SECONDS, 'peak_memory': BYTES}},
+    #  in the order the stages were first run. The peak memory is None when it is not traced
+    stages = None
+    ## The counters, keyed by name
+    counters = None
+
+    ## The descriptions of the counters set by the Dispatcher, used as help of the Prometheus metrics
+    descriptions = {
+        'subnetworks': "Number of subnetworks",
+        'routers': "Number of routers",
+        'discoveries': "Number of discoveries run from a starting subnetwork",
+        'ants': "Number of ants spawned",
+        'max_frontier': "Largest number of ants in a frontier",
+        'hops': "Number of hops found",
+        'routing_tables': "Number of routing tables calculated",
+        'result_cache_hits': "Number of results read from the result cache",
+        'result_cache_misses': "Number of results not found in the result cache",
+        'hops_cache_hits': "Number of lazy hops read from their cache",
+        'hops_cache_misses': "Number of lazy hops discoveries run on a cache miss",
+    }
+
+    def __init__(self, trace_memory=False):
+        """
+        Init
+
+        Args:
+            trace_memory: Whether to measure the peak memory of each stage with tracemalloc
+        """
+
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def measure(self, stage):
+        """
+        Measures a stage, run in the with block
+
+        Args:
+            stage: The name of the stage
+        """
+
+        # tracing is only started here if it was not already (e.g. by the user), and stopped by the same stage
+        own_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if own_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            if hasattr(tracemalloc, 'reset_peak'):
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            else:
+                # before Python 3.9, the peak is only reset with the traces
+                baseline = 0
+                tracemalloc.clear_traces()
+
+        wall, cpu = time.perf_counter(), self.__cpu_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, self.__cpu_time() - cpu
+
+            peak = None
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+                if own_tracing:
+                    tracemalloc.stop()
+
+            measures = self.stages.setdefault(stage, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak_memory': None})
+            measures['calls'] += 1
+            measures['wall'] += wall
+            measures['cpu'] += cpu
+            if peak is not None:
+                measures['peak_memory'] = max(measures['peak_memory'] or 0, peak)
+
+    @staticmethod
+    def __cpu_time():
+        """
+        Returns:
+            The CPU time of the process, and of its worker processes which exited, in seconds
+        """
+
+        times = os.times()
+        return time.process_time() + times.children_user + times.children_system
+
+    def copy(self):
+        """
+        Returns:
+            A new Stats instance, with copies of the stages and the counters
+        """
+
+        stats = Stats(self.trace_memory)
+        stats.stages = {stage: dict(measures) for stage, measures in self.stages.items()}
+        stats.counters = dict(self.counters)
+        return stats
+
+    def as_dict(self):
+        """
+        Returns:
+            The stages and the counters, as {'stages': {...}, 'counters': {...}}
+        """
+
+        return {'stages': {stage: dict(measures) for stage, measures in self.stages.items()},
+                'counters': dict(self.counters)}
+
+    def to_prometheus(self, prefix='rth'):
+        """
+        Formats the stats in the Prometheus text exposition format
+
+        Args:
+            prefix: The prefix of the metrics names
+
+        Returns:
+            The metrics, as a string
+        """
+
+        lines = []
+
+        def metric(name, help_, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_}")
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            for labels, value in samples:
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        def by_stage(key):
+            return [(f'{{stage="{stage}"}}', measures[key]) for stage, measures in self.stages.items()
+                    if measures[key] is not None]
+
+        metric('stage_calls', "Number of runs of each stage", by_stage('calls'))
+        metric('stage_wall_seconds', "Wall time spent in each stage", by_stage('wall'))
+        metric('stage_cpu_seconds', "CPU time of the process and its worker processes spent in each stage",
+               by_stage('cpu'))
+        if self.trace_memory:
+            metric('stage_peak_memory_bytes', "Peak memory allocated during each stage", by_stage('peak_memory'))
+
+        for name, value in self.counters.items():
+            metric(name, self.descriptions.get(name, name.replace('_', ' ').capitalize()), [('', value)])
+
+        return "\n".join(lines) + "\n"
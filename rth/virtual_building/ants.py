@@ -1,6 +1,13 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from enum import Enum
-from rth.core.errors import UnreachableNetwork
 from rth.virtual_building.utils import *
+from rth.virtual_building.hops import PredecessorHops, LazyHops
+from rth.virtual_building.discovery_order import DiscoveryOrder
+from rth.virtual_building.connectivity import disconnected_subnets, raise_if_disconnected
+from rth.virtual_building.tracing import TraceEvent, discovery_types, print_tracer
 ## @package ants
 #
 #  The package that contains all the Ants process, including Sweep and Discovery.
@@ -16,6 +23,40 @@ class AntState(Enum):
     Waiting = 2
 
 
+def _chain(uids):
+    """
+    Builds a lineage from a list
+
+    Args:
+        uids: The UIDs, the oldest first
+
+    Returns:
+        The lineage, as (UID, PREVIOUS) nested tuples, the newest UID first. None if the list is empty
+    """
+
+    chain = None
+    for uid in uids:
+        chain = (uid, chain)
+    return chain
+
+
+def _unchain(chain):
+    """
+    Args:
+        chain: A lineage, as built by _chain
+
+    Returns:
+        The list of its UIDs, the oldest first
+    """
+
+    uids = []
+    while chain is not None:
+        uids.append(chain[0])
+        chain = chain[1]
+    uids.reverse()
+    return uids
+
+
 class Ant:
     """
     The main Ant class, little thing that allows us to build virtual paths in a virtual environment
@@ -33,21 +74,33 @@ class Ant:
         - Several Possibilites, one or more not Explored: the ant dies and leaves as many children as there are
             Possibilites to explore. It also gives them the same history plus the possibility, meaning the child will
             "spawn" on the possibility the mother could not explore; Children may then continue exploring normally.
+
+    The history is kept as two lineages of (UID, PREVIOUS) tuples, the current position first. A child only adds its
+    own position in front of the lineages of its mother, which it shares, so spawning does not copy any history.
     """
 
-    def __init__(self, state: AntState, pos: dict):
+    __slots__ = ('__state', '__subnets', '__routers', '__subnets_count', '__routers_count')
+
+    def __init__(self, state: AntState, pos: dict, mother=None):
         """
         Init the Ant
 
         Args:
             state: The AntState state of the ant.
             pos: A dictionary of the current position of the ant.
+            mother: The Ant this one is born from, if any. The ant then has the history of its mother, plus the
+                position its mother could not explore
         """
 
         self.__state = state
-        self.__pos = pos
-        # { "subnets": [], "routers": [] }
-        self._history = {"subnets": [pos["subnet"]], "routers": [pos["router"]]}
+
+        if mother is None:
+            self.__subnets, self.__routers = (pos["subnet"], None), (pos["router"], None)
+            self.__subnets_count, self.__routers_count = 1, 1
+        else:
+            self.__subnets, self.__routers = mother.__subnets, mother.__routers
+            self.__subnets_count, self.__routers_count = mother.__subnets_count, mother.__routers_count
+            self.move_to(pos[self.next_hop_type()])
 
     @property
     def router(self):
@@ -55,7 +108,7 @@ class Ant:
         Returns:
             The current router of the Ant.
         """
-        return self.__pos["router"]
+        return self.__routers[0]
 
     @property
     def subnet(self):
@@ -63,7 +116,7 @@ class Ant:
         Returns:
             The current router of the Ant.
         """
-        return self.__pos["subnet"]
+        return self.__subnets[0]
 
     @property
     def dead(self):
@@ -117,15 +170,28 @@ class Ant:
             pos: The position
         """
 
-        hop_type = self.next_hop_type()
-        self.__pos[hop_type] = pos
-        self._history[f"{hop_type}s"].append(self.__pos[hop_type])
+        if self.next_hop_type() == 'router':
+            self.__routers = (pos, self.__routers)
+            self.__routers_count += 1
+        else:
+            self.__subnets = (pos, self.__subnets)
+            self.__subnets_count += 1
 
     def get_history(self):
         """
         Get the path the ant has taken
+
+        Returns:
+            The path, as {"subnets": [...], "routers": [...]}. The lists are built on each call
         """
-        return self._history
+        return {"subnets": _unchain(self.__subnets), "routers": self.routers_path()}
+
+    def routers_path(self):
+        """
+        Returns:
+            The list of the routers the ant has taken, built on each call
+        """
+        return _unchain(self.__routers)
 
     def feed_history(self, type_at, hist):
         """
@@ -137,11 +203,16 @@ class Ant:
         """
 
         if type_at == "routers":
-            self._history["routers"][0:0] = hist["routers"][:-1]
-            self._history["subnets"][0:0] = hist["subnets"]
+            routers, subnets = hist["routers"][:-1], hist["subnets"]
         elif type_at == "subnets":
-            self._history["routers"][0:0] = hist["routers"]
-            self._history["subnets"][0:0] = hist["subnets"][:-1]
+            routers, subnets = hist["routers"], hist["subnets"][:-1]
+        else:
+            return
+
+        self.__routers = _chain(routers + _unchain(self.__routers))
+        self.__subnets = _chain(subnets + _unchain(self.__subnets))
+        self.__routers_count += len(routers)
+        self.__subnets_count += len(subnets)
 
     def next_hop_type(self):
         """
@@ -154,18 +225,32 @@ class Ant:
             Exception: if there is more routers seen than subnetworks (this Exception should NEVER be thrown)
         """
 
-        sub = self._history['subnets']
-        rout = self._history['routers']
-
-        if len(sub) > len(rout):
+        if self.__subnets_count > self.__routers_count:
             # we expect to hop to a router
             return 'router'
-        elif len(sub) == len(rout):
+        elif self.__subnets_count == self.__routers_count:
             # we expect to hop to a subnet
             return 'subnet'
         else:
             raise Exception("FindAnt history: Router length seems to be greater than subnets length; impossible")
 
+    def has_seen(self, type_, uid):
+        """
+        Args:
+            type_: Either 'router' or 'subnet'
+            uid: The UID of the router or subnetwork
+
+        Returns:
+            Whether the router or subnetwork is in the history of the ant
+        """
+
+        chain = self.__routers if type_ == 'router' else self.__subnets
+        while chain is not None:
+            if chain[0] == uid:
+                return True
+            chain = chain[1]
+        return False
+
 
 class SweepAnt(Ant):
     """
@@ -174,8 +259,7 @@ class SweepAnt(Ant):
     The sweep always starts from the subnetwork attached to the master router
     """
 
-    def __init__(self, state: AntState, pos: dict):
-        super().__init__(state, pos)
+    __slots__ = ()
 
     def check_next_move(self, next_):
         """
@@ -185,9 +269,7 @@ class SweepAnt(Ant):
             next_: The UID of the next hop
         """
 
-        hop_type = self.next_hop_type()
-
-        return next_ not in self._history[f"{hop_type}s"]
+        return not self.has_seen(self.next_hop_type(), next_)
 
 
 class FindAnt(Ant):
@@ -195,7 +277,9 @@ class FindAnt(Ant):
     Ant that finds a path between two given subnetworks
     """
 
-    def __init__(self, state: AntState, pos: dict, objective):
+    __slots__ = ('__objective',)
+
+    def __init__(self, state: AntState, pos: dict, objective, mother=None):
         """
         Init
 
@@ -203,9 +287,10 @@ class FindAnt(Ant):
             state: The AntState of the Ant
             pos: The starting position
             objective: The UID of the objective subnetwork
+            mother: The Ant this one is born from, if any
         """
 
-        super().__init__(state, pos)
+        super().__init__(state, pos, mother)
         self.__objective = objective
 
     def already_on_objective(self):
@@ -231,7 +316,7 @@ class FindAnt(Ant):
 
         hop_type = self.next_hop_type()
 
-        if next_ not in self._history[f"{hop_type}s"]:
+        if not self.has_seen(hop_type, next_):
             if hop_type == 'subnet' and next_ == self.__objective:
                 # means we are going to jump on the good subnet
                 return [True, True]
@@ -246,7 +331,16 @@ class AntsDiscovery:
     The class that runs all the process of Discovery
     """
 
-    def __init__(self, subnets, routers, equitemporality=True, debug=False):
+    ## Below this number of starting subnetworks, hops are always calculated by a single worker
+    parallel_threshold = 64
+
+    ## The predecessors of every discovery, kept to follow the changes of the network (see prepare_changes)
+    trees = None
+    ## The counters of the discoveries: the discoveries run, the ants spawned, the largest frontier and the hops found
+    counters = None
+
+    def __init__(self, subnets, routers, equitemporality=True, debug=False, max_ants=None, hops_storage='dict',
+                 cache_size=256, tracer=None):
         """
         Init
 
@@ -255,6 +349,13 @@ class AntsDiscovery:
             routers: The routers data
             equitemporality: The equitemporality tweaker
             debug: Debug param
+            max_ants: The maximum number of ants allowed in a frontier of the process. None means no limit
+            hops_storage: How the hops are stored. Either 'dict' (a dictionary of paths), 'array' or 'numpy' (one
+                predecessor array per starting subnetwork, see PredecessorHops), or 'lazy' (calculated on demand, see
+                LazyHops)
+            cache_size: With lazy hops, the number of starting subnetworks whose paths are kept. None means no limit
+            tracer: The tracer of the ants discoveries, see ants_discovery_process. Tracing runs every discovery in
+                this process
         """
 
         # given basics
@@ -266,6 +367,12 @@ class AntsDiscovery:
         self.links, self.subnets_table = self.prepare_matrix_and_links()
         self.master_router = get_master_router(self.routers)
         self.debug = debug
+        self.max_ants = max_ants
+        self.hops_storage = hops_storage
+        self.cache_size = cache_size
+        self.tracer = tracer
+        self.trees = None
+        self.counters = {'discoveries': 0, 'ants': 0, 'max_frontier': 0, 'hops': 0}
 
     def prepare_matrix_and_links(self):
         """
@@ -281,25 +388,26 @@ class AntsDiscovery:
         # links
         links = {'subnets': {}, 'routers': {}}
 
-        for s in range(len(self.subnets)):
+        for s in self.subnets:
             routers = self.subnets[s]['instance'].routers
             links['subnets'][s] = routers.keys()
 
-        for s in range(len(self.routers)):
+        for s in self.routers:
             nets = self.routers[s].connected_networks
             links['routers'][s] = nets.keys()
 
         # matrix
         matrix = []
-        for start in range(len(self.subnets)):
-            for end in range(len(self.subnets)):
+        for start in self.subnets:
+            for end in self.subnets:
                 if start != end:
                     matrix.append([start, end])
 
         return links, matrix
 
     @staticmethod
-    def ants_discovery_process(discovery_type, links, subnet_start, subnet_end=None, debug=False):
+    def ants_discovery_process(discovery_type, links, subnet_start, subnet_end=None, debug=False, max_ants=None,
+                               counters=None, tracer=None):
         """
         This function is the core of the ants process.
         The labels in comments in the code below all refer to this section:
@@ -313,244 +421,204 @@ class AntsDiscovery:
                     docstring for a full explanation of the different cases.
                 x.2 - Several possibilities, we kill the ant and generate children
 
-            3. "Cleaning up dead bodies": we delete the dead ants from the ants list
+            Each hop takes the ants out of the current frontier in order. The ants that moved keep their order in the
+            next frontier, and the newborns are queued behind them in the order they were born. Dead ants are simply
+            not carried over.
 
         RESULT: we then return what has to be returned
-        
+
+        Every step of the process can be traced (see tracing.TraceEvent): the tracer is called with the event and its
+        integer payload. Without a tracer, the events are not even built.
+
         Args:
-            discovery_type: Whether it is a sweep or a search.
+            discovery_type: Whether it is a sweep ('sweep'), a search ('find') or a sweep that keeps the path leading
+                to every subnetwork it discovers ('all').
             links: The links prepared in the prepare_matrix_and_links function
             subnet_start: The UID of the starting subnetwork
             subnet_end: The UID of the objective (if we are searching for one, and not sweeping)
-            debug: The debug param, which you set to True to output a huge load of things processed
+            debug: The debug param, which you set to True to print every event of the process, if there is no tracer
+            max_ants: The maximum number of ants allowed in a frontier. None (the default) means no limit
+            counters: The counters to add the discovery to (see AntsDiscovery.counters), if any
+            tracer: The callable receiving the events of the process, as tracer(EVENT, *PAYLOAD), if any (e.g. a
+                tracing.JsonlTracer or a tracing.BinaryTracer)
 
         Returns:
-            The visited subnetworks and routers, and the paths leading to the objective
+            The visited subnetworks and routers, and the paths leading to the objective. For an 'all' discovery, the
+            paths are a dictionary of the routers path leading to each discovered subnetwork, keyed by subnetwork UID.
+            The visited subnetworks and routers are dictionaries of the UID of the router or subnetwork they were
+            discovered from, keyed by their own UID (None for the starting subnetwork)
+
+        Raises:
+            RecursionError: if a frontier holds more ants than allowed by max_ants
         """
 
-        visited = {"subnets": [], "routers": []}
+        visited = {"subnets": {}, "routers": {}}
         routers, subnets = links['routers'], links['subnets']
-        ants = []
-        ants_at_objective = []
+        frontier = deque()
+        ants_at_objective = {} if discovery_type == 'all' else []
 
-        def not_visited(type_, pos):
-            return pos not in visited[type_]
+        if debug and tracer is None:
+            tracer = print_tracer
+        # the number of each living ant, only kept when tracing
+        numbers = {}
 
-        def visit(type_, pos):
-            visited[type_].append(pos)
+        def visit(type_, pos, from_=None):
+            visited[type_][pos] = from_
+
+        spawned, widest = 0, 0
+
+        def new_ant(state, router_, subnet_, mother=None):
+            nonlocal spawned
+            if discovery_type == 'find':
+                ant = FindAnt(state, {"router": router_, "subnet": subnet_}, subnet_end, mother)
+            else:
+                ant = SweepAnt(state, {"router": router_, "subnet": subnet_}, mother)
 
-        def type_at_pos(type_, where):
-            list_ = routers if type_ == 'subnets' else subnets
-            return list_[where]
+            if tracer is not None:
+                numbers[ant] = spawned
+                tracer(TraceEvent.Spawn, spawned, -1 if mother is None else numbers[mother], router_, subnet_)
+            spawned += 1
+            return ant
 
-        def activate_ants():
-            k = 0
-            for ant_ in ants:
-                if ant_.waiting:
-                    k += 1
-                    ant_.activate()
-            return k
+        def check_budget():
+            nonlocal widest
+            widest = max(widest, len(frontier))
+            if max_ants is not None and len(frontier) > max_ants:
+                raise RecursionError(f"Too many ants (>{max_ants}). Aborting to avoid further problems.")
 
         # INIT
-        for r in type_at_pos('routers', subnet_start):
-            if discovery_type == 'sweep':
-                ant = SweepAnt(AntState.Alive, {"router": r, "subnet": subnet_start})
-            else:
-                ant = FindAnt(AntState.Alive, {"router": r, "subnet": subnet_start}, subnet_end)
-            ants.append(ant)
-            visit('routers', r)
+        if tracer is not None:
+            tracer(TraceEvent.Start, discovery_types.index(discovery_type), subnet_start,
+                   -1 if subnet_end is None else subnet_end)
 
-        visit('subnets', subnet_start)
+        for r in subnets[subnet_start]:
+            frontier.append(new_ant(AntState.Alive, r, subnet_start))
+            visit('routers', r, subnet_start)
 
-        if debug:
-            print("----- PROCESS START -----")
+        visit('subnets', subnet_start)
 
         # PROCESS
-        while len(ants):
+        round_ = 0
+        while frontier:
 
-            if debug:
-                print(f"┌────────────────────────────────────────────")
-                print(f"│ Starting new round: {len(ants)} ants alive")
-                print(f"│ Current visited state: ", visited)
+            if tracer is not None:
+                tracer(TraceEvent.Round, round_, len(frontier))
+            round_ += 1
 
-            # Avoid recursion error
-            if len(ants) > 100:
-                raise RecursionError("Too many ants (>100). Aborting to avoid further problems.")
+            check_budget()
 
             # 1. Hop to next subnets
-            if debug:
-                print(f"├──────────────────────────────────────────")
-                print(f"│ Commencing hop to next subnetwork. Activated {activate_ants()} ants "
-                      f"({len(ants)} ants in total).")
-                print(f"│ Current router pos / history:")
-                for ant in ants:
-                    print(f"│  - {id(ant)}: {ant.router} / {ant.get_history()}")
-                print(f"│ Status:")
-            else:
-                activate_ants()
-
-            for ant in ants:
-                if not ant.alive:
-                    continue
+            next_frontier, births = deque(), []
+            while frontier:
+                ant = frontier.popleft()
+                ant.activate()
 
-                subnets_at_pos = [s_ for s_ in routers[ant.router] if not_visited('subnets', s_)]
-
-                if debug:
-                    print(f"│  └ {id(ant)}: {subnets_at_pos}")
+                subnets_at_pos = [s_ for s_ in routers[ant.router] if s_ not in visited['subnets']]
 
                 # 1.1: One subnet
                 if len(subnets_at_pos) == 0:
                     ant.kill()
-                    if debug:
-                        print(f"│    » DEAD | Already seen everything from this node")
+                    if tracer is not None:
+                        tracer(TraceEvent.Death, numbers.pop(ant))
                 elif len(subnets_at_pos) == 1:
-                    check = ant.check_next_move(subnets_at_pos[0])
-
-                    if discovery_type == 'sweep':
-                        # Special to the sweeping ant
-                        if check is True:
-                            # We can proceed to next subnet
-                            ant.move_to(subnets_at_pos[0])
-                            visit('subnets', subnets_at_pos[0])
-                            if debug:
-                                print(f"│    » ALIVE | Discovered network {subnets_at_pos[0]}")
-                        elif check is False:
-                            # we already went there
-                            ant.kill()
-                            if debug:
-                                print(f"│    » DEAD | Found a dead end")
-                        else:
-                            raise Exception("Unexpected to happen at anytime")
-                    else:
-                        if check[0] is True and check[1] is True:
-                            # We found the objective
-                            # We stock ant history and kill the ant
-                            ants_at_objective.append(ant.get_history()['routers'])
-                            ant.kill()
-                        elif check[0] is True and check[1] is False:
-                            # We can proceed to next subnet
-                            ant.move_to(subnets_at_pos[0])
-                            visit('subnets', subnets_at_pos[0])
-                        elif not check[0]:
-                            # We went here
-                            ant.kill()
-                        else:
-                            raise Exception("Unexpected to happen at anytime")
+                    subnet_ = subnets_at_pos[0]
+
+                    if discovery_type == 'find' and subnet_ == subnet_end:
+                        # We found the objective
+                        # We stock ant history and kill the ant
+                        ants_at_objective.append(ant.routers_path())
+                        ant.kill()
+                        if tracer is not None:
+                            tracer(TraceEvent.Objective, numbers[ant], subnet_)
+                            tracer(TraceEvent.Death, numbers.pop(ant))
+                        continue
+
+                    # We can proceed to next subnet
+                    ant.move_to(subnet_)
+                    visit('subnets', subnet_, ant.router)
+                    next_frontier.append(ant)
+                    if tracer is not None:
+                        tracer(TraceEvent.Move, numbers[ant], 0, subnet_)
+
+                    if discovery_type == 'all':
+                        ants_at_objective[subnet_] = ant.routers_path()
+                        if tracer is not None:
+                            tracer(TraceEvent.Objective, numbers[ant], subnet_)
 
                 # 1.2: Several subnets, kills and births
                 else:
                     ant.kill()
-                    if debug:
-                        print(f"│    » DEAD | Found multiple possible paths. Giving birth to:")
 
                     for subnet_ in subnets_at_pos:
-                        if not_visited('subnets', subnet_):
-                            if discovery_type == 'sweep':
-                                new_ant = SweepAnt(AntState.Waiting, {"router": ant.router, "subnet": subnet_})
-                            else:
-                                new_ant = FindAnt(AntState.Waiting, {"router": ant.router, "subnet": subnet_},
-                                                  subnet_end)
+                        child = new_ant(AntState.Waiting, ant.router, subnet_, ant)
+                        visit('subnets', subnet_, ant.router)
 
-                            new_ant.feed_history("routers", ant.get_history())
-                            visit('subnets', subnet_)
+                        if discovery_type == 'find' and child.already_on_objective():
+                            ants_at_objective.append(child.routers_path())
+                            child.kill()
+                            if tracer is not None:
+                                tracer(TraceEvent.Objective, numbers[child], subnet_)
+                                tracer(TraceEvent.Death, numbers.pop(child))
+                            continue
 
-                            if debug:
-                                print(f"│      » {id(new_ant)} : discovered {subnet_}")
+                        if discovery_type == 'all':
+                            ants_at_objective[subnet_] = child.routers_path()
+                            if tracer is not None:
+                                tracer(TraceEvent.Objective, numbers[child], subnet_)
 
-                            if isinstance(new_ant, FindAnt) and new_ant.already_on_objective():
-                                ants_at_objective.append(new_ant.get_history()['routers'])
-                                new_ant.kill()
+                        births.append(child)
 
-                            ants.append(new_ant)
+                    # the mother dies once its children are born, so that they can refer to it
+                    if tracer is not None:
+                        tracer(TraceEvent.Death, numbers.pop(ant))
 
-            # 2. Hop to next routers
-            if debug:
-                print(f"├──────────────────────────────────────────")
-                print(f"│ Commencing hop to next router. Activated {activate_ants()} ants ({len(ants)} ants in total).")
-                print(f"│ Current subnetwork pos / history:")
-                for ant in ants:
-                    print(f"│  - {id(ant)}: {ant.subnet} / {ant.get_history()}")
-                print(f"│ Status:")
-            else:
-                activate_ants()
+            next_frontier.extend(births)
+            frontier = next_frontier
+            check_budget()
 
-            for ant in ants:
-                if not ant.alive:
-                    continue
-
-                routers_at_pos = [r for r in subnets[ant.subnet] if not_visited('routers', r)]
+            # 2. Hop to next routers
+            next_frontier, births = deque(), []
+            while frontier:
+                ant = frontier.popleft()
+                ant.activate()
 
-                if debug:
-                    print(f"│  └ {id(ant)}: {routers_at_pos}")
+                routers_at_pos = [r for r in subnets[ant.subnet] if r not in visited['routers']]
 
                 # 2.1: One router
                 if len(routers_at_pos) == 0:
                     ant.kill()
-                    if debug:
-                        print(f"│    » DEAD | Already seen everything from this node")
+                    if tracer is not None:
+                        tracer(TraceEvent.Death, numbers.pop(ant))
                 elif len(routers_at_pos) == 1:
-                    check = ant.check_next_move(routers_at_pos[0])
-                    if discovery_type == 'sweep':
-                        if check is True:
-                            ant.move_to(routers_at_pos[0])
-                            visit('routers', routers_at_pos[0])
-
-                            if debug:
-                                print(f"│    » ALIVE | Discovered router {routers_at_pos[0]}")
-                        elif check is False:
-                            ant.kill()
-                            if debug:
-                                print(f"│    » DEAD | Found a dead end")
-                        else:
-                            raise Exception("Unexpected to happen at anytime")
-                    else:
-                        if check[0] is True:
-                            ant.move_to(routers_at_pos[0])
-                            visit('routers', routers_at_pos[0])
-                        elif check[0] is False:
-                            ant.kill()
-                        else:
-                            raise Exception("Unexpected to happen at anytime")
+                    ant.move_to(routers_at_pos[0])
+                    visit('routers', routers_at_pos[0], ant.subnet)
+                    next_frontier.append(ant)
+                    if tracer is not None:
+                        tracer(TraceEvent.Move, numbers[ant], 1, routers_at_pos[0])
 
                 # 2.2: Several routers, kills and births
                 else:
                     ant.kill()
 
-                    if debug:
-                        print(f"│    » DEAD | Found multiple possible paths. Giving birth to:")
                     for router in routers_at_pos:
-                        if not_visited('routers', router):
-                            if discovery_type == 'sweep':
-                                new_ant = SweepAnt(AntState.Waiting, {"router": router, "subnet": ant.subnet})
-                            else:
-                                new_ant = FindAnt(AntState.Waiting, {"router": router, "subnet": ant.subnet}, subnet_end)
-                            new_ant.feed_history("subnets", ant.get_history())
-
-                            visit('routers', router)
-                            if debug:
-                                print(f"│      » {id(new_ant)} : discovered {router}")
-
-                            ants.append(new_ant)
-
-            # 3. Cleaning up dead bodies
-            if debug:
-                print(f"├──────────────────────────────────────────")
-                print(f"│ Removing dead ants. Total ants: {len(ants)}")
-
-            for i in reversed(range(len(ants))):
-                if debug:
-                    print(f"│   » {id(ants[i])}: {ants[i].state}")
-                if ants[i].dead:
-                    ants.remove(ants[i])
-
-            if debug:
-                print(f"│ Ants remaining : {len(ants)}")
-                print(f"└──────────────────────────────────────────")
+                        child = new_ant(AntState.Waiting, router, ant.subnet, ant)
+                        visit('routers', router, ant.subnet)
+                        births.append(child)
+
+                    if tracer is not None:
+                        tracer(TraceEvent.Death, numbers.pop(ant))
+
+            next_frontier.extend(births)
+            frontier = next_frontier
 
         # RESULT
-        if debug:
-            print("Final state: ", visited)
-            print("----- PROCESS END -----")
+        if tracer is not None:
+            tracer(TraceEvent.End, spawned, widest)
+
+        if counters is not None:
+            counters['discoveries'] += 1
+            counters['ants'] += spawned
+            counters['max_frontier'] = max(counters['max_frontier'], widest)
 
         return visited, ants_at_objective
 
@@ -558,46 +626,299 @@ class AntsDiscovery:
         """
         Sweeps the network
 
-        We sweep the network from the master router and try to reach every subnetwork.
+        We check every subnetwork is reachable from the master router, by merging the subnetworks linked to a same
+        router in a disjoint-set forest (see connectivity.disconnected_subnets) rather than running the ants.
         This function is a suicider, as to say it will die by raising an error if any subnet is unreachable; else the
-        program will continue
+        program will continue. The error lists every group of subnetworks disconnected from the master router.
         """
 
-        master = self.master_router
-        subnet_start = list(self.routers[master].connected_networks.keys())[0]
+        subnet_start = list(self.routers[self.master_router].connected_networks.keys())[0]
+        raise_if_disconnected(self.subnets, disconnected_subnets(self.links, subnet_start))
 
-        result, _ = self.ants_discovery_process('sweep', self.links, subnet_start, debug=self.debug)
+    def empty_compact_hops(self):
+        """
+        Returns:
+            An empty PredecessorHops instance, sized for the network
+        """
 
-        for subnet in self.subnets:
-            if subnet not in result['subnets']:
-                inst = self.subnets[subnet]['instance']
-                total = len(self.subnets) - len(result['subnets'])
-                raise UnreachableNetwork(inst.name, inst.cidr, total)
+        return PredecessorHops(max(self.subnets, default=-1) + 1, max(self.routers, default=-1) + 1,
+                               self.hops_storage)
 
-    def calculate_hops(self):
+    def discover_from(self, subnet_start):
         """
-        Calculates the hops (path) for each tuple of the matrix
+        Runs the discovery needed to get the hops from a starting subnetwork
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+
+        Returns:
+            The predecessor array of the subnetwork with a compact hops storage, else the paths to every subnetwork
+        """
+
+        if self.hops_storage in PredecessorHops.storages:
+            visited, _ = self.ants_discovery_process('sweep', self.links, subnet_start, debug=self.debug,
+                                                     max_ants=self.max_ants, counters=self.counters, tracer=self.tracer)
+            self.counters['hops'] += len(visited['subnets']) - 1
+            return self.hops.build_tree(visited)
+
+        _, paths = self.ants_discovery_process('all', self.links, subnet_start, debug=self.debug,
+                                               max_ants=self.max_ants, counters=self.counters, tracer=self.tracer)
+        self.counters['hops'] += len(paths)
+        return paths
 
-        We calculate the hops for each matrix entry, and either keep the smallest one if there is
-        equitemporality, or store each hop for further analysis and calculus by another function
+    def store_hops_from(self, subnet_start, result):
         """
+        Stores the result of discover_from into the hops
 
-        for i in range(len(self.subnets_table)):
-            matrix = self.subnets_table[i]
-            s, e = matrix
+        Args:
+            subnet_start: The UID of the starting subnetwork
+            result: What discover_from returned for this subnetwork
+        """
 
-            _, at_objective = self.ants_discovery_process('find', self.links, s, e, debug=self.debug)
+        if self.hops_storage != 'dict':
+            self.hops.set_tree(subnet_start, result)
+            return
 
-            if self.debug:
-                print(f"matrix {matrix}: ", at_objective)
+        for e in self.subnets:
+            if e == subnet_start or e not in result:
+                continue
 
-            # If equitemporality is set to False, we take all the paths to calculate later
+            # If equitemporality is set to False, we keep the paths in a list to calculate later
             if self.equitemporality:
-                # Test if there are different paths, and pick the smaller one
-                if len(at_objective) == 1:
-                    # only one path found
-                    self.hops[(s, e)] = at_objective[0]
-                else:
-                    self.hops[(s, e)] = smaller_of_list(at_objective)
+                self.hops[(subnet_start, e)] = result[e]
             else:
-                self.hops[(s, e)] = at_objective
+                self.hops[(subnet_start, e)] = [result[e]]
+
+    def calculate_hops(self, workers=1):
+        """
+        Calculates the hops (path) for each tuple of the matrix
+
+        Instead of searching each matrix entry on its own, we run a single 'all' discovery from every starting
+        subnetwork, which gives the path to every other subnetwork at once. Since the ants move in rounds, the first
+        ant to discover a subnetwork always holds one of the smallest paths, so we get the same hops as a search would.
+
+        With a compact hops storage, we only keep the predecessors found by a sweep from each starting subnetwork. With
+        lazy hops, nothing is calculated here: the discoveries run when the hops are accessed.
+
+        With several workers, the starting subnetworks are split between processes. The results are stored in the
+        order of the starting subnetworks, so the hops are the same as with a single worker. Networks with less
+        starting subnetworks than parallel_threshold, or traced, are always processed by a single worker.
+
+        Args:
+            workers: The number of worker processes. None means as many as there are CPUs
+        """
+
+        if self.hops_storage == 'lazy':
+            self.hops = LazyHops(self.discover_from, self.subnets, self.cache_size)
+            return
+
+        if self.hops_storage != 'dict':
+            self.hops = self.empty_compact_hops()
+
+        sources = list(self.subnets)
+        workers = os.cpu_count() if workers is None else workers
+
+        # the tracer writes in this process, so traced discoveries are not sent to workers
+        if workers <= 1 or len(sources) < self.parallel_threshold or self.tracer is not None:
+            for s in sources:
+                self.store_hops_from(s, self.discover_from(s))
+            return
+
+        # one chunk per worker, so that each worker receives the links once, along with its starting subnetworks
+        chunk_size = -(-len(sources) // workers)
+        chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for results, counters in executor.map(partial(_discover_chunk, self), chunks):
+                for s, result in results:
+                    self.store_hops_from(s, result)
+                self.add_counters(counters)
+
+    def add_counters(self, counters):
+        """
+        Adds the counters of other discoveries (e.g. run by a worker process) to the counters
+
+        Args:
+            counters: The counters, see counters
+        """
+
+        for key in counters:
+            if key == 'max_frontier':
+                self.counters[key] = max(self.counters[key], counters[key])
+            else:
+                self.counters[key] += counters[key]
+
+    def prepare_changes(self):
+        """
+        Prepares the discovery to follow the changes of the network
+
+        Knowing which hops a change affects requires the predecessors of every discovery. With a compact hops storage,
+        they are the hops themselves; else, they are found once by sweeping the network from every subnetwork.
+        """
+
+        if self.trees is not None:
+            return
+
+        if self.hops_storage != 'dict':
+            self.trees = self.hops
+            return
+
+        self.trees = PredecessorHops(max(self.subnets, default=-1) + 1, max(self.routers, default=-1) + 1)
+        for s in self.subnets:
+            visited, _ = self.ants_discovery_process('sweep', self.links, s, debug=self.debug, max_ants=self.max_ants,
+                                                     counters=self.counters, tracer=self.tracer)
+            self.trees.add_tree(s, visited)
+
+    def orders(self):
+        """
+        Returns:
+            The DiscoveryOrder of every starting subnetwork, keyed by UID
+        """
+
+        self.prepare_changes()
+        return {s: DiscoveryOrder(self.links, self.trees, s) for s in self.trees.trees}
+
+    def disconnected_without(self, routers=(), subnets=(), links=()):
+        """
+        Lists the groups of subnetworks a removal would disconnect from the master router
+
+        Args:
+            routers: The UIDs of the removed routers
+            subnets: The UIDs of the removed subnetworks
+            links: The removed links, as (ROUTER_UID, SUBNET_UID) tuples
+
+        Returns:
+            The groups of the subnetworks UIDs left unreachable, see connectivity.disconnected_subnets
+        """
+
+        subnet_start = list(self.links['routers'][self.master_router])[0]
+        return disconnected_subnets(self.links, subnet_start, routers, subnets, links)
+
+    def learn(self, type_, uid):
+        """
+        Adds the links of a new router or subnetwork, already created in the network
+
+        Args:
+            type_: Either 'subnets' or 'routers'
+            uid: The UID of the router or subnetwork
+        """
+
+        if type_ == 'subnets':
+            self.links['subnets'][uid] = self.subnets[uid]['instance'].routers.keys()
+        else:
+            self.links['routers'][uid] = self.routers[uid].connected_networks.keys()
+
+        if self.trees is not None:
+            self.trees.resize(max(self.subnets, default=-1) + 1, max(self.routers, default=-1) + 1)
+
+    def forget(self, type_, uid):
+        """
+        Forgets a removed router or subnetwork, and the hops leading to or starting from it
+
+        Args:
+            type_: Either 'subnets' or 'routers'
+            uid: The UID of the router or subnetwork
+        """
+
+        del self.links[type_][uid]
+
+        if type_ == 'subnets':
+            self.trees.remove_tree(uid)
+            if self.hops_storage == 'dict':
+                for s in self.trees.trees:
+                    self.hops.pop((s, uid), None)
+                    self.hops.pop((uid, s), None)
+
+        for s in self.trees.trees:
+            self.trees.set_predecessor(s, type_, uid, -1)
+
+    def discover_leaf(self, type_, uid, parents):
+        """
+        Adds a new router or subnetwork to discoveries it does not change otherwise
+
+        Args:
+            type_: Either 'subnets' or 'routers'
+            uid: The UID of the router or subnetwork
+            parents: The UID of the neighbour it is discovered from, keyed by starting subnetwork UID
+        """
+
+        for s, parent in parents.items():
+            self.trees.set_predecessor(s, type_, uid, parent)
+
+            if type_ == 'subnets' and self.hops_storage == 'dict':
+                subnet = self.trees.predecessor(s, 'routers', parent)
+                self.hops[(s, uid)] = (self.hops[(s, subnet)] if subnet != s else []) + [parent]
+
+    def hops_from(self, sources):
+        """
+        Args:
+            sources: The UIDs of the starting subnetworks
+
+        Returns:
+            The hops from the starting subnetworks, as {START_UID: {END_UID: [ROUTER_UID, ...], ...}, ...}
+        """
+
+        return {s: {e: self.hops[(s, e)] for e in self.subnets if (s, e) in self.hops} for s in sources}
+
+    def recalculate_hops(self, sources, old=None):
+        """
+        Runs the discoveries from some starting subnetworks again
+
+        Args:
+            sources: The UIDs of the starting subnetworks
+            old: The hops from the starting subnetworks before the change, as returned by hops_from. Taken now if
+                not given
+
+        Returns:
+            The UIDs of the subnetworks whose hops from at least one of the starting subnetworks changed
+        """
+
+        old = self.hops_from(sources) if old is None else old
+        changed = set()
+
+        for s in sources:
+            if self.hops_storage != 'dict':
+                visited, _ = self.ants_discovery_process('sweep', self.links, s, debug=self.debug,
+                                                         max_ants=self.max_ants, counters=self.counters,
+                                                         tracer=self.tracer)
+                self.hops.add_tree(s, visited)
+            else:
+                visited, paths = self.ants_discovery_process('all', self.links, s, debug=self.debug,
+                                                             max_ants=self.max_ants, counters=self.counters,
+                                                             tracer=self.tracer)
+                self.trees.add_tree(s, visited)
+                self.store_hops_from(s, paths)
+                for e in old[s]:
+                    if e not in paths and (s, e) in self.hops:
+                        del self.hops[(s, e)]
+
+            changed.update(e for e in self.subnets if e != s and old[s].get(e) != self.hops.get((s, e)))
+
+        return changed
+
+    def __getstate__(self):
+        # the links are views on the network dictionaries, which cannot be pickled
+        state = self.__dict__.copy()
+        state['links'] = {type_: {uid: list(self.links[type_][uid]) for uid in self.links[type_]}
+                          for type_ in self.links}
+        # workers do not need the network itself, nor the hops
+        state['subnets'], state['routers'], state['trees'], state['tracer'] = {}, {}, None, None
+        if self.hops_storage == 'dict':
+            state['hops'] = {}
+        return state
+
+
+def _discover_chunk(discovery, sources):
+    """
+    Runs the discoveries of a chunk of starting subnetworks in a worker process
+
+    Args:
+        discovery: The (pickled) AntsDiscovery instance
+        sources: The UIDs of the starting subnetworks
+
+    Returns:
+        A list of (UID, result of discover_from) tuples, and the counters of the discoveries
+    """
+
+    discovery.counters = dict.fromkeys(discovery.counters, 0)
+    return [(s, discovery.discover_from(s)) for s in sources], discovery.counters
@@ -0,0 +1,150 @@
+from rth.core.errors import UnreachableNetwork
+## @package connectivity
+#
+#  The package of the connectivity check of the virtual network, made with a disjoint-set forest.
+
+
+class DisjointSet:
+    """
+    Disjoint-set forest (union-find) over hashable keys
+
+    Each set is a tree whose root stands for the set. The smaller tree is always attached under the root of the larger
+    one, and the paths are halved while looking for a root, so that any sequence of operations runs in near-linear
+    time.
+    """
+
+    ## The parent of each key, a root being its own parent
+    parents = None
+    ## The size of the tree of each root
+    sizes = None
+
+    def __init__(self, keys=()):
+        """
+        Init
+
+        Args:
+            keys: The keys, each starting in a set of its own
+        """
+
+        self.parents, self.sizes = {}, {}
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        """
+        Adds a key in a set of its own, unless it is already known
+
+        Args:
+            key: The key
+        """
+
+        if key not in self.parents:
+            self.parents[key] = key
+            self.sizes[key] = 1
+
+    def find(self, key):
+        """
+        Args:
+            key: A known key
+
+        Returns:
+            The root of the set of the key
+        """
+
+        parents = self.parents
+        while parents[key] != key:
+            # halving the path: each key on the way now points to its grandparent
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    def union(self, key, other):
+        """
+        Merges the sets of two known keys
+
+        Args:
+            key: A key
+            other: Another key
+
+        Returns:
+            The root of the merged set
+        """
+
+        key, other = self.find(key), self.find(other)
+        if key == other:
+            return key
+
+        if self.sizes[key] < self.sizes[other]:
+            key, other = other, key
+        self.parents[other] = key
+        self.sizes[key] += self.sizes.pop(other)
+        return key
+
+    def groups(self):
+        """
+        Returns:
+            The sets, as lists of keys in the order they were added, the sets ordered by their first key
+        """
+
+        groups = {}
+        for key in self.parents:
+            groups.setdefault(self.find(key), []).append(key)
+        return list(groups.values())
+
+
+def disconnected_subnets(links, subnet_start, routers=(), subnets=(), removed_links=()):
+    """
+    Lists the groups of subnetworks that cannot be reached from a subnetwork
+
+    Subnetworks linked to a same router are merged in a same set; the sets left apart from the one of the starting
+    subnetwork are the disconnected groups. Routers, subnetworks and links can be left out, to know what their removal
+    would disconnect.
+
+    Args:
+        links: The links, as prepared by AntsDiscovery.prepare_matrix_and_links
+        subnet_start: The UID of the starting subnetwork (e.g. the one of the master router)
+        routers: The UIDs of the routers left out
+        subnets: The UIDs of the subnetworks left out. If the starting subnetwork is one of them, every other
+            subnetwork is unreachable
+        removed_links: The links left out, as (ROUTER_UID, SUBNET_UID) tuples
+
+    Returns:
+        The groups of unreachable subnetworks UIDs, each in the order of the subnetworks. Empty if every subnetwork is
+        reachable
+    """
+
+    forest = DisjointSet(s for s in links['subnets'] if s not in subnets)
+
+    for router, linked in links['routers'].items():
+        if router in routers:
+            continue
+        linked = (s for s in linked if s not in subnets and (router, s) not in removed_links)
+        first = next(linked, None)
+        for subnet in linked:
+            forest.union(first, subnet)
+
+    if subnet_start in subnets:
+        return forest.groups()
+
+    root = forest.find(subnet_start)
+    return [group for group in forest.groups() if forest.find(group[0]) != root]
+
+
+def raise_if_disconnected(subnets, groups):
+    """
+    Raises UnreachableNetwork if some subnetworks are disconnected from the master router
+
+    Args:
+        subnets: The subnetworks of the virtual network
+        groups: The groups of unreachable subnetworks UIDs, as returned by disconnected_subnets
+
+    Raises:
+        UnreachableNetwork: if there is any group, naming the first subnetwork and listing every group
+    """
+
+    if not groups:
+        return
+
+    first = subnets[groups[0][0]]['instance']
+    raise UnreachableNetwork(first.name, first.cidr, sum(len(group) for group in groups),
+                             [[subnets[uid]['instance'].name for uid in group] for group in groups])
@@ -0,0 +1,247 @@
+## @package discovery_order
+#
+#  The package that replays the order of the Ants process, used to know which hops a change of the network affects.
+
+
+class DiscoveryOrder:
+    """
+    Replays the order in which the Ants process handled the routers and subnetworks of a discovery
+
+    The Ants process goes by rounds: everything discovered during a round is handled (its ant hops further) during the
+    next one. Within a round, the ants that moved keep their order and come first, and the newborns follow in the order
+    of their mothers, then in the order of the links. The order of a discovery can thus be rebuilt from its
+    predecessors and the links, without running it again.
+
+    Routers and subnetworks are given as (TYPE, UID) tuples, TYPE being either 'subnets' or 'routers'. The depth of the
+    starting subnetwork is 0, the depth of anything else is the depth of its predecessor plus one.
+    """
+
+    def __init__(self, links, trees, subnet_start):
+        """
+        Init
+
+        Args:
+            links: The links prepared in AntsDiscovery.prepare_matrix_and_links
+            trees: The predecessors of the discoveries, as a PredecessorHops instance
+            subnet_start: The UID of the starting subnetwork of the discovery
+        """
+
+        self.links = links
+        self.trees = trees
+        self.subnet_start = subnet_start
+        self.start = ('subnets', subnet_start)
+
+        self.__depths = {self.start: 0}
+        self.__keys = {self.start: ()}
+        self.__children = {}
+
+    @staticmethod
+    def other(type_):
+        """
+        Returns:
+            'routers' for 'subnets', and 'subnets' for 'routers'
+        """
+
+        return 'routers' if type_ == 'subnets' else 'subnets'
+
+    def parent(self, node):
+        """
+        Args:
+            node: The router or subnetwork
+
+        Returns:
+            The router or subnetwork it was discovered from, None for the starting subnetwork and what was not
+            discovered
+        """
+
+        if node == self.start:
+            return None
+
+        pred = self.trees.predecessor(self.subnet_start, *node)
+        return (self.other(node[0]), pred) if pred >= 0 else None
+
+    def discovered(self, node):
+        """
+        Args:
+            node: The router or subnetwork
+
+        Returns:
+            Whether the discovery reached it
+        """
+
+        return node == self.start or self.parent(node) is not None
+
+    def children(self, node):
+        """
+        Args:
+            node: The router or subnetwork
+
+        Returns:
+            What was discovered from it, in the order of the links
+        """
+
+        if node not in self.__children:
+            type_ = self.other(node[0])
+            self.__children[node] = [(type_, uid) for uid in self.links[node[0]][node[1]]
+                                     if self.parent((type_, uid)) == node]
+
+        return self.__children[node]
+
+    def depth(self, node):
+        """
+        Args:
+            node: A discovered router or subnetwork
+
+        Returns:
+            Its depth
+        """
+
+        path = []
+        while node not in self.__depths:
+            path.append(node)
+            node = self.parent(node)
+
+        depth = self.__depths[node]
+        for node in reversed(path):
+            depth += 1
+            self.__depths[node] = depth
+
+        return depth
+
+    def key(self, node):
+        """
+        Gives the position of a router or subnetwork in its round
+
+        Args:
+            node: A discovered router or subnetwork
+
+        Returns:
+            A key that sorts the routers and subnetworks of a same depth in the order their ants were handled
+        """
+
+        path = []
+        while node not in self.__keys:
+            path.append(node)
+            node = self.parent(node)
+
+        key = self.__keys[node]
+        for node in reversed(path):
+            parent = self.parent(node)
+            siblings = self.children(parent)
+            # ants that moved come before the newborns. Ants of the starting subnetwork all start together
+            moved = parent != self.start and len(siblings) == 1
+            key = (0 if moved else 1, key, siblings.index(node))
+            self.__keys[node] = key
+
+        return key
+
+    def __sees_undiscovered(self, node, other):
+        # whether 'other' would still be undiscovered when the ant of 'node' hops further
+        if not self.discovered(node):
+            return False
+        if not self.discovered(other):
+            return True
+
+        depth, other_depth = self.depth(node), self.depth(other)
+        if other_depth <= depth:
+            return False
+        if other_depth == depth + 1:
+            # both handled during the same round: it depends on which comes first
+            return self.key(node) < self.key(self.parent(other))
+        return True
+
+    def affected_by_new_link(self, router, subnet):
+        """
+        Whether linking a router to a subnetwork changes the discovery
+
+        The new link is supposed to come last in the links of both the router and the subnetwork.
+
+        Args:
+            router: The UID of the router
+            subnet: The UID of the subnetwork
+
+        Returns:
+            True if the discovery changes
+        """
+
+        router, subnet = ('routers', router), ('subnets', subnet)
+        return self.__sees_undiscovered(router, subnet) or self.__sees_undiscovered(subnet, router)
+
+    def affected_by_removed_link(self, router, subnet):
+        """
+        Whether unlinking a router from a subnetwork changes the discovery
+
+        A link the discovery did not go through is only ever seen leading to something already discovered, so removing
+        it changes nothing.
+
+        Args:
+            router: The UID of the router
+            subnet: The UID of the subnetwork
+
+        Returns:
+            True if the discovery changes
+        """
+
+        router, subnet = ('routers', router), ('subnets', subnet)
+        return self.parent(subnet) == router or self.parent(router) == subnet
+
+    def affected_by_removal(self, node):
+        """
+        Whether removing a router or a subnetwork, with its links, changes the discovery besides forgetting it
+
+        Args:
+            node: The router or subnetwork
+
+        Returns:
+            True if the discovery changes
+        """
+
+        if not self.discovered(node):
+            return False
+        if self.children(node):
+            return True
+
+        # a dead end can go, unless the only other ant of its mother would now move instead of being born
+        parent = self.parent(node)
+        return parent != self.start and len(self.children(parent)) == 2
+
+    def affected_by_addition(self, type_, neighbours):
+        """
+        Whether adding a router or a subnetwork, with its links, changes the discovery besides discovering it
+
+        The new links are supposed to come last in the links of the neighbours.
+
+        Args:
+            type_: Either 'subnets' or 'routers'
+            neighbours: The UIDs of the routers or subnetworks it is linked to, in the order of its links
+
+        Returns:
+            Whether the discovery changes, and the UID of the neighbour it is discovered from (None if it is not
+            discovered)
+        """
+
+        nodes = [(self.other(type_), uid) for uid in neighbours]
+        found = [node for node in nodes if self.discovered(node)]
+        if not found:
+            return False, None
+
+        first = min(found, key=lambda node_: (self.depth(node_), self.key(node_)))
+        if len(found) < len(nodes):
+            return True, first[1]
+
+        siblings = len(self.children(first))
+        if first != self.start and siblings == 1:
+            return True, first[1]
+
+        # the new one must find all its neighbours discovered when its ant hops further
+        depth = self.depth(first) + 1
+        key = (0 if first != self.start and not siblings else 1, self.key(first), siblings)
+        for node in found:
+            node_depth = self.depth(node)
+            if node_depth == depth - 1:
+                continue
+            if node_depth == depth + 1 and self.key(self.parent(node)) < key:
+                continue
+            return True, first[1]
+
+        return False, first[1]
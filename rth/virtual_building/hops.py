@@ -0,0 +1,311 @@
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+## @package hops
+#
+#  The package that contains the alternative storages of the hops: compact, based on predecessor trees, and lazy.
+
+
+class PredecessorHops(Mapping):
+    """
+    Compact storage of the hops
+
+    Instead of one list of routers for every (start, end) tuple, we keep one predecessor array per starting subnetwork:
+    each subnetwork holds the UID of the router it was discovered from, and each router the UID of the subnetwork it
+    was discovered from. Paths are rebuilt on demand when accessed, with hops[(start, end)] like with a dictionary.
+
+    In the arrays, subnetworks are stored first and routers after them; -1 means "no predecessor".
+    """
+
+    ## The storages available for the predecessor arrays
+    storages = ('array', 'numpy')
+
+    ## The predecessor arrays, keyed by starting subnetwork UID
+    trees = None
+
+    def __init__(self, subnets_slots, routers_slots, storage='array'):
+        """
+        Init
+
+        Args:
+            subnets_slots: The number of subnetworks slots in the arrays (the greatest subnetwork UID, plus one)
+            routers_slots: The number of routers slots in the arrays (the greatest router UID, plus one)
+            storage: Either 'array' (arrays of the standard library) or 'numpy' (numpy int32 arrays)
+
+        Raises:
+            ValueError: if the storage is unknown
+            ImportError: if the storage is 'numpy' and numpy is not installed
+        """
+
+        if storage not in self.storages:
+            raise ValueError(f"Unknown hops storage '{storage}'. Available storages: {', '.join(self.storages)}")
+        if storage == 'numpy' and np is None:
+            raise ImportError("The numpy hops storage requires numpy. Install it with 'pip install numpy'")
+
+        self.subnets_slots = subnets_slots
+        self.routers_slots = routers_slots
+        self.storage = storage
+
+        self.trees = {}
+        self.__length = 0
+
+    def empty_tree(self):
+        """
+        Returns:
+            A predecessor array with no predecessor set
+        """
+
+        size = self.subnets_slots + self.routers_slots
+
+        if self.storage == 'numpy':
+            return np.full(size, -1, dtype=np.int32)
+        return array('i', [-1]) * size
+
+    def build_tree(self, visited):
+        """
+        Builds a predecessor array from the predecessors found by a discovery
+
+        Args:
+            visited: The visited subnetworks and routers, as returned by AntsDiscovery.ants_discovery_process
+
+        Returns:
+            The predecessor array
+        """
+
+        tree = self.empty_tree()
+
+        for subnet, router in visited['subnets'].items():
+            if router is not None:
+                tree[subnet] = router
+        for router, subnet in visited['routers'].items():
+            tree[self.subnets_slots + router] = subnet
+
+        return tree
+
+    def add_tree(self, subnet_start, visited):
+        """
+        Stores the predecessors found by a discovery
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+            visited: The visited subnetworks and routers, as returned by AntsDiscovery.ants_discovery_process
+        """
+
+        self.set_tree(subnet_start, self.build_tree(visited))
+
+    def set_tree(self, subnet_start, tree):
+        """
+        Stores a ready predecessor array
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+            tree: The predecessor array
+        """
+
+        if subnet_start in self.trees:
+            self.__length -= self.__reachable(subnet_start)
+
+        self.trees[subnet_start] = tree
+        self.__length += self.__reachable(subnet_start)
+
+    def remove_tree(self, subnet_start):
+        """
+        Forgets the predecessors of a starting subnetwork
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+        """
+
+        if subnet_start in self.trees:
+            self.__length -= self.__reachable(subnet_start)
+            del self.trees[subnet_start]
+
+    def resize(self, subnets_slots, routers_slots):
+        """
+        Grows the predecessor arrays, to make room for new subnetworks or routers
+
+        Args:
+            subnets_slots: The new number of subnetworks slots. Never less than the current one
+            routers_slots: The new number of routers slots. Never less than the current one
+        """
+
+        subnets_slots, routers_slots = max(subnets_slots, self.subnets_slots), max(routers_slots, self.routers_slots)
+        if (subnets_slots, routers_slots) == (self.subnets_slots, self.routers_slots):
+            return
+
+        old_subnets_slots = self.subnets_slots
+        self.subnets_slots, self.routers_slots = subnets_slots, routers_slots
+
+        for subnet_start, old in self.trees.items():
+            tree = self.empty_tree()
+            tree[:old_subnets_slots] = old[:old_subnets_slots]
+            tree[subnets_slots:subnets_slots + len(old) - old_subnets_slots] = old[old_subnets_slots:]
+            self.trees[subnet_start] = tree
+
+    def predecessor(self, subnet_start, type_, uid):
+        """
+        Get the predecessor of a subnetwork or a router, in the discovery from a starting subnetwork
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+            type_: Either 'subnets' or 'routers'
+            uid: The UID of the subnetwork or router
+
+        Returns:
+            The UID of the predecessor, or -1 if there is none
+        """
+
+        slots = self.subnets_slots if type_ == 'subnets' else self.routers_slots
+        if not 0 <= uid < slots:
+            return -1
+
+        return int(self.trees[subnet_start][uid if type_ == 'subnets' else self.subnets_slots + uid])
+
+    def set_predecessor(self, subnet_start, type_, uid, pred):
+        """
+        Changes the predecessor of a subnetwork or a router, in the discovery from a starting subnetwork
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+            type_: Either 'subnets' or 'routers'
+            uid: The UID of the subnetwork or router
+            pred: The UID of the new predecessor, or -1 to remove it
+        """
+
+        tree = self.trees[subnet_start]
+
+        if type_ == 'subnets':
+            self.__length += int(pred >= 0) - int(tree[uid] >= 0)
+            tree[uid] = pred
+        else:
+            tree[self.subnets_slots + uid] = pred
+
+    def __reachable(self, subnet_start):
+        # the starting subnetwork has no predecessor, so it is never counted
+        return sum(1 for pred in self.trees[subnet_start][:self.subnets_slots] if pred >= 0)
+
+    def __getitem__(self, matrix):
+        s, e = matrix
+
+        tree = self.trees.get(s)
+        if tree is None or s == e or not 0 <= e < self.subnets_slots or tree[e] < 0:
+            raise KeyError(matrix)
+
+        path = []
+        subnet = e
+        while subnet != s:
+            router = int(tree[subnet])
+            path.append(router)
+            subnet = int(tree[self.subnets_slots + router])
+
+        path.reverse()
+        return path
+
+    def __iter__(self):
+        for s, tree in self.trees.items():
+            for e in range(self.subnets_slots):
+                if e != s and tree[e] >= 0:
+                    yield s, e
+
+    def __len__(self):
+        return self.__length
+
+
+class LazyHops(Mapping):
+    """
+    Hops calculated on demand
+
+    A single discovery gives the paths from a starting subnetwork to every other one, so they are calculated together on
+    the first access to one of them, with hops[(start, end)] like with a dictionary. The paths of the most recently used
+    starting subnetworks are kept in a cache; the least recently used ones are dropped when it is full, and calculated
+    again if needed.
+
+    Every subnetwork is supposed to be reachable from every other one, which the sweep of the network makes sure of.
+    """
+
+    ## The paths kept in the cache, keyed by starting subnetwork UID, the least recently used first
+    cache = None
+
+    def __init__(self, discover, subnets, cache_size=256):
+        """
+        Init
+
+        Args:
+            discover: A function that takes the UID of a starting subnetwork, and returns the paths to every other
+                subnetwork, keyed by subnetwork UID
+            subnets: The subnetworks data
+            cache_size: The number of starting subnetworks whose paths are kept. None means no limit
+        """
+
+        self.discover = discover
+        self.subnets = subnets
+        self.cache_size = cache_size
+
+        self.cache = OrderedDict()
+        self.hits, self.misses = 0, 0
+
+    def paths_from(self, subnet_start):
+        """
+        Get the paths from a starting subnetwork, from the cache if they are in it
+
+        Args:
+            subnet_start: The UID of the starting subnetwork
+
+        Returns:
+            The paths to every other subnetwork, keyed by subnetwork UID
+        """
+
+        if subnet_start in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(subnet_start)
+            return self.cache[subnet_start]
+
+        self.misses += 1
+        paths = self.discover(subnet_start)
+        self.cache[subnet_start] = paths
+
+        if self.cache_size is not None and len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return paths
+
+    def cache_info(self):
+        """
+        Returns:
+            The hits, misses, size limit and current size of the cache, as a dictionary
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'cache_size': self.cache_size, 'size': len(self.cache)}
+
+    def clear(self):
+        """
+        Empties the cache, the hits and misses counters are kept
+        """
+
+        self.cache.clear()
+
+    def __getitem__(self, matrix):
+        s, e = matrix
+
+        if s == e or s not in self.subnets or e not in self.subnets:
+            raise KeyError(matrix)
+
+        paths = self.paths_from(s)
+        if e not in paths:
+            raise KeyError(matrix)
+
+        return paths[e]
+
+    def __iter__(self):
+        for s in list(self.subnets):
+            for e in self.subnets:
+                if e != s:
+                    yield s, e
+
+    def __len__(self):
+        return len(self.subnets) * (len(self.subnets) - 1)
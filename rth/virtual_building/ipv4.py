@@ -0,0 +1,328 @@
+from bisect import bisect_right
+## @package ipv4
+#
+#  The package of the 32-bit integer representation of the IPv4 addresses and prefixes, used inside the virtual network.
+#  Addresses are only turned into dotted strings for the output.
+
+
+def ip_to_int(ip):
+    """
+    Get the integer of an IPv4 address
+
+    Args:
+        ip: The address, either a dotted string, an integer, or any object whose string is a dotted address (e.g. a
+            nettools FourBytesLiteral)
+
+    Returns:
+        The address, as an integer
+
+    Raises:
+        ValueError: if the address is wrongly formed
+
+    Examples:
+        >>> ip_to_int("192.168.1.254")
+        3232236030
+    """
+
+    if isinstance(ip, int):
+        if not 0 <= ip <= 0xFFFFFFFF:
+            raise ValueError(f"'{ip}' is not an IPv4 address")
+        return ip
+
+    parts = str(ip).split('.')
+    # an empty part makes int() fail, anything else than digits is caught by isdigit()
+    if len(parts) == 4 and ''.join(parts).isdigit():
+        try:
+            a, b, c, d = map(int, parts)
+        except ValueError:
+            pass
+        else:
+            if a <= 255 and b <= 255 and c <= 255 and d <= 255:
+                return (a << 24) | (b << 16) | (c << 8) | d
+
+    raise ValueError(f"'{ip}' is not an IPv4 address")
+
+
+def int_to_ip(value):
+    """
+    Get the dotted string of an IPv4 address
+
+    Args:
+        value: The address, as an integer
+
+    Returns:
+        The dotted address
+
+    Examples:
+        >>> int_to_ip(3232236030)
+        '192.168.1.254'
+    """
+
+    return f"{value >> 24 & 255}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+def mask_length(mask):
+    """
+    Get the length of a network mask
+
+    Args:
+        mask: The mask, either a length or a dotted literal (e.g. "255.255.255.0")
+
+    Returns:
+        The number of bits of the mask
+
+    Raises:
+        ValueError: if the mask is wrongly formed
+    """
+
+    if isinstance(mask, str) and '.' in mask:
+        length = bin(ip_to_int(mask)).count('1')
+        if ip_to_int(mask) != mask_of(length):
+            raise ValueError(f"'{mask}' is not a network mask")
+        return length
+
+    length = int(mask)
+    if not 0 <= length <= 32:
+        raise ValueError(f"'{mask}' is not a network mask")
+    return length
+
+
+def mask_of(length):
+    """
+    Args:
+        length: The length of a network mask
+
+    Returns:
+        The mask, as an integer
+    """
+
+    return (0xFFFFFFFF << (32 - length)) & 0xFFFFFFFF
+
+
+def network_bounds(ip, length):
+    """
+    Get the first and last addresses of the network of an address
+
+    Args:
+        ip: The address, as an integer
+        length: The length of the network mask
+
+    Returns:
+        The network address and the broadcast address, as integers
+
+    Examples:
+        >>> network_bounds(ip_to_int("10.5.1.130"), 24) == (ip_to_int("10.5.1.0"), ip_to_int("10.5.1.255"))
+        True
+    """
+
+    start = ip & mask_of(length)
+    return start, start | (~mask_of(length) & 0xFFFFFFFF)
+
+
+class RangeIndex:
+    """
+    Sorted index of disjoint address ranges
+
+    The ranges are kept sorted by first address. As they never overlap each other, the only range a new one can overlap
+    is the last one starting before its end, found by bisection.
+    """
+
+    ## The first addresses of the ranges, sorted
+    starts = None
+    ## The last addresses of the ranges, in the order of starts
+    ends = None
+    ## The keys of the ranges (e.g. the subnetworks UIDs), in the order of starts
+    keys = None
+
+    def __init__(self):
+        """
+        Init
+        """
+
+        self.starts, self.ends, self.keys = [], [], []
+
+    def overlapping(self, start, end):
+        """
+        Get the range overlapping an address range
+
+        Args:
+            start: The first address, as an integer
+            end: The last address, as an integer
+
+        Returns:
+            The key of the range overlapping it, or None if there is none
+        """
+
+        i = bisect_right(self.starts, end) - 1
+        if i >= 0 and self.ends[i] >= start:
+            return self.keys[i]
+        return None
+
+    def add(self, start, end, key):
+        """
+        Adds a range, supposed not to overlap any other
+
+        Args:
+            start: The first address, as an integer
+            end: The last address, as an integer
+            key: The key of the range
+        """
+
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.keys.insert(i, key)
+
+    def remove(self, start):
+        """
+        Removes a range
+
+        Args:
+            start: The first address of the range, as an integer
+        """
+
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.starts[i] == start:
+            del self.starts[i], self.ends[i], self.keys[i]
+
+    def __iter__(self):
+        return zip(self.starts, self.ends, self.keys)
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class AddressAllocator:
+    """
+    Bitmap of the used host addresses of a network
+
+    Addresses are handed out from the top of the network (the address before the broadcast address) down. Bit K of
+    the bitmap stands for the K-th host address from the top, and a cursor remembers the first bit that may be free, so
+    that each allocation only looks at the bits after the previous one. The bitmap is only created on the first use,
+    large networks often holding a handful of routers.
+    """
+
+    ## The bitmap, one bit per host address, the top address first
+    bitmap = None
+
+    def __init__(self, start, end):
+        """
+        Init
+
+        Args:
+            start: The network address, as an integer
+            end: The broadcast address, as an integer
+        """
+
+        self.start, self.end = start, end
+        self.size = max(end - start - 1, 0)
+        self.used = 0
+        self.cursor = 0
+        self.bitmap = None
+
+    def __bit(self, ip):
+        # the position of an address in the bitmap, None if it is not a host address
+        bit = self.end - 1 - ip
+        return bit if 0 <= bit < self.size else None
+
+    def __set(self, bit, used):
+        if self.bitmap is None:
+            self.bitmap = bytearray((self.size + 7) // 8)
+
+        byte, mask = bit >> 3, 1 << (bit & 7)
+        if bool(self.bitmap[byte] & mask) == used:
+            return
+        self.bitmap[byte] ^= mask
+        self.used += 1 if used else -1
+
+    def is_used(self, ip):
+        """
+        Args:
+            ip: The address, as an integer
+
+        Returns:
+            Whether the address is used. Addresses off the hosts of the network are never used
+        """
+
+        bit = self.__bit(ip)
+        if bit is None or self.bitmap is None:
+            return False
+        return bool(self.bitmap[bit >> 3] & 1 << (bit & 7))
+
+    def mark(self, ip):
+        """
+        Marks an address as used
+
+        Args:
+            ip: A host address of the network, as an integer
+        """
+
+        bit = self.__bit(ip)
+        if bit is not None:
+            self.__set(bit, True)
+
+    def release(self, ip):
+        """
+        Marks an address as free
+
+        Args:
+            ip: A host address of the network, as an integer
+        """
+
+        bit = self.__bit(ip)
+        if bit is not None:
+            self.__set(bit, False)
+            self.cursor = min(self.cursor, bit)
+
+    def allocate(self):
+        """
+        Hands out the highest free address
+
+        Returns:
+            The address, as an integer, or None if the network is full
+        """
+
+        if self.used >= self.size:
+            return None
+        if self.bitmap is None:
+            self.bitmap = bytearray((self.size + 7) // 8)
+
+        bitmap, bit = self.bitmap, self.cursor
+        while True:
+            byte = bitmap[bit >> 3]
+            if byte == 0xFF:
+                # a full byte: skipping its 8 addresses at once
+                bit = (bit | 7) + 1
+                continue
+            if not byte & 1 << (bit & 7):
+                break
+            bit += 1
+
+        self.cursor = bit + 1
+        self.__set(bit, True)
+        return self.end - 1 - bit
+
+    def allocate_many(self, count):
+        """
+        Hands out the highest free addresses
+
+        Args:
+            count: The number of addresses
+
+        Returns:
+            The addresses, as integers, from the highest down, or None if the network has not enough free addresses
+            (nothing is then allocated)
+        """
+
+        if self.size - self.used < count:
+            return None
+        return [self.allocate() for _ in range(count)]
+
+    def stats(self):
+        """
+        Returns:
+            The number of host addresses, of the used and free ones, and the share of the used ones, as a dictionary
+        """
+
+        return {'size': self.size, 'used': self.used, 'free': self.size - self.used,
+                'utilization': self.used / self.size if self.size else 1.0}
@@ -0,0 +1,257 @@
+from array import array
+from rth.virtual_building.connectivity import disconnected_subnets, raise_if_disconnected
+from rth.virtual_building.ants import AntsDiscovery
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+## @package matrix_discovery
+#
+#  The package that contains the vectorized alternative to the Ants process, based on numpy.
+
+
+class MatrixDiscovery(AntsDiscovery):
+    """
+    Vectorized discovery of the network, based on a routers/subnetworks incidence matrix
+
+    Instead of sending ants through the network, this class builds the incidence matrix of the subnetworks and the
+    routers, then computes the breadth-first layers of every starting subnetwork at once with matrix products. The
+    sweep and the hops are both derived from these layers.
+
+    When several paths of the same length exist, the path going through the routers and subnetworks of the smallest
+    UIDs is picked, which may differ from the choice made by the ants.
+
+    Requires numpy.
+    """
+
+    ## Distances (in routers) between subnetworks, as a matrix indexed by position in the subnetworks UIDs
+    distances = None
+
+    def __init__(self, subnets, routers, equitemporality=True, debug=False, hops_storage='dict', chunk_size=256):
+        """
+        Init
+
+        Args:
+            subnets: The subnetworks data
+            routers: The routers data
+            equitemporality: The equitemporality tweaker
+            debug: Debug param
+            hops_storage: How the hops are stored, see AntsDiscovery
+            chunk_size: The number of starting subnetworks processed at once when building paths. Bounds the memory
+                used by the intermediate matrices
+
+        Raises:
+            ImportError: if numpy is not installed
+        """
+
+        if np is None:
+            raise ImportError("The numpy engine requires numpy. Install it with 'pip install numpy'")
+
+        super().__init__(subnets, routers, equitemporality, debug=debug, hops_storage=hops_storage)
+        self.chunk_size = chunk_size
+
+        self.subnets_uids = sorted(self.subnets)
+        self.routers_uids = sorted(self.routers)
+        self.__edges = None
+
+    def edges(self):
+        """
+        Lists the links between routers and subnetworks
+
+        Returns:
+            Two arrays of the same length, holding the subnetwork index and the router index of each link. Indexes are
+            positions in the sorted subnetworks and routers UIDs
+        """
+
+        if self.__edges is None:
+            index = {uid: i for i, uid in enumerate(self.subnets_uids)}
+            es, er = [], []
+
+            for j, r in enumerate(self.routers_uids):
+                for s in self.links['routers'][r]:
+                    es.append(index[s])
+                    er.append(j)
+
+            self.__edges = np.array(es, dtype=np.intp), np.array(er, dtype=np.intp)
+
+        return self.__edges
+
+    def compute_layers(self):
+        """
+        Computes the breadth-first layers of every subnetwork at once
+
+        A subnetwork reachable through k routers from a starting subnetwork belongs to the k-th layer of said starting
+        subnetwork. The layers are computed with products of boolean matrices: the next layer is the set of
+        subnetworks adjacent to the current layer, which were not reached before.
+
+        Returns:
+            The distances matrix, with -1 for unreachable subnetworks
+        """
+
+        if self.distances is not None:
+            return self.distances
+
+        es, er = self.edges()
+        size = len(self.subnets_uids)
+
+        incidence = np.zeros((size, len(self.routers_uids)), dtype=np.float32)
+        incidence[es, er] = 1
+        # two subnetworks are adjacent when they share at least a router
+        adjacency = ((incidence @ incidence.T) > 0).astype(np.float32)
+
+        distances = np.full((size, size), -1, dtype=np.int32)
+        np.fill_diagonal(distances, 0)
+        reached = np.eye(size, dtype=bool)
+        layer = reached.copy()
+
+        depth = 0
+        while True:
+            depth += 1
+            layer = ((layer.astype(np.float32) @ adjacency) > 0) & ~reached
+            if not layer.any():
+                break
+            distances[layer] = depth
+            reached |= layer
+
+        self.distances = distances
+        return distances
+
+    def sweep_network(self):
+        """
+        Sweeps the network
+
+        Reads the layers of the subnetwork attached to the master router to check every subnetwork is reachable.
+        Like its ants counterpart, this function is a suicider.
+        """
+
+        distances = self.compute_layers()
+
+        subnet_start = list(self.routers[self.master_router].connected_networks.keys())[0]
+        row = distances[self.subnets_uids.index(subnet_start)]
+        unreachable = np.flatnonzero(row < 0)
+
+        if len(unreachable):
+            # the groups are only looked for to report them
+            raise_if_disconnected(self.subnets, disconnected_subnets(self.links, subnet_start))
+
+    @staticmethod
+    def __first_per_group(candidates, starts):
+        """
+        Finds the first candidate of each group of links
+
+        Args:
+            candidates: A boolean matrix of (starting subnetworks, links), the links being sorted by group
+            starts: The index of the first link of each group
+
+        Returns:
+            A matrix of (starting subnetworks, groups) holding the index of the first candidate link, or -1
+        """
+
+        total = candidates.shape[1]
+        score = np.where(candidates, total - np.arange(total, dtype=np.int32), 0).astype(np.int32)
+        best = np.maximum.reduceat(score, starts, axis=1)
+        return np.where(best > 0, total - best, -1)
+
+    def predecessors(self, rows):
+        """
+        Builds the predecessors of each router and subnetwork, for a set of starting subnetworks
+
+        The predecessor of a subnetwork is the router of smallest UID connected to it, one layer closer to the start.
+        The predecessor of a router is the subnetwork of smallest UID connected to it, in the closest layer.
+
+        Args:
+            rows: The indexes of the starting subnetworks
+
+        Returns:
+            The predecessors of the subnetworks and the predecessors of the routers, as matrices of indexes with -1
+            when there is no predecessor
+        """
+
+        distances = self.compute_layers()[rows]
+        es, er = self.edges()
+        unreachable = np.iinfo(np.int32).max
+        distances = np.where(distances < 0, unreachable, distances)
+
+        subnets_pred = np.full(distances.shape, -1, dtype=np.intp)
+        routers_pred = np.full((len(rows), len(self.routers_uids)), -1, dtype=np.intp)
+
+        if not len(es):
+            return subnets_pred, routers_pred
+
+        # links sorted by router, then by subnetwork
+        order = np.lexsort((es, er))
+        r_es, r_er = es[order], er[order]
+        starts = np.flatnonzero(np.r_[True, r_er[1:] != r_er[:-1]])
+
+        # layer of the closest subnetwork connected to each router
+        routers_depth = np.full(routers_pred.shape, unreachable, dtype=np.int32)
+        routers_depth[:, r_er[starts]] = np.minimum.reduceat(distances[:, r_es], starts, axis=1)
+
+        candidates = (distances[:, r_es] == routers_depth[:, r_er]) & (routers_depth[:, r_er] != unreachable)
+        first = self.__first_per_group(candidates, starts)
+        routers_pred[:, r_er[starts]] = np.where(first >= 0, r_es[first], -1)
+
+        # links sorted by subnetwork, then by router
+        order = np.lexsort((er, es))
+        s_es, s_er = es[order], er[order]
+        starts = np.flatnonzero(np.r_[True, s_es[1:] != s_es[:-1]])
+
+        candidates = routers_depth[:, s_er] == distances[:, s_es] - 1
+        first = self.__first_per_group(candidates, starts)
+        subnets_pred[:, s_es[starts]] = np.where(first >= 0, s_er[first], -1)
+
+        return subnets_pred, routers_pred
+
+    def calculate_hops(self, workers=1):
+        """
+        Calculates the hops (path) for each tuple of the matrix
+
+        The paths are rebuilt from the predecessors of each starting subnetwork, closest subnetworks first, so that
+        each path extends an already built one. With a compact hops storage, the predecessors are stored as they are.
+
+        Args:
+            workers: Ignored, the matrix products already run on every CPU through numpy
+        """
+
+        distances = self.compute_layers()
+        size = len(self.subnets_uids)
+
+        if self.hops_storage != 'dict':
+            self.hops = self.empty_compact_hops()
+            subnets_uids, routers_uids = np.array(self.subnets_uids), np.array(self.routers_uids)
+
+        for chunk in range(0, size, self.chunk_size):
+            rows = np.arange(chunk, min(chunk + self.chunk_size, size))
+            subnets_pred, routers_pred = self.predecessors(rows)
+
+            if self.hops_storage != 'dict':
+                for k, i in enumerate(rows.tolist()):
+                    tree = np.full(self.hops.subnets_slots + self.hops.routers_slots, -1, dtype=np.int32)
+                    known = subnets_pred[k] >= 0
+                    tree[subnets_uids[known]] = routers_uids[subnets_pred[k][known]]
+                    known = routers_pred[k] >= 0
+                    tree[self.hops.subnets_slots + routers_uids[known]] = subnets_uids[routers_pred[k][known]]
+
+                    if self.hops.storage != 'numpy':
+                        tree = array('i', tree.tolist())
+                    self.hops.set_tree(self.subnets_uids[i], tree)
+                continue
+
+            for k, i in enumerate(rows.tolist()):
+                built = {i: []}
+                row, preds, routers = distances[i], subnets_pred[k].tolist(), routers_pred[k].tolist()
+
+                for e in np.argsort(row, kind='stable').tolist():
+                    if row[e] <= 0:
+                        continue
+                    r = preds[e]
+                    built[e] = built[routers[r]] + [self.routers_uids[r]]
+
+                start = self.subnets_uids[i]
+                for e in range(size):
+                    if e != i and e in built:
+                        self.hops[(start, self.subnets_uids[e])] = built[e] if self.equitemporality else [built[e]]
+
+        self.counters['discoveries'] += size
+        self.counters['hops'] += len(self.hops)
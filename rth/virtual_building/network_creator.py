@@ -1,21 +1,39 @@
-from nettools.core.ipv4_network import IPv4Network
 from nettools.utils.ip_class import FourBytesLiteral
-from nettools.utils.utils import Utils
 from nettools.utils.errors import IPOffNetworkRangeException
 
 from rth.core.errors import *
+from rth.virtual_building.ipv4 import ip_to_int, int_to_ip, mask_length, network_bounds, RangeIndex, AddressAllocator
 
 ## @package network_creator
 #
 #  This package contains the NetworkCreator class, that builds the virtual network from the provided data.
 
 
+class _SubnetworkEntry(dict):
+    """
+    The entry of a subnetwork in NetworkCreator.subnetworks, as {'instance': NETWORK, 'range': NETWORK RANGE}
+
+    The range (see NetworkCreator.Network.network_range) is only built when it is read.
+    """
+
+    __slots__ = ()
+
+    def __missing__(self, key):
+        if key == 'range':
+            return self['instance'].network_range
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self or key == 'range' else default
+
+
 class NetworkCreator:
     """
     Builds a virtual network from the provided data
 
-    This class, based on the IPv4Network from the python package nettools, builds a virtual network of subnetworks and
-    routers. It is the "virtual environment" that makes the base of the program.
+    This class builds a virtual network of subnetworks and routers. It is the "virtual environment" that makes the
+    base of the program. Addresses are kept as 32-bit integers (see the ipv4 package), and the IPs of the routers are
+    only turned into strings for the output.
 
     WARNING: Every link is supposed virtual, and is actually not an instance of any type. Links will be
     considered and discovered by the Ants system.
@@ -24,9 +42,12 @@ class NetworkCreator:
     """
 
     subnetworks, routers = None, None
+    ## The names of the subnetworks and routers, indexed by UID (None for removed ones)
     subnets_names, routers_names = None, None
+    ## The UIDs of the subnetworks and routers, keyed by name
+    subnets_uids, routers_uids = None, None
 
-    ## Subnetworks ranges ( format is [{"start": START, "end": END}, ...] )
+    ## Subnetworks ranges, sorted by first address (RangeIndex instance, keyed by subnetwork UID)
     ranges = None
     equitemporality = None
 
@@ -43,7 +64,8 @@ class NetworkCreator:
 
         self.subnetworks, self.routers = {}, {}
         self.subnets_names, self.routers_names = [], []
-        self.ranges = []
+        self.subnets_uids, self.routers_uids = {}, {}
+        self.ranges = RangeIndex()
 
     class Network:
         """
@@ -52,9 +74,8 @@ class NetworkCreator:
         Used to create virtual subnetworks and link them with routers
         """
 
-        network_range, addresses, mask_length = {}, 0, 0
-        routers = None
-        uid, name = -1, None
+        __slots__ = ('uid', 'name', 'cidr', 'address', 'start', 'end', 'mask_length', 'addresses', 'allocator',
+                     'routers', 'assigned')
 
         def __init__(self, starting_ip, mask, uid, name=None):
             """
@@ -67,17 +88,35 @@ class NetworkCreator:
                 name: The name of the new subnetwork. If None is provided, defaults to "<Untitled Network#ID:{ID HERE}>"
             """
 
-            inst_ = IPv4Network().init_from_couple(starting_ip, mask)
+            length = mask_length(mask)
+            # the address the subnetwork was created with (the one of its CIDR), as an integer
+            self.address = ip_to_int(starting_ip)
+            # the network and broadcast addresses, as integers
+            self.start, self.end = network_bounds(self.address, length)
 
             self.uid = uid
             self.name = name if name else None
-            self.cidr = f"{starting_ip}/{inst_.mask_length}"
+            self.cidr = f"{starting_ip}/{length}"
 
+            # the IPs of the connected routers, as integers, keyed by router UID
             self.routers = {}
+            # the UIDs of the connected routers, keyed by their IP on the subnetwork (as an integer)
+            self.assigned = {}
 
-            self.network_range = inst_.network_range
-            self.mask_length = inst_.mask_length
-            self.addresses = inst_.addresses
+            self.mask_length = length
+            self.addresses = max(self.end - self.start - 1, 0)
+            # the used host addresses
+            self.allocator = AddressAllocator(self.start, self.end)
+
+        @property
+        def network_range(self):
+            """
+            Returns:
+                The network and broadcast addresses, as {'start': FourBytesLiteral, 'end': FourBytesLiteral}. Built on
+                each access, as the process itself only reads start and end
+            """
+            return {'start': FourBytesLiteral().set_from_string_literal(int_to_ip(self.start)),
+                    'end': FourBytesLiteral().set_from_string_literal(int_to_ip(self.end))}
 
         def connect(self, router_uid, router_ip):
             """
@@ -85,9 +124,13 @@ class NetworkCreator:
 
             Args:
                 router_uid: The router UID
-                router_ip: The IP assigned to the router on this subnetwork
+                router_ip: The IP assigned to the router on this subnetwork, as an integer
             """
+            self.disconnect(router_uid)
+
             self.routers[router_uid] = router_ip
+            self.assigned[router_ip] = router_uid
+            self.allocator.mark(router_ip)
 
         def disconnect(self, router_uid):
             """
@@ -98,7 +141,9 @@ class NetworkCreator:
             """
 
             if router_uid in self.routers:
-                del self.routers[router_uid]
+                router_ip = self.routers.pop(router_uid)
+                del self.assigned[router_ip]
+                self.allocator.release(router_ip)
 
     class Router:
         """
@@ -107,8 +152,7 @@ class NetworkCreator:
         Used to simulate routers and link them with subnetworks
         """
 
-        uid, name = -1, None
-        connected_networks, internet = None, False
+        __slots__ = ('uid', 'name', 'internet', 'delay', 'connected_networks')
 
         def __init__(self, uid, internet=False, name=None, delay=None):
             """
@@ -136,7 +180,7 @@ class NetworkCreator:
 
             Args:
                 subnet_uid: The UID of the subnetwork
-                router_ip: The IP the router will be assigned
+                router_ip: The IP the router will be assigned, as an integer
             """
 
             if self.internet and self.connected_networks:
@@ -164,7 +208,8 @@ class NetworkCreator:
             router_id: The router UID
 
         Returns:
-            If the given router is connected to the given subnetwork, returns its IP; else, returns None.
+            If the given router is connected to the given subnetwork, returns its IP (as an integer); else, returns
+            None.
         """
 
         if subnet_id not in self.subnetworks:
@@ -184,17 +229,20 @@ class NetworkCreator:
         Args:
             cat: The category (either "subnet" or "router")
             name: The name
-        """
 
-        list_ = self.subnets_names if cat == 'subnet' else self.routers_names
-        id_ = 0
+        Returns:
+            The UID
 
-        for i in range(len(list_)):
-            if list_[i] == str(name):
-                id_ = i
-                break
+        Raises:
+            NameNotFound: if there is no subnetwork or router of this name
+        """
+
+        index = self.subnets_uids if cat == 'subnet' else self.routers_uids
 
-        return id_
+        try:
+            return index[str(name)]
+        except KeyError:
+            raise NameNotFound(name) from None
 
     def uid_to_name(self, cat, uid):
         """
@@ -208,20 +256,9 @@ class NetworkCreator:
             The name of the given UID if it exists, else None
         """
 
-        name_ = None
-
-        if cat == 'subnet':
-            for id_ in self.subnetworks:
-                if id_ == uid:
-                    name_ = str(self.subnetworks[id_]['instance'].name)
-                    break
-        else:
-            for id_ in self.routers:
-                if id_ == uid:
-                    name_ = str(self.routers[id_].name)
-                    break
+        list_ = self.subnets_names if cat == 'subnet' else self.routers_names
 
-        return name_
+        return list_[uid] if 0 <= uid < len(list_) else None
 
     def is_name_existing(self, type_, name):
         """
@@ -235,8 +272,8 @@ class NetworkCreator:
             Boolean of whether the name exists in the given type
         """
 
-        list_ = self.subnets_names if type_ == 'subnet' else self.routers_names
-        return name in list_
+        index = self.subnets_uids if type_ == 'subnet' else self.routers_uids
+        return name in index
 
     def router_has_internet_connection(self, router_uid):
         """
@@ -262,7 +299,8 @@ class NetworkCreator:
 
         """
 
-        uid = len(self.subnetworks)
+        # UIDs of removed subnetworks are never given again
+        uid = len(self.subnets_names)
 
         # Name correspondency
         if name:
@@ -273,51 +311,21 @@ class NetworkCreator:
             name = f"<Untitled Network#ID:{uid}>"
 
         current = self.Network(ip, mask_length, uid, name)
-        current_netr = Utils.netr_to_literal(current.network_range)
-
-        if self.ranges:
-            for sid in self.subnetworks:
-                subnet = self.subnetworks[sid]['instance']
-                subnetr = Utils.netr_to_literal(subnet.network_range)
-
-                overlap = False
-                if current.mask_length == subnet.mask_length:
-                    # Masks are equal
-                    if current_netr['start'] == subnetr['start']:
-                        overlap = True
-                else:
-                    if current.mask_length < subnet.mask_length:
-                        # New network mask is bigger, check if the existing subnetwork is inside
-                        big = current_netr['start'].split('.')
-                        small = subnetr['start']
-                    else:
-                        # New network is smaller that existing subnetwork, check if it is inside
-                        small = current_netr['start']
-                        big = subnetr['start'].split('.')
-
-                    if current.mask_length <= 8:
-                        if int(big[0]) <= int(small.split('.')[0]):
-                            overlap = True
-                    elif 8 < current.mask_length <= 16:
-                        if small.startswith(f"{big[0]}") and int(big[1]) <= int(small.split('.')[1]):
-                            overlap = True
-                    elif 16 < current.mask_length <= 24:
-                        if small.startswith(f"{big[0]}.{big[1]}") and int(big[2]) <= int(small.split('.')[2]):
-                            overlap = True
-                    elif 24 < current.mask_length <= 32:
-                        if int(big[3]) <= int(small.split('.')[3]):
-                            overlap = True
-
-                if overlap:
-                    raise OverlappingError(current_netr, subnetr)
-
-        self.subnetworks[uid] = {'instance': current, 'range': current.network_range}
+
+        overlapped = self.ranges.overlapping(current.start, current.end)
+        if overlapped is not None:
+            subnet = self.subnetworks[overlapped]['instance']
+            raise OverlappingError({'start': int_to_ip(current.start), 'end': int_to_ip(current.end)},
+                                   {'start': int_to_ip(subnet.start), 'end': int_to_ip(subnet.end)})
+
+        self.subnetworks[uid] = _SubnetworkEntry(instance=current)
 
         # adding to network ranges
-        self.ranges.append(current.network_range)
+        self.ranges.add(current.start, current.end, uid)
         # also adding name if defined
         if name:
             self.subnets_names.append(name)
+            self.subnets_uids[name] = uid
 
         return uid
 
@@ -330,7 +338,8 @@ class NetworkCreator:
             name: The eventual name of the router
         """
 
-        uid = len(self.routers)
+        # UIDs of removed routers are never given again
+        uid = len(self.routers_names)
 
         if name:
             result = self.is_name_existing('router', name)
@@ -342,11 +351,53 @@ class NetworkCreator:
         inst_ = self.Router(uid, internet_connection, name)
 
         self.routers_names.append(name)
+        self.routers_uids[name] = uid
 
         self.routers[uid] = inst_
 
         return uid
 
+    def remove_network(self, uid):
+        """
+        Removes a virtual subnetwork, and disconnects the routers connected to it
+
+        The UID is not given again, and the name becomes available.
+
+        Args:
+            uid: The UID of the subnetwork
+        """
+
+        subnet_inst = self.subnetworks[uid]['instance']
+
+        for router_uid in list(subnet_inst.routers):
+            self.routers[router_uid].disconnect(uid)
+            subnet_inst.disconnect(router_uid)
+
+        self.ranges.remove(subnet_inst.start)
+        del self.subnetworks[uid]
+        del self.subnets_uids[self.subnets_names[uid]]
+        self.subnets_names[uid] = None
+
+    def remove_router(self, uid):
+        """
+        Removes a virtual router, and disconnects it from its subnetworks
+
+        The UID is not given again, and the name becomes available.
+
+        Args:
+            uid: The UID of the router
+        """
+
+        router_inst = self.routers[uid]
+
+        for subnet_uid in list(router_inst.connected_networks):
+            self.subnetworks[subnet_uid]['instance'].disconnect(uid)
+            router_inst.disconnect(subnet_uid)
+
+        del self.routers[uid]
+        del self.routers_uids[self.routers_names[uid]]
+        self.routers_names[uid] = None
+
     def connect_router_to_networks(self, router_name, subnets_ips):
         """
         Connects a router to a set of subnetworks
@@ -366,25 +417,17 @@ class NetworkCreator:
 
             Args:
                 subnet_inst_: The subnetwork instance
-                ip_: The IP that has to be checked
+                ip_: The IP that has to be checked, as an integer
             """
 
-            # Checking that ip is effectively in range of the subnet
-            if isinstance(ip_, str):
-                ip_ = FourBytesLiteral().set_from_string_literal(ip_)
-
-            mask = FourBytesLiteral().set_from_string_literal(Utils.mask_length_to_literal(subnet_inst_.mask_length))
-            inst = IPv4Network().init_from_fbl(ip_, mask)
-
-            if inst.address_type != 1:
-                # means the address is either a network or a broadcast address
-                raise IPOffNetworkRangeException(str(ip))
+            # Checking that ip is effectively in range of the subnet, and neither its network nor broadcast address
+            if not subnet_inst_.start < ip_ < subnet_inst_.end:
+                raise IPOffNetworkRangeException(int_to_ip(ip_))
 
             # then we check that ip is not used by any of the current routers
-            routers = subnet_inst_.routers
-            for r in routers:
-                if str(routers[r]) == str(ip_):
-                    raise IPAlreadyAttributed(name, ip_, self.uid_to_name('router', r), str(router_name))
+            owner = subnet_inst_.assigned.get(ip_)
+            if owner is not None:
+                raise IPAlreadyAttributed(name, int_to_ip(ip_), self.uid_to_name('router', owner), str(router_name))
 
         router_uid = self.name_to_uid('router', router_name)
 
@@ -397,19 +440,16 @@ class NetworkCreator:
 
             # we want to attribute a "personalised" IP
             if subnet_ip:
-                check_ip_availability(subnet_inst, subnet_ip)
-                ip = subnet_ip
-            # we will let the program set it for us
+                try:
+                    ip = ip_to_int(subnet_ip)
+                except ValueError:
+                    raise IPOffNetworkRangeException(str(subnet_ip))
+                check_ip_availability(subnet_inst, ip)
+            # we will let the program set it for us, the highest free address
             else:
-
-                ip = subnet_inst.network_range['end']
-                while True:
-                    ip = Utils.ip_before(ip)
-                    try:
-                        check_ip_availability(subnet_inst, ip)
-                        break
-                    except IPAlreadyAttributed:
-                        continue
+                ip = subnet_inst.allocator.allocate()
+                if ip is None:
+                    raise IPOffNetworkRangeException(int_to_ip(subnet_inst.start))
 
             subnet_inst.connect(router_uid, ip)
             router_inst.connect(subnet_uid, ip)
@@ -417,6 +457,67 @@ class NetworkCreator:
             self.subnetworks[subnet_uid]['instance'] = subnet_inst
             self.routers[router_uid] = router_inst
 
+    def connect_routers_to_network(self, subnet_name, routers_names):
+        """
+        Connects many routers to a subnetwork at once, the program setting their IPs
+
+        The routers get the highest free addresses, in the order they are given, like when connected one by one. The
+        whole batch is checked before connecting any router, and the connections already made are undone if one fails,
+        so that either every router or no router is connected.
+
+        Args:
+            subnet_name: The name of the subnetwork
+            routers_names: The names of the routers
+
+        Raises:
+            IPOffNetworkRangeException: if the subnetwork has not enough free addresses
+            ValueError: if a router is given more than once, or is already connected to the subnetwork
+            Exception: if the master router is given while already connected to a subnetwork
+        """
+
+        subnet_uid = self.name_to_uid('subnet', subnet_name)
+        subnet_inst = self.subnetworks[subnet_uid]['instance']
+        routers_uids = [self.name_to_uid('router', router_name) for router_name in routers_names]
+
+        seen = set()
+        for router_name, router_uid in zip(routers_names, routers_uids):
+            router_inst = self.routers[router_uid]
+
+            if router_uid in seen:
+                raise ValueError(f"Router {router_name} is given more than once")
+            if subnet_uid in router_inst.connected_networks:
+                raise ValueError(f"Router {router_name} is already connected to the subnetwork {subnet_name}")
+            if router_inst.internet and router_inst.connected_networks:
+                raise Exception('Master router cannot accept more than one connection')
+            seen.add(router_uid)
+
+        ips = subnet_inst.allocator.allocate_many(len(routers_uids))
+        if ips is None:
+            raise IPOffNetworkRangeException(int_to_ip(subnet_inst.start))
+
+        connected = []
+        try:
+            for router_uid, ip in zip(routers_uids, ips):
+                subnet_inst.connect(router_uid, ip)
+                connected.append(router_uid)
+                self.routers[router_uid].connect(subnet_uid, ip)
+        except BaseException:
+            # disconnecting from the subnetwork releases the address, the others are released by hand
+            for router_uid in connected:
+                subnet_inst.disconnect(router_uid)
+                self.routers[router_uid].disconnect(subnet_uid)
+            for ip in ips[len(connected):]:
+                subnet_inst.allocator.release(ip)
+            raise
+
+    def addresses_usage(self):
+        """
+        Returns:
+            The usage of the host addresses of each subnetwork (see AddressAllocator.stats), keyed by subnetwork UID
+        """
+
+        return {uid: self.subnetworks[uid]['instance'].allocator.stats() for uid in self.subnetworks}
+
     def display_network(self):
         """
         Displays the virtual local network in the console
@@ -426,7 +527,7 @@ class NetworkCreator:
             inst = self.subnetworks[i]['instance']
 
             print(
-                f"Network {inst.network_range['start']} - {inst.network_range['end']}"
+                f"Network {int_to_ip(inst.start)} - {int_to_ip(inst.end)}"
                 f"  ID: {inst.uid}"
                 f"  Name: {inst.name if inst.name else '<unnamed>'}"
                 "\n"
@@ -442,24 +543,21 @@ class NetworkCreator:
         for sid in self.subnetworks:
             subnet = self.subnetworks[sid]['instance']
 
-            displayable_connected_routers = subnet.routers.copy()
-            for i in displayable_connected_routers:
-                displayable_connected_routers[i] = str(displayable_connected_routers[i])
+            displayable_connected_routers = {i: int_to_ip(subnet.routers[i]) for i in subnet.routers}
 
             final['subnets'][sid] = {
                 'id': subnet.uid,
                 'name': subnet.name,
                 'connected_routers': displayable_connected_routers,
-                'range': Utils.netr_to_literal(subnet.network_range),
+                'range': {'start': int_to_ip(subnet.start), 'end': int_to_ip(subnet.end)},
                 'mask': subnet.mask_length
             }
 
         for rid in self.routers:
             router = self.routers[rid]
 
-            displayable_connected_subnets = router.connected_networks.copy()
-            for i in displayable_connected_subnets:
-                displayable_connected_subnets[i] = str(displayable_connected_subnets[i])
+            displayable_connected_subnets = {i: int_to_ip(router.connected_networks[i])
+                                             for i in router.connected_networks}
 
             final['routers'][rid] = {
                 'id': router.uid,
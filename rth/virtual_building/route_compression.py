@@ -0,0 +1,96 @@
+from rth.virtual_building.ipv4 import ip_to_int, mask_of, network_bounds
+from rth.virtual_building.route_lookup import RouteTrie
+from rth.virtual_building.routing_table import RoutingTable
+## @package route_compression
+#
+#  The package of the compression of the routing tables, keeping the route of every address.
+
+
+def compress(routing_table):
+    """
+    Compresses a routing table
+
+    Two passes are made over the routes, keyed by their network address and mask length:
+    - sibling prefixes (the two halves of a same supernet) with the same gateway and interface are merged into the
+      supernet, the longest ones first, so that merged supernets can be merged again. A route of the supernet itself
+      is replaced, being entirely hidden by its two halves
+    - a route with the same gateway and interface as the closest route covering it (e.g. the default route) is
+      dropped, the addresses it matched falling back on this route
+
+    Each pass keeps the route of the longest prefix matching every address (see equivalent). The routes left keep the
+    order of the table, a supernet taking the place of the first route merged into it.
+
+    Args:
+        routing_table: The RoutingTable instance
+
+    Returns:
+        The compressed routing table, as a new RoutingTable instance
+    """
+
+    interfaces_ips = routing_table.interfaces_ips
+    # the next hop and the position in the table of each route, keyed by (NETWORK ADDRESS, MASK LENGTH)
+    routes = {}
+    for i in range(len(routing_table)):
+        length = routing_table.lengths[i]
+        key = (routing_table.prefixes[i] & mask_of(length), length)
+        hop = (routing_table.gateways[i], interfaces_ips[routing_table.interfaces[i]])
+        # a same network given twice: the last one is the one matched, like in RouteTrie
+        routes[key] = (hop, routes[key][1] if key in routes else i)
+
+    # merging the siblings, from the longest prefixes up
+    for length in range(32, 0, -1):
+        for start, _ in [key for key in routes if key[1] == length]:
+            if (start, length) not in routes:
+                # already merged with its sibling
+                continue
+            sibling = (start ^ (1 << (32 - length)), length)
+            if sibling not in routes or routes[sibling][0] != routes[(start, length)][0]:
+                continue
+
+            hop, first = routes.pop((start, length))
+            _, other = routes.pop(sibling)
+            routes[(start & mask_of(length - 1), length - 1)] = (hop, min(first, other))
+
+    # dropping the routes of the same next hop as the route covering them, from the shortest prefixes down
+    for start, length in sorted(routes, key=lambda key: key[1]):
+        for shorter in range(length - 1, -1, -1):
+            covering = (start & mask_of(shorter), shorter)
+            if covering in routes:
+                if routes[covering][0] == routes[(start, length)][0]:
+                    del routes[(start, length)]
+                break
+
+    compressed = RoutingTable()
+    for (start, length), ((gateway, interface), _) in sorted(routes.items(), key=lambda item: item[1][1]):
+        compressed.append(start, length, gateway, interface)
+
+    return compressed
+
+
+def equivalent(routing_table, other):
+    """
+    Checks that two routing tables route every address the same way, by longest prefix match
+
+    The route of an address only changes at the first address of a prefix of either table, or right after its last
+    one. Looking up these addresses thus covers every address.
+
+    Args:
+        routing_table: The routing table, as {CIDR: ROUTE, ...} (e.g. a RoutingTable instance)
+        other: The other routing table
+
+    Returns:
+        Whether every address has the same route in both tables
+    """
+
+    tries = RouteTrie.from_routing_table(routing_table), RouteTrie.from_routing_table(other)
+
+    bounds = {0}
+    for table in (routing_table, other):
+        for cidr in table:
+            address, length = cidr.split('/')
+            start, end = network_bounds(ip_to_int(address), int(length))
+            bounds.add(start)
+            if end < 0xFFFFFFFF:
+                bounds.add(end + 1)
+
+    return all(tries[0].lookup(ip) == tries[1].lookup(ip) for ip in bounds)
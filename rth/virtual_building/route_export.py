@@ -0,0 +1,78 @@
+from rth.virtual_building.ipv4 import int_to_ip, network_bounds
+## @package route_export
+#
+#  The package of the exporters of the routing tables to the configuration of real routers: `ip -batch` route files
+#  and FRR static routes.
+#
+#  The lines are rendered straight from the arrays of the RoutingTable instances. The routes towards the subnetworks
+#  attached to the router (whose gateway is the router itself) are left out, the system already having them once the
+#  interfaces are addressed. The default route of the master router is one of them, its gateway being outside.
+
+
+def _gateway_routes(routing_table):
+    """
+    Get the routes of a routing table that go through another router
+
+    The destinations are given by their network address, whatever the address their subnetwork was declared with
+    (e.g. 10.0.0.0/24 for 10.0.0.5/24), as `ip` refuses host bits in a prefix.
+
+    Args:
+        routing_table: The RoutingTable instance
+
+    Returns:
+        A generator of (CIDR, GATEWAY) tuples of dotted strings, in the order of the table
+    """
+
+    interfaces_ips = routing_table.interfaces_ips
+    prefixes, lengths = routing_table.prefixes, routing_table.lengths
+    gateways, interfaces = routing_table.gateways, routing_table.interfaces
+
+    for i in range(len(routing_table)):
+        gateway = gateways[i]
+        if gateway == interfaces_ips[interfaces[i]]:
+            continue
+        yield f"{int_to_ip(network_bounds(prefixes[i], lengths[i])[0])}/{lengths[i]}", int_to_ip(gateway)
+
+
+def ip_batch_lines(name, routing_table):
+    """
+    Renders a routing table as an `ip -batch` file, to be loaded with `ip -batch FILE`
+
+    The routes are replaced rather than added, so that the file can be loaded again after a change of the network.
+
+    Args:
+        name: The name of the router
+        routing_table: The RoutingTable instance
+
+    Returns:
+        A generator of the lines, each ending with a line break
+    """
+
+    yield f"# Routes of router {name}\n"
+    for cidr, gateway in _gateway_routes(routing_table):
+        yield f"route replace {cidr} via {gateway}\n"
+
+
+def frr_lines(name, routing_table):
+    """
+    Renders a routing table as FRR static routes, to be included in the configuration of staticd
+
+    Args:
+        name: The name of the router
+        routing_table: The RoutingTable instance
+
+    Returns:
+        A generator of the lines, each ending with a line break
+    """
+
+    yield f"! Static routes of router {name}\n!\n"
+    for cidr, gateway in _gateway_routes(routing_table):
+        yield f"ip route {cidr} {gateway}\n"
+    yield "!\n"
+
+
+## The exporters, keyed by format: the renderer of the lines and the extension of the files
+exporters = {
+    'ip': (ip_batch_lines, '.batch'),
+    'frr': (frr_lines, '.conf'),
+}
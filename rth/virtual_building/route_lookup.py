@@ -0,0 +1,122 @@
+from rth.virtual_building.ipv4 import ip_to_int, mask_length, network_bounds
+## @package route_lookup
+#
+#  The package of the longest prefix match of the routing tables.
+
+
+class RouteTrie:
+    """
+    Longest prefix match over a routing table
+
+    The routes are compiled in a trie with a stride of 8 bits: each node has 256 slots, one per value of the byte it
+    handles, so that a lookup reads at most one slot per byte of the address. A prefix whose length is not a multiple
+    of 8 fills every slot it covers in the node of its last byte, unless a longer prefix already holds the slot.
+
+    Each slot holds the length of its prefix with its route, and the node of the next byte, if any.
+    """
+
+    ## The route of 0.0.0.0/0, if any
+    default = None
+
+    def __init__(self):
+        """
+        Init
+        """
+
+        self.default = None
+        self.root = self.__node()
+
+    @staticmethod
+    def __node():
+        # the routes of the slots, with the lengths of their prefixes, and the nodes of the next byte
+        return [None] * 256, [None] * 256
+
+    @classmethod
+    def from_routing_table(cls, routing_table):
+        """
+        Compiles a routing table
+
+        Args:
+            routing_table: The routing table, as {CIDR: ROUTE, ...}
+
+        Returns:
+            The RouteTrie instance
+        """
+
+        trie = cls()
+        for cidr in routing_table:
+            trie.insert(cidr, routing_table[cidr])
+        return trie
+
+    def insert(self, cidr, route):
+        """
+        Adds a route
+
+        Args:
+            cidr: The destination, e.g. "10.0.0.0/24"
+            route: The route, any object returned by the lookups
+        """
+
+        ip, mask = cidr.split('/')
+        length = mask_length(mask)
+        start, _ = network_bounds(ip_to_int(ip), length)
+
+        if length == 0:
+            self.default = route
+            return
+
+        node = self.root
+        shift = 24
+        # going down to the node of the last byte of the prefix
+        while length > 32 - shift:
+            byte = start >> shift & 255
+            if node[1][byte] is None:
+                node[1][byte] = self.__node()
+            node = node[1][byte]
+            shift -= 8
+
+        first = start >> shift & 255
+        span = 1 << (32 - shift - length)
+        routes = node[0]
+        for byte in range(first, first + span):
+            if routes[byte] is None or routes[byte][0] <= length:
+                routes[byte] = (length, route)
+
+    def lookup(self, ip):
+        """
+        Get the route of the longest prefix matching an address
+
+        Args:
+            ip: The address, either a dotted string or an integer
+
+        Returns:
+            The route, None if no prefix matches
+        """
+
+        ip = ip_to_int(ip)
+        best = self.default
+        node = self.root
+
+        for shift in (24, 16, 8, 0):
+            byte = ip >> shift & 255
+            slot = node[0][byte]
+            if slot is not None:
+                best = slot[1]
+            node = node[1][byte]
+            if node is None:
+                break
+
+        return best
+
+    def lookup_many(self, ips):
+        """
+        Get the routes of many addresses
+
+        Args:
+            ips: The addresses, either dotted strings or integers
+
+        Returns:
+            The list of the routes, in the order of the addresses
+        """
+
+        return [self.lookup(ip) for ip in ips]
@@ -0,0 +1,129 @@
+from array import array
+from collections.abc import Mapping, ItemsView
+from rth.virtual_building.ipv4 import int_to_ip
+## @package routing_table
+#
+#  The package of the compact storage of a routing table.
+
+
+class RoutingTable(Mapping):
+    """
+    Columnar routing table
+
+    The routes are kept in parallel typed arrays: the address and mask length of each destination, the gateway, and
+    the index of the interface among the IPs of the router. This weighs a few bytes per route instead of two
+    dictionaries and their strings.
+
+    It is read like the dictionary it replaces, {CIDR: {'gateway': GATEWAY, 'interface': INTERFACE}, ...}, with dotted
+    strings built on access. Reading by CIDR builds an index of the routes on the first access; iterating does not.
+    """
+
+    ## The addresses of the destinations (as given in their CIDR), as integers
+    prefixes = None
+    ## The mask lengths of the destinations
+    lengths = None
+    ## The gateways, as integers
+    gateways = None
+    ## The indexes of the interfaces in interfaces_ips
+    interfaces = None
+    ## The IPs of the interfaces of the router, as integers
+    interfaces_ips = None
+
+    def __init__(self):
+        """
+        Init
+        """
+
+        self.prefixes, self.lengths = array('I'), array('B')
+        self.gateways, self.interfaces = array('I'), array('H')
+        self.interfaces_ips = array('I')
+
+        self.__interfaces_index = {}
+        self.__index = None
+
+    def append(self, prefix, length, gateway, interface):
+        """
+        Adds a route, after the other ones
+
+        Args:
+            prefix: The address of the destination, as an integer
+            length: The mask length of the destination
+            gateway: The gateway, as an integer
+            interface: The interface, as an integer
+        """
+
+        if interface not in self.__interfaces_index:
+            self.__interfaces_index[interface] = len(self.interfaces_ips)
+            self.interfaces_ips.append(interface)
+
+        self.prefixes.append(prefix)
+        self.lengths.append(length)
+        self.gateways.append(gateway)
+        self.interfaces.append(self.__interfaces_index[interface])
+        self.__index = None
+
+    def cidr(self, i):
+        """
+        Args:
+            i: The index of a route
+
+        Returns:
+            The CIDR of its destination
+        """
+
+        return f"{int_to_ip(self.prefixes[i])}/{self.lengths[i]}"
+
+    def route(self, i):
+        """
+        Args:
+            i: The index of a route
+
+        Returns:
+            The route, as {'gateway': GATEWAY, 'interface': INTERFACE}
+        """
+
+        return {'gateway': int_to_ip(self.gateways[i]), 'interface': int_to_ip(self.interfaces_ips[self.interfaces[i]])}
+
+    def to_dict(self):
+        """
+        Returns:
+            The routing table as a dictionary, {CIDR: {'gateway': GATEWAY, 'interface': INTERFACE}, ...}
+        """
+
+        return {self.cidr(i): self.route(i) for i in range(len(self.prefixes))}
+
+    def items(self):
+        return RoutingTableItems(self)
+
+    def __getitem__(self, cidr):
+        if self.__index is None:
+            self.__index = {self.cidr(i): i for i in range(len(self.prefixes))}
+
+        return self.route(self.__index[cidr])
+
+    def __iter__(self):
+        for i in range(len(self.prefixes)):
+            yield self.cidr(i)
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def __repr__(self):
+        return f"RoutingTable({self.to_dict()!r})"
+
+    def __getstate__(self):
+        # the index is rebuilt when needed
+        state = self.__dict__.copy()
+        state['_RoutingTable__index'] = None
+        return state
+
+
+class RoutingTableItems(ItemsView):
+    """
+    The (CIDR, ROUTE) items of a RoutingTable, read in order without its index
+    """
+
+    def __iter__(self):
+        table = self._mapping
+        for i in range(len(table)):
+            yield table.cidr(i), table.route(i)
@@ -1,4 +1,10 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from rth.virtual_building.utils import *
+from rth.virtual_building.hops import LazyHops
+from rth.virtual_building.routing_table import RoutingTable
 ## @package routing_tables_generator
 #
 #  Contains the class that generates and formats the routing tables.
@@ -9,7 +15,13 @@ class RoutingTablesGenerator:
     Generates and formats the routing tables of a network
     """
 
-    def __init__(self, network_creator_instance, subnets, routers, links, hops, equitemporality=True):
+    ## The next hops of every router towards every subnetwork (see build_next_hops)
+    next_hops = None
+
+    ## Below this number of subnetworks, the next hops are always built by a single worker
+    parallel_threshold = 64
+
+    def __init__(self, network_creator_instance, subnets, routers, links, hops, equitemporality=True, on_demand=None):
         """
         Init
 
@@ -20,6 +32,8 @@ class RoutingTablesGenerator:
             links: The links
             hops: The hops (paths) generated by the Ants system
             equitemporality: Equitemporality tweaker
+            on_demand: Whether get_routing_table builds the next hops of the asked router only, instead of every next
+                hop on the first call. None means only with lazy hops
         """
 
         self.ncinst = network_creator_instance
@@ -30,6 +44,8 @@ class RoutingTablesGenerator:
         self.hops = hops
         self.links = links
         self.master_router = get_master_router(self.routers)
+        self.next_hops = None
+        self.on_demand = isinstance(hops, LazyHops) if on_demand is None else on_demand
 
     @staticmethod
     def router_ip(instance_, provided):
@@ -46,41 +62,6 @@ class RoutingTablesGenerator:
 
         return instance_.routers[provided] if provided in instance_.routers else False
 
-    def build_paths_from_possibilites(self, routers_infos, outer_list, inner_list, return_as_dict=False):
-        """
-        Builds paths from the given lists
-
-        Args:
-            routers_infos: A list with the master router ID in 0 and the current router in 1
-            outer_list: The subnetwork(s) to reach from the current router
-            inner_list: The subnetwork(s) connected to the current router
-            return_as_dict: (boolean) if the results are returned as a dict or only the
-                first subnetwork of the smaller path is returned
-        """
-
-        paths_ = {} if return_as_dict else []
-
-        for end in outer_list:
-            inner_paths = []
-            for start in inner_list:
-                # we get the previously generated hop
-                if start != end:
-                    inner_paths.append(self.hops[(start, end)])
-                else:
-                    inner_paths.append([start])
-            # we choose the smaller path out of every path in this list
-            if (inner_paths[0] == [routers_infos[1]]) and (routers_infos[0] != routers_infos[1]):
-                del inner_paths[0]
-            if return_as_dict:
-                paths_[end] = smaller_of_list(inner_paths)
-            else:
-                paths_.append(smaller_of_list(inner_paths))
-
-        if return_as_dict:
-            return paths_
-        else:
-            return smaller_of_list(paths_)[0]
-
     def try_router_connected_to_subnet(self, subnets, router_uid):
         """
         Try to see if the router is connected to the subnetwork
@@ -103,74 +84,325 @@ class RoutingTablesGenerator:
                 break
         return ip_, sub
 
-    def get_routing_table(self, router_id):
+    def distances_to(self, subnet_end):
         """
-        Get the routing table of corresponding router
+        Reverse search from a destination subnetwork
+
+        Args:
+            subnet_end: The UID of the destination subnetwork
+
+        Returns:
+            A dictionary of the number of routers to go through to reach the destination, keyed by subnetwork UID.
+            Unreachable subnetworks are left out
+        """
+
+        subnets, routers = self.links['subnets'], self.links['routers']
+        distances = {subnet_end: 0}
+        routers_seen = set()
+        frontier = deque([subnet_end])
+
+        while frontier:
+            subnet = frontier.popleft()
+            for router in subnets[subnet]:
+                if router in routers_seen:
+                    continue
+                routers_seen.add(router)
+                for next_ in routers[router]:
+                    if next_ not in distances:
+                        distances[next_] = distances[subnet] + 1
+                        frontier.append(next_)
+
+        return distances
+
+    def next_hop(self, router_id, subnet_end, distances):
+        """
+        Get the gateway and interface a router uses to reach a subnetwork
+
+        Among the subnetworks attached to the router, we take the first one closest to the destination, and follow its
+        hops to know the next router. The gateway is then the IP of this next router on the first subnetwork it
+        shares with the router.
 
         Args:
             router_id: The UID of the router
+            subnet_end: The UID of the destination subnetwork
+            distances: The distances to the destination, as returned by distances_to
 
         Returns:
-            The raw routing table for the router
+            A tuple of the gateway IP and the interface IP
         """
 
-        routing_table = {}
-        subnets_done = []
         subnets_attached = self.links['routers'][router_id]
 
-        # starting off by listing attached subnets and getting their ip for this router
+        if subnet_end in subnets_attached:
+            ip = self.router_ip(self.subnets[subnet_end]['instance'], router_id)
+            return ip, ip
+
+        closest = None
         for subnet in subnets_attached:
-            inst_ = self.subnets[subnet]['instance']
-            routing_table[inst_.cidr] = {
-                'gateway': self.router_ip(inst_, router_id),
-                'interface': self.router_ip(inst_, router_id)
-            }
-            subnets_done.append(subnet)
+            if subnet in distances and (closest is None or distances[subnet] < distances[closest]):
+                closest = subnet
 
-        # getting master route
+        if closest is None:
+            raise Exception(f"Subnetwork {subnet_end} should be reachable from router {router_id}")
+
+        router = self.hops[(closest, subnet_end)][0]
+        gateway, subnet_id = self.try_router_connected_to_subnet(subnets_attached, router)
+        if not gateway:
+            raise Exception(f"Router id {router} should have been found in at least one of the subnetworks")
+
+        interface = self.ncinst.get_ip_of_router_on_subnetwork(subnet_id, router_id)
+        if not interface:
+            raise Exception(f"Could not find interface of router {router_id} on subnet {subnet_id}, though the "
+                            f"router points to a gateway on this subnetwork")
+
+        return gateway, interface
+
+    def next_hops_to(self, subnet_end):
+        """
+        Get the next hops of every router towards a subnetwork
+
+        Args:
+            subnet_end: The UID of the destination subnetwork
+
+        Returns:
+            A dictionary of (GATEWAY, INTERFACE) tuples, keyed by router UID. Routers without links are left out
+        """
+
+        distances = self.distances_to(subnet_end)
+
+        return {router: self.next_hop(router, subnet_end, distances)
+                for router in self.links['routers'] if self.links['routers'][router]}
+
+    def next_hops_of(self, router_id):
+        """
+        Get the next hops of a router towards every subnetwork
+
+        Only the hops from the subnetworks attached to the router are read, their lengths giving the distances to each
+        destination.
+
+        Args:
+            router_id: The UID of the router
+
+        Returns:
+            A dictionary of (GATEWAY, INTERFACE) tuples, keyed by subnetwork UID. Empty if the router has no links
+        """
+
+        row = {}
+        attached = self.links['routers'][router_id]
+        if not attached:
+            return row
+
+        for subnet_end in self.subnets:
+            distances = {subnet: len(self.hops[(subnet, subnet_end)]) for subnet in attached
+                         if (subnet, subnet_end) in self.hops}
+            row[subnet_end] = self.next_hop(router_id, subnet_end, distances)
+
+        return row
+
+    def build_next_hops(self, workers=1):
+        """
+        Builds the next hops of every router towards every subnetwork
+
+        We run one reverse search from each destination subnetwork, which tells every router which of its attached
+        subnetworks leads there first. The result is stored in next_hops, as {ROUTER_UID: {SUBNET_UID: (GATEWAY,
+        INTERFACE), ...}, ...}
+
+        The destinations are independent of each other, so with several workers they are split between processes,
+        each process receiving the links and hops once. The next hops are merged in the order of the destinations, so
+        the result does not depend on the number of workers. Networks with less subnetworks than parallel_threshold are
+        always processed by a single worker.
+
+        Args:
+            workers: The number of worker processes. None means as many as there are CPUs
+        """
+
+        next_hops = {router: {} for router in self.links['routers']}
+        destinations = list(self.subnets)
+        workers = os.cpu_count() if workers is None else workers
+
+        if workers <= 1 or len(destinations) < self.parallel_threshold:
+            columns = ((subnet_end, self.next_hops_to(subnet_end)) for subnet_end in destinations)
+        else:
+            # one chunk per worker, so that each worker receives the links and hops once
+            chunk_size = -(-len(destinations) // workers)
+            chunks = [destinations[i:i + chunk_size] for i in range(0, len(destinations), chunk_size)]
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                columns = [column for results in executor.map(partial(_next_hops_chunk, self), chunks)
+                           for column in results]
+
+        for subnet_end, column in columns:
+            for router, hop in column.items():
+                next_hops[router][subnet_end] = hop
+
+        self.next_hops = next_hops
+
+    def update_next_hops(self, destinations=(), routers=()):
+        """
+        Rebuilds the next hops affected by a change of the network
+
+        The next hops towards removed subnetworks, and of removed routers, are forgotten.
+
+        Args:
+            destinations: The UIDs of the subnetworks whose hops changed. Their next hops are rebuilt for every router
+            routers: The UIDs of the routers whose links changed, or whose neighbours links changed. Their next hops are
+                rebuilt towards every subnetwork
+
+        Returns:
+            The set of the UIDs of the routers whose next hops changed
+        """
+
+        if self.next_hops is None:
+            self.build_next_hops()
+            return set(self.next_hops)
+
+        changed = set()
+
+        for router in list(self.next_hops):
+            if router not in self.links['routers']:
+                del self.next_hops[router]
+                continue
+            for subnet in [subnet for subnet in self.next_hops[router] if subnet not in self.subnets]:
+                del self.next_hops[router][subnet]
+                changed.add(router)
+
+        for subnet_end in destinations:
+            if subnet_end not in self.subnets:
+                continue
+            column = self.next_hops_to(subnet_end)
+            for router in self.links['routers']:
+                row = self.next_hops.setdefault(router, {})
+                if router in column and self.__same_hop(row.get(subnet_end), column[router]):
+                    continue
+                if router in column:
+                    row[subnet_end] = column[router]
+                else:
+                    row.pop(subnet_end, None)
+                changed.add(router)
+
+        for router in routers:
+            if router not in self.links['routers']:
+                continue
+
+            row = self.next_hops_of(router)
+            old = self.next_hops.get(router, {})
+            if row.keys() != old.keys() or not all(self.__same_hop(old[subnet], row[subnet]) for subnet in row):
+                changed.add(router)
+            self.next_hops[router] = row
+
+        return changed
+
+    @staticmethod
+    def __same_hop(old, new):
+        return old is not None and tuple(map(str, old)) == tuple(map(str, new))
+
+    def __getstate__(self):
+        # the links are views on the network dictionaries, which cannot be pickled
+        state = self.__dict__.copy()
+        state['links'] = {type_: {uid: list(self.links[type_][uid]) for uid in self.links[type_]}
+                          for type_ in self.links}
+        return state
+
+    def master_route(self, router_id, next_hops=None):
+        """
+        Get the gateway and interface a router uses to reach the master router
+
+        Args:
+            router_id: The UID of the router
+            next_hops: The next hops of the router, as returned by next_hops_of. None means the ones in next_hops
+
+        Returns:
+            A tuple of the gateway IP and the interface IP
+        """
 
-        # the subnetwork attached to the master router
         master_attached = self.links['routers'][self.master_router]
+        if not master_attached:
+            raise Exception("The master router should be connected to a subnetwork")
 
-        # the subnetwork that leads to the master router
-        to_master_uid = self.build_paths_from_possibilites([self.master_router, router_id],
-                                                           master_attached, subnets_attached)
+        # the subnetwork attached to the master router
+        to_master_uid = list(master_attached)[0]
 
-        # now retrieving the IP of this router that points to the subnetwork leading to the master router
-        to_master_gateway, to_master_uid = self.try_router_connected_to_subnet(subnets_attached, to_master_uid)
+        if router_id == self.master_router or to_master_uid not in self.links['routers'][router_id]:
+            return (self.next_hops[router_id] if next_hops is None else next_hops)[to_master_uid]
 
-        if not to_master_gateway:
-            raise Exception("To-master router should have been found in at least one of the subnetworks")
+        # we share the subnetwork of the master router, so we go straight to it
+        inst_ = self.subnets[to_master_uid]['instance']
+        return self.router_ip(inst_, self.master_router), self.router_ip(inst_, router_id)
 
-        to_master_interface = self.ncinst.get_ip_of_router_on_subnetwork(to_master_uid, router_id)
+    def get_routing_table(self, router_id):
+        """
+        Get the routing table of corresponding router
 
-        if to_master_interface is None:
-            raise Exception(f"Interface to master of router {router_id} should not be None")
+        The next hops are built on the first call (see build_next_hops to build them with several workers), each
+        routing table is then a direct read. On demand (e.g. with lazy hops), only the next hops of the router are
+        built, from the hops of its attached subnetworks.
 
-        routing_table['0.0.0.0/0'] = {
-            "gateway": to_master_gateway,
-            "interface": to_master_interface
-        }
+        Args:
+            router_id: The UID of the router
+
+        Returns:
+            The routing table for the router, as a RoutingTable instance
+        """
+
+        if self.next_hops is None:
+            if self.on_demand:
+                self.next_hops = {}
+            else:
+                self.build_next_hops()
+        if router_id not in self.next_hops:
+            self.next_hops[router_id] = self.next_hops_of(router_id)
+
+        return self.__routing_table(router_id, self.next_hops[router_id])
+
+    def iter_routing_tables(self, routers=None):
+        """
+        Yields the routing tables one by one, as soon as each one is ready
+
+        The next hops already built are used, the other ones are built router by router and not kept, so that only one
+        routing table is held at a time.
+
+        Args:
+            routers: The UIDs of the routers. None means every router
+
+        Returns:
+            A generator of (ROUTER_UID, ROUTING_TABLE) tuples, in the order of the routers
+        """
+
+        for router_id in (list(self.links['routers']) if routers is None else routers):
+            if self.next_hops is not None and router_id in self.next_hops:
+                yield router_id, self.__routing_table(router_id, self.next_hops[router_id])
+            else:
+                yield router_id, self.__routing_table(router_id, self.next_hops_of(router_id))
+
+    def __routing_table(self, router_id, next_hops):
+        """
+        Builds the routing table of a router
+
+        Args:
+            router_id: The UID of the router
+            next_hops: The next hops of the router, as returned by next_hops_of
+
+        Returns:
+            The routing table for the router, as a RoutingTable instance
+        """
+
+        routing_table = RoutingTable()
+        subnets_attached = self.links['routers'][router_id]
+
+        # starting off by listing attached subnets and getting their ip for this router
+        for subnet in subnets_attached:
+            inst_ = self.subnets[subnet]['instance']
+            routing_table.append(inst_.address, inst_.mask_length, *next_hops[subnet])
+
+        # getting master route
+        routing_table.append(0, 0, *self.master_route(router_id, next_hops))
 
         # now we get each non-registered-yet subnet left
-        subnets_left = [i for i in self.subnets
-                        if self.subnets[i]['instance'].uid not in subnets_done]
-        paths = self.build_paths_from_possibilites([self.master_router, router_id], subnets_left,
-                                                   subnets_attached, return_as_dict=True)
-
-        for subnet in subnets_left:
-            router = paths[subnet][0]
-            ip, subnet_id = self.try_router_connected_to_subnet(subnets_attached, router)
-            if not ip:
-                raise Exception(f"Router id {router} should have been found in at least one of the subnetworks")
-            interface = self.ncinst.get_ip_of_router_on_subnetwork(subnet_id, router_id)
-            if not interface:
-                raise Exception(f"Could not find interface of router {router_id} on subnet {subnet_id}, though the "
-                                f"router points to a gateway on this subnetwork")
-            routing_table[self.subnets[subnet]['instance'].cidr] = {
-                "gateway": ip,
-                "interface": interface
-            }
+        for subnet in self.subnets:
+            if subnet in subnets_attached:
+                continue
+            inst_ = self.subnets[subnet]['instance']
+            routing_table.append(inst_.address, inst_.mask_length, *next_hops[subnet])
 
         return routing_table
 
@@ -184,3 +416,18 @@ class RoutingTablesGenerator:
         """
 
         raise NotImplementedError
+
+
+def _next_hops_chunk(generator, destinations):
+    """
+    Builds the next hops towards a chunk of destinations in a worker process
+
+    Args:
+        generator: The (pickled) RoutingTablesGenerator instance
+        destinations: The UIDs of the destination subnetworks
+
+    Returns:
+        A list of (UID, result of next_hops_to) tuples
+    """
+
+    return [(subnet_end, generator.next_hops_to(subnet_end)) for subnet_end in destinations]
@@ -0,0 +1,149 @@
+import json
+import struct
+from enum import IntEnum
+## @package tracing
+#
+#  The package of the tracing of the Ants process: the events of a discovery, and the tracers writing them to a file.
+
+
+class TraceEvent(IntEnum):
+    """
+    The events of an ants discovery, and the integer payload of each of them
+
+    Ants are numbered by order of birth, from 0, within each discovery. UIDs of objectives missing are written as -1.
+    """
+
+    ## A discovery starts: (DISCOVERY TYPE, STARTING SUBNET, OBJECTIVE SUBNET). See discovery_types
+    Start = 0
+    ## A round starts: (ROUND, ANTS IN THE FRONTIER)
+    Round = 1
+    ## An ant is born: (ANT, MOTHER, ROUTER, SUBNET). The mother is -1 for the ants of the starting subnetwork
+    Spawn = 2
+    ## An ant moves: (ANT, HOP TYPE, UID). The hop type is 0 for a subnetwork and 1 for a router
+    Move = 3
+    ## An ant dies: (ANT,)
+    Death = 4
+    ## An ant reaches the objective, or discovers a subnetwork in an 'all' discovery: (ANT, SUBNET)
+    Objective = 5
+    ## A discovery ends: (ANTS SPAWNED, LARGEST FRONTIER)
+    End = 6
+
+
+## The number of integers in the payload of each event
+payload_sizes = {TraceEvent.Start: 3, TraceEvent.Round: 2, TraceEvent.Spawn: 4, TraceEvent.Move: 3,
+                 TraceEvent.Death: 1, TraceEvent.Objective: 2, TraceEvent.End: 2}
+
+## The discovery types, as written in the Start events
+discovery_types = ('sweep', 'find', 'all')
+
+
+class JsonlTracer:
+    """
+    Tracer writing each event as a line of JSON: [EVENT NAME, PAYLOAD...]
+
+    A tracer is called as tracer(event, *payload) by the Ants process. It can be used as a context manager, which closes
+    the file on exit.
+    """
+
+    def __init__(self, path):
+        """
+        Init
+
+        Args:
+            path: The path of the trace file, overwritten if it exists
+        """
+
+        self.file = open(path, 'w')
+
+    def __call__(self, event, *payload):
+        """
+        Writes an event
+
+        Args:
+            event: The TraceEvent
+            payload: The integers of the event
+        """
+
+        self.file.write(json.dumps([event.name, *payload]) + "\n")
+
+    def close(self):
+        """
+        Closes the trace file
+        """
+
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+class BinaryTracer(JsonlTracer):
+    """
+    Tracer writing each event as a compact binary record
+
+    The file starts with the magic bytes, then each record is the event code as an unsigned byte followed by its
+    payload as little-endian signed 32 bits integers (see payload_sizes).
+    """
+
+    ## The bytes the binary trace files start with
+    magic = b'RTGT\x01'
+
+    ## The struct of the record of each event
+    records = {event: struct.Struct(f'<B{size}i') for event, size in payload_sizes.items()}
+
+    def __init__(self, path):
+        """
+        Init
+
+        Args:
+            path: The path of the trace file, overwritten if it exists
+        """
+
+        self.file = open(path, 'wb')
+        self.file.write(self.magic)
+
+    def __call__(self, event, *payload):
+        self.file.write(self.records[event].pack(event, *payload))
+
+
+def print_tracer(event, *payload):
+    """
+    Tracer printing each event on a line, used by the debug mode of the Ants process
+
+    Args:
+        event: The TraceEvent
+        payload: The integers of the event
+    """
+
+    print(f"{event.name}: {' '.join(str(i) for i in payload)}")
+
+
+def read_trace(path):
+    """
+    Reads a trace file back, written by either a JsonlTracer or a BinaryTracer
+
+    Args:
+        path: The path of the trace file
+
+    Returns:
+        A generator of the (TraceEvent, PAYLOAD...) tuples of the events, in the order they were written
+    """
+
+    with open(path, 'rb') as file:
+        if file.read(len(BinaryTracer.magic)) != BinaryTracer.magic:
+            file.seek(0)
+            for line in file:
+                name, *payload = json.loads(line)
+                yield (TraceEvent[name], *payload)
+            return
+
+        while True:
+            code = file.read(1)
+            if not code:
+                return
+            event = TraceEvent(code[0])
+            record = BinaryTracer.records[event]
+            yield (event, *record.unpack(code + file.read(record.size - 1))[1:])
@@ -9,9 +9,8 @@ def get_master_router(routers):
         """
 
     masters = []
-    for i in range(len(routers)):
-        r = routers[i]
-        if r.internet is True:
+    for i in routers:
+        if routers[i].internet is True:
             masters.append(i)
 
     # then we check if there is no master or more than one master
@@ -92,6 +92,9 @@ def setup_package():
         install_requires=[
             "nettools",
         ],
+        extras_require={
+            "numpy": ["numpy"],
+        },
 
         classifiers=[
             'Development Status :: 5 - Production/Stable',
@@ -0,0 +1,47 @@
+import sys
+import tempfile
+import time
+from rth.core.dispatcher import Dispatcher
+
+## @package bench_exports
+#
+#  Throughput benchmark of the exporters of the routing tables. Not run with the tests.
+#
+#  Usage: python -m tests.bench_exports [SUBNETWORKS] [WORKERS]
+
+
+def ladder_network(size):
+    """
+    Builds a network of subnetworks in a line, each pair of neighbours being joined by a router
+
+    Args:
+        size: The number of subnetworks
+
+    Returns:
+        The subnetworks, routers and links data
+    """
+
+    subnetworks = {f"s{i}": f"10.{i >> 8}.{i & 255}.0/24" for i in range(size)}
+    routers = {'gw': True, **{f"r{i}": None for i in range(size - 1)}}
+    links = {'gw': {'s0': None}, **{f"r{i}": {f"s{i}": None, f"s{i + 1}": None} for i in range(size - 1)}}
+
+    return subnetworks, routers, links
+
+
+def main(size=200, workers=4):
+    inst = Dispatcher()
+    inst.execute(*ladder_network(size))
+    routes = sum(len(routing_table) for routing_table in inst.formatted_raw_routing_tables.values())
+
+    with tempfile.TemporaryDirectory() as directory:
+        for format_ in ('ip', 'frr'):
+            start = time.perf_counter()
+            inst.export_routing_tables(directory, format_=format_, workers=workers)
+            elapsed = time.perf_counter() - start
+
+            print(f"{format_:>3}: {len(inst.formatted_raw_routing_tables)} files, {routes} routes in {elapsed:.3f}s "
+                  f"({routes / elapsed:,.0f} routes/s)")
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
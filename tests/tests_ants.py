@@ -1,8 +1,19 @@
+import os
+import tempfile
 import unittest
 from rth.core.dispatcher import Dispatcher
 from rth.core.errors import UnreachableNetwork, MasterRouterError
+from rth.virtual_building.ants import AntsDiscovery, AntState, SweepAnt, FindAnt
+from rth.virtual_building.hops import PredecessorHops, LazyHops
+from rth.virtual_building.tracing import TraceEvent, JsonlTracer, BinaryTracer, read_trace
+from rth.virtual_building.utils import smaller_of_list
 import unittest.mock as m
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class MyTestCase(unittest.TestCase):
     """
@@ -250,10 +261,10 @@ class MyTestCase(unittest.TestCase):
             }
         }
 
-    def prepare_run(self, dict_entry, debug=False):
+    def prepare_run(self, dict_entry, debug=False, engine='ants', hops_storage='dict'):
 
         test = self.networks[dict_entry]
-        inst = Dispatcher(debug=debug)
+        inst = Dispatcher(debug=debug, engine=engine, hops_storage=hops_storage)
         inst.execute(test['subnets'], test['routers'], test['links'])
 
         return test["expected_hops"], inst.hops
@@ -272,6 +283,19 @@ class MyTestCase(unittest.TestCase):
     def test_crash_unreachable_network(self):
         self.assertRaises(UnreachableNetwork, lambda: self.prepare_run("unreachable"))
 
+    def test_crash_unreachable_groups(self):
+        test = self.networks["unreachable"]
+        subnets = {**test['subnets'], 'E': "172.16.0.0/24", 'F': "172.16.1.0/24", 'G': "172.16.2.0/24"}
+        links = {**test['links'], 5: {'E': None, 'F': None}, 6: {'G': None}}
+
+        with self.assertRaises(UnreachableNetwork) as error:
+            Dispatcher().execute(subnets, {**test['routers'], 5: None, 6: None}, links)
+
+        # every island is reported at once
+        self.assertEqual([['A'], ['E', 'F'], ['G']], error.exception.groups)
+        self.assertEqual(4, error.exception.total)
+        self.assertEqual('A', error.exception.name)
+
     def test_crash_no_master_router(self):
         self.assertRaises(MasterRouterError, lambda: self.prepare_run("no_master_router"))
 
@@ -310,11 +334,221 @@ class MyTestCase(unittest.TestCase):
         inst.execute(test['subnets'], test['routers'], test['links'])
         self.assertEqual(test["expected_hops"], inst.hops)
 
+    def test_debug_prints_events(self):
+        test = self.networks["multiple_choices_routers"]
+
+        for engine in ('ants', 'numpy'):
+            if engine == 'numpy' and numpy is None:
+                continue
+            with m.patch("builtins.print") as printed:
+                Dispatcher(debug=True, engine=engine).execute(test['subnets'], test['routers'], test['links'])
+
+            # only the events of the ants discoveries are printed, one per line
+            for call in printed.call_args_list:
+                name, payload = call[0][0].split(": ")
+                self.assertIn(name, TraceEvent.__members__)
+                self.assertTrue(all(i.lstrip('-').isdigit() for i in payload.split()))
+            self.assertEqual(engine == 'ants', printed.called)
+
     def test_multiple_paths(self):
 
         e, a = self.prepare_run("multiple_paths")
         self.assertEqual(e, a)
 
+    #
+    # Wide networks
+    #
+    @staticmethod
+    def wide_network(branches):
+        # A master subnetwork with as many routers as branches, each router leading to its own subnetwork
+        subnets = {'M': "10.0.0.0/16"}
+        routers = {0: True}
+        links = {0: {'M': None}}
+
+        for i in range(1, branches + 1):
+            subnets[f"L{i}"] = f"10.{i // 256 + 1}.{i % 256}.0/24"
+            routers[i] = None
+            links[i] = {'M': None, f"L{i}": None}
+
+        return subnets, routers, links
+
+    def test_wide_network(self):
+        # Used to crash with more than 100 ants alive at once
+        inst = Dispatcher()
+        inst.execute(*self.wide_network(150))
+
+        self.assertEqual(150 * 151, len(inst.hops))
+        self.assertEqual([7], inst.hops[(0, 7)])
+        self.assertEqual([7, 12], inst.hops[(7, 12)])
+
+    #
+    # Numpy engine
+    #
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_engine(self):
+        for entry in ("basic", "multiple_choices_networks", "multiple_choices_routers", "multiple_paths"):
+            e, a = self.prepare_run(entry, engine='numpy')
+            self.assertEqual(e, a, entry)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy_engine_crash_unreachable_network(self):
+        self.assertRaises(UnreachableNetwork, lambda: self.prepare_run("unreachable", engine='numpy'))
+
+    #
+    # Compact hops
+    #
+    def test_compact_hops(self):
+        for entry in ("basic", "multiple_choices_networks", "multiple_choices_routers", "multiple_paths"):
+            e, a = self.prepare_run(entry, hops_storage='array')
+            self.assertIsInstance(a, PredecessorHops)
+            self.assertEqual(e, a, entry)
+            self.assertEqual(list(e), list(a), entry)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_compact_hops_numpy(self):
+        e, a = self.prepare_run("basic", hops_storage='numpy')
+        self.assertEqual(e, a)
+
+        e, a = self.prepare_run("basic", engine='numpy', hops_storage='numpy')
+        self.assertEqual(e, a)
+
+    def test_crash_unknown_hops_storage(self):
+        self.assertRaises(ValueError, lambda: Dispatcher(hops_storage='list'))
+
+    def test_crash_unknown_engine(self):
+        self.assertRaises(ValueError, lambda: Dispatcher(engine='bees'))
+
+    #
+    # Lazy hops
+    #
+    def test_lazy_hops(self):
+        for entry in ("basic", "multiple_choices_networks", "multiple_choices_routers", "multiple_paths"):
+            e, a = self.prepare_run(entry, hops_storage='lazy')
+            self.assertIsInstance(a, LazyHops)
+            self.assertEqual(e, a, entry)
+            self.assertEqual(list(e), list(a), entry)
+
+    def test_lazy_hops_cache(self):
+        inst = Dispatcher(hops_storage='lazy', hops_cache_size=2)
+        inst.execute(*self.wide_network(5))
+        hops = inst.hops
+
+        self.assertEqual({'hits': 0, 'misses': 0, 'cache_size': 2, 'size': 0}, hops.cache_info())
+
+        self.assertEqual([2, 3], hops[(2, 3)])
+        self.assertEqual([2, 4], hops[(2, 4)])
+        self.assertEqual([3, 2], hops[(3, 2)])
+        self.assertEqual({'hits': 1, 'misses': 2, 'cache_size': 2, 'size': 2}, hops.cache_info())
+
+        # the least recently used starting subnetwork goes first
+        hops[(4, 2)]
+        self.assertEqual([3, 4], list(hops.cache))
+        hops[(2, 3)]
+        self.assertEqual({'hits': 1, 'misses': 4, 'cache_size': 2, 'size': 2}, hops.cache_info())
+
+        self.assertRaises(KeyError, lambda: hops[(2, 2)])
+        self.assertRaises(KeyError, lambda: hops[(2, 42)])
+
+    def test_crash_lazy_hops_numpy_engine(self):
+        self.assertRaises(ValueError, lambda: Dispatcher(engine='numpy', hops_storage='lazy'))
+
+    #
+    # Parallel hops
+    #
+    def test_parallel_hops(self):
+        subnets, routers, links = self.wide_network(20)
+
+        serial = Dispatcher()
+        serial.execute(subnets, routers, links)
+
+        with m.patch.object(AntsDiscovery, 'parallel_threshold', 0):
+            for hops_storage in ('dict', 'array'):
+                inst = Dispatcher(hops_storage=hops_storage)
+                inst.execute(subnets, routers, links, workers=2)
+
+                self.assertEqual(serial.hops, inst.hops, hops_storage)
+                self.assertEqual(list(serial.hops), list(inst.hops), hops_storage)
+
+    def test_crash_ants_budget(self):
+        inst = Dispatcher(max_ants=20)
+        self.assertRaises(RecursionError, lambda: inst.execute(*self.wide_network(30)))
+
+    def test_all_discovery_matches_find(self):
+        # one 'all' discovery per starting subnetwork gives the same hops as a 'find' discovery per couple
+        for name in ("basic", "multiple_choices_networks", "multiple_choices_routers", "multiple_paths"):
+            test = self.networks[name]
+            inst = Dispatcher()
+            inst.execute(test['subnets'], test['routers'], test['links'])
+            size = len(inst.gend_subnetworks)
+            self.assertEqual(size * (size - 1), len(inst.hops), name)
+
+            for (s, e), hops in inst.hops.items():
+                _, at_objective = AntsDiscovery.ants_discovery_process('find', inst.links, s, e)
+                self.assertEqual(smaller_of_list(at_objective), hops, f"{name}: {(s, e)}")
+
+            _, paths = AntsDiscovery.ants_discovery_process('all', inst.links, 0)
+            self.assertEqual({e: inst.hops[(0, e)] for e in inst.gend_subnetworks if e != 0}, paths, name)
+
+    #
+    # Ants
+    #
+    def test_ants_lineage(self):
+        ant = SweepAnt(AntState.Alive, {"router": 1, "subnet": 0})
+        ant.move_to(2)
+        ant.move_to(3)
+
+        child = SweepAnt(AntState.Waiting, {"router": 3, "subnet": 5}, ant)
+        ant.kill()
+        self.assertEqual({"subnets": [0, 2, 5], "routers": [1, 3]}, child.get_history())
+        self.assertEqual({"subnets": [0, 2], "routers": [1, 3]}, ant.get_history())
+        self.assertEqual((3, 5), (child.router, child.subnet))
+        self.assertFalse(child.check_next_move(1))
+        self.assertTrue(child.check_next_move(7))
+
+        fed = FindAnt(AntState.Waiting, {"router": 3, "subnet": 5}, 5)
+        fed.feed_history("routers", ant.get_history())
+        self.assertEqual(child.get_history(), fed.get_history())
+        self.assertTrue(fed.already_on_objective())
+        self.assertEqual([False, False], fed.check_next_move(3))
+        self.assertRaises(AttributeError, lambda: setattr(fed, 'history', {}))
+
+    def test_tracing(self):
+        # 0 -(router 0)- 1 -(router 1)- 2
+        links = {'subnets': {0: [0], 1: [0, 1], 2: [1]}, 'routers': {0: [0, 1], 1: [1, 2]}}
+        events = []
+        _, paths = AntsDiscovery.ants_discovery_process('find', links, 0, 2, tracer=lambda *e: events.append(e))
+
+        self.assertEqual([[0, 1]], paths)
+        self.assertEqual([(TraceEvent.Start, 1, 0, 2), (TraceEvent.Spawn, 0, -1, 0, 0), (TraceEvent.Round, 0, 1),
+                          (TraceEvent.Move, 0, 0, 1), (TraceEvent.Move, 0, 1, 1), (TraceEvent.Round, 1, 1),
+                          (TraceEvent.Objective, 0, 2), (TraceEvent.Death, 0), (TraceEvent.End, 1, 1)], events)
+
+        test = self.networks["multiple_choices_routers"]
+        events = []
+        inst = Dispatcher(tracer=lambda *e: events.append(e))
+        inst.execute(test['subnets'], test['routers'], test['links'])
+        self.assertEqual(test["expected_hops"], inst.hops)
+
+        # every mother is alive when giving birth, and every ant dies by the end of its discovery
+        alive = set()
+        for event, *payload in events:
+            if event == TraceEvent.Start:
+                self.assertEqual(set(), alive)
+            elif event == TraceEvent.Spawn:
+                self.assertTrue(payload[1] == -1 or payload[1] in alive)
+                alive.add(payload[0])
+            elif event == TraceEvent.Death:
+                alive.remove(payload[0])
+        self.assertEqual(set(), alive)
+        self.assertEqual(inst.stats.counters['ants'], len([e for e in events if e[0] == TraceEvent.Spawn]))
+
+        with tempfile.TemporaryDirectory() as directory:
+            for tracer in (JsonlTracer, BinaryTracer):
+                path = os.path.join(directory, tracer.__name__)
+                with tracer(path) as trace:
+                    Dispatcher(tracer=trace).execute(test['subnets'], test['routers'], test['links'])
+                self.assertEqual(events, list(read_trace(path)))
+
 
 if __name__ == '__main__':
     unittest.main()
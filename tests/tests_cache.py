@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+import unittest.mock as m
+from rth.core.dispatcher import Dispatcher
+from rth.core.cache import ResultCache
+
+
+class CacheTests(unittest.TestCase):
+    """
+    The results read from the cache are checked against a Dispatcher executed without cache.
+    """
+
+    def setUp(self) -> None:
+        self.subnets = {
+            'A': "10.0.0.0/24",
+            'B': "192.168.0.0/24",
+            'C': "192.168.1.0/24",
+            'D': "10.0.1.0/24"
+        }
+        self.routers = {1: None, 2: None, 3: None, 4: True}
+        self.links = {
+            1: {'B': "192.168.0.1", 'C': "192.168.1.1"},
+            2: {'A': "10.0.0.2", 'B': "192.168.0.2"},
+            4: {'D': "10.0.1.4"},
+            3: {'C': "192.168.1.3", 'D': "10.0.1.3"}
+        }
+
+        self.expected = Dispatcher()
+        self.expected.execute(self.subnets, self.routers, self.links)
+
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def run_cached(self, cache, **kwargs):
+        inst = Dispatcher(cache=cache, **kwargs)
+        inst.execute(self.subnets, self.routers, self.links)
+        return inst
+
+    def assertSameAsExpected(self, inst):
+        self.assertEqual(dict(self.expected.hops), dict(inst.hops))
+        self.assertEqual(self.expected.routing_tables, inst.routing_tables)
+        self.assertEqual(self.expected.formatted_raw_routing_tables, inst.formatted_raw_routing_tables)
+        self.assertEqual(self.expected.network_raw_output(), inst.network_raw_output())
+
+    def test_digest(self):
+        digest = ResultCache.digest(self.subnets, self.routers, self.links, engine='ants')
+
+        # names are compared as strings, but the order of the data changes the UIDs
+        self.assertEqual(digest, ResultCache.digest(self.subnets, {str(k): v for k, v in self.routers.items()},
+                                                    self.links, engine='ants'))
+        self.assertNotEqual(digest, ResultCache.digest(self.subnets, self.routers,
+                                                       dict(reversed(list(self.links.items()))), engine='ants'))
+        self.assertNotEqual(digest, ResultCache.digest(self.subnets, self.routers, self.links, engine='numpy'))
+
+    def test_memory_hit(self):
+        cache = ResultCache()
+        self.assertSameAsExpected(self.run_cached(cache))
+
+        with m.patch.object(Dispatcher, '_Dispatcher__flow') as flow:
+            inst = self.run_cached(cache)
+            flow.assert_not_called()
+
+        self.assertSameAsExpected(inst)
+        self.assertEqual({'memory_hits': 1, 'disk_hits': 0, 'misses': 1, 'memory_size': 32, 'size': 1},
+                         cache.cache_info())
+
+    def test_disk_hit(self):
+        self.run_cached(ResultCache(self.directory.name), hops_storage='array')
+        self.assertEqual(1, len(os.listdir(self.directory.name)))
+
+        cache = ResultCache(self.directory.name)
+        inst = self.run_cached(cache, hops_storage='array')
+
+        self.assertSameAsExpected(inst)
+        self.assertEqual(1, cache.cache_info()['disk_hits'])
+
+    def test_disk_eviction(self):
+        cache = ResultCache(self.directory.name, memory_size=1)
+        for i in range(3):
+            cache.put(str(i), bytes(1000))
+            os.utime(cache.path(str(i)), (i, i))
+
+        # the least recently used files go first
+        cache.disk_size = 2500
+        cache.evict()
+        self.assertEqual(['1.pickle', '2.pickle'], sorted(os.listdir(self.directory.name)))
+        self.assertEqual(['2'], list(cache.memory))
+        self.assertEqual(bytes(1000), cache.get('1'))
+
+    def test_corrupted_file(self):
+        cache = ResultCache(self.directory.name)
+        with open(cache.path('broken'), 'wb') as f:
+            f.write(b'\x80')
+
+        self.assertIsNone(cache.get('broken'))
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_stale_file(self):
+        cache = ResultCache(self.directory.name)
+        # a result referring to a class which does not exist anymore
+        with open(cache.path('stale'), 'wb') as f:
+            f.write(b'crth.core.cache\nRemovedClass\n.')
+
+        self.assertIsNone(cache.get('stale'))
+        self.assertEqual([], os.listdir(self.directory.name))
+        self.assertEqual(1, cache.cache_info()['misses'])
+
+        digest = ResultCache.digest(self.subnets, self.routers, self.links)
+        with m.patch.object(ResultCache, 'format_version', ResultCache.format_version + 1):
+            self.assertNotEqual(digest, ResultCache.digest(self.subnets, self.routers, self.links))
+
+    def test_change_after_hit(self):
+        cache = ResultCache()
+        self.run_cached(cache)
+        inst = self.run_cached(cache)
+
+        inst.add_link(3, 'A', "10.0.0.10")
+
+        expected = Dispatcher()
+        expected.execute(self.subnets, self.routers, {**self.links, 3: {**self.links[3], 'A': "10.0.0.10"}})
+        self.assertEqual(dict(expected.hops), dict(inst.hops))
+        self.assertEqual(expected.formatted_raw_routing_tables, inst.formatted_raw_routing_tables)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+from rth.core.dispatcher import Dispatcher
+from rth.core.errors import UnreachableNetwork, MasterRouterError, NameNotFound, WronglyFormedLinksData
+
+
+class ChangesTests(unittest.TestCase):
+    """
+    Each change is checked against a Dispatcher executed from scratch on the changed network.
+    """
+
+    def setUp(self) -> None:
+        self.subnets = {
+            'A': "10.0.0.0/24",
+            'B': "192.168.0.0/24",
+            'C': "192.168.1.0/24",
+            'D': "10.0.1.0/24"
+        }
+        self.routers = {1: None, 2: None, 3: None, 4: True}
+        # IPs are given, so that they do not depend on the order of the links
+        self.links = {
+            1: {'B': "192.168.0.1", 'C': "192.168.1.1"},
+            2: {'A': "10.0.0.2", 'B': "192.168.0.2"},
+            4: {'D': "10.0.1.4"},
+            3: {'C': "192.168.1.3", 'D': "10.0.1.3"}
+        }
+
+    def changed(self, hops_storage='dict'):
+        inst = Dispatcher(hops_storage=hops_storage)
+        inst.execute(self.subnets, self.routers, self.links)
+        return inst
+
+    def assertSameAsExecuted(self, inst, subnets, routers, links):
+        expected = Dispatcher(hops_storage=inst.hops_storage)
+        expected.execute(subnets, routers, links)
+
+        self.assertEqual(dict(expected.hops), dict(inst.hops))
+        self.assertEqual(expected.formatted_raw_routing_tables, inst.formatted_raw_routing_tables)
+
+    def test_add_link(self):
+        for hops_storage in ('dict', 'array'):
+            inst = self.changed(hops_storage)
+            inst.add_link(3, 'A', "10.0.0.10")
+
+            self.assertEqual([2], inst.hops[(3, 0)])
+            self.assertSameAsExecuted(inst, self.subnets, self.routers,
+                                      {**self.links, 3: {**self.links[3], 'A': "10.0.0.10"}})
+
+    def test_remove_link(self):
+        self.links[3]['A'] = "10.0.0.3"
+
+        for hops_storage in ('dict', 'array'):
+            inst = self.changed(hops_storage)
+            inst.remove_link(1, 'C')
+
+            self.assertEqual([1, 2], inst.hops[(1, 3)])
+            self.assertSameAsExecuted(inst, self.subnets, self.routers,
+                                      {**self.links, 1: {'B': "192.168.0.1"}})
+
+    def test_lazy_change(self):
+        inst = self.changed('lazy')
+        inst.routing_table(1)
+        inst.add_link(3, 'A', "10.0.0.10")
+
+        expected = Dispatcher()
+        expected.execute(self.subnets, self.routers, {**self.links, 3: {**self.links[3], 'A': "10.0.0.10"}})
+
+        self.assertEqual([2], inst.hops[(3, 0)])
+        self.assertEqual(expected.formatted_raw_routing_tables['1'], inst.routing_table(1))
+        self.assertEqual(dict(expected.hops), dict(inst.hops))
+
+    def test_deferred_change(self):
+        inst = Dispatcher()
+        inst.execute(self.subnets, self.routers, self.links, defer_routing_tables=True)
+        inst.routing_table(1)
+        inst.add_link(3, 'A', "10.0.0.10")
+
+        expected = Dispatcher()
+        expected.execute(self.subnets, self.routers, {**self.links, 3: {**self.links[3], 'A': "10.0.0.10"}})
+
+        self.assertEqual(dict(expected.hops), dict(inst.hops))
+        self.assertEqual({}, inst.formatted_raw_routing_tables)
+        self.assertEqual(list(expected.formatted_raw_routing_tables.items()), list(inst.iter_routing_tables()))
+
+    def test_add_remove_subnetwork(self):
+        inst = self.changed()
+        inst.add_subnetwork('E', "172.16.0.0/16", {2: "172.16.0.2"})
+
+        self.assertEqual([1], inst.hops[(4, 0)])
+        self.assertEqual([2, 0, 1], inst.hops[(3, 4)])
+        self.assertIn("172.16.0.0/16", inst.formatted_raw_routing_tables['4'])
+        self.assertSameAsExecuted(inst, {**self.subnets, 'E': "172.16.0.0/16"}, self.routers,
+                                  {**self.links, 2: {**self.links[2], 'E': "172.16.0.2"}})
+
+        inst.remove_subnetwork('E')
+        self.assertNotIn((3, 4), inst.hops)
+        self.assertSameAsExecuted(inst, self.subnets, self.routers, self.links)
+
+    def test_add_remove_router(self):
+        inst = self.changed()
+        inst.add_router(5, {'A': "10.0.0.5", 'D': "10.0.1.5"})
+
+        self.assertEqual([4], inst.hops[(0, 3)])
+        self.assertIn('5', inst.formatted_raw_routing_tables)
+        self.assertSameAsExecuted(inst, self.subnets, {**self.routers, 5: None},
+                                  {**self.links, 5: {'A': "10.0.0.5", 'D': "10.0.1.5"}})
+
+        inst.remove_router(5)
+        self.assertNotIn('5', inst.formatted_raw_routing_tables)
+        self.assertIsNone(inst.routing_tables[4])
+        self.assertEqual([1, 0, 2], inst.hops[(0, 3)])
+        self.assertSameAsExecuted(inst, self.subnets, self.routers, self.links)
+
+    #
+    # Crashes
+    #
+    def test_crash_unreachable_network(self):
+        inst = self.changed()
+
+        self.assertRaises(UnreachableNetwork, lambda: inst.remove_link(2, 'B'))
+        self.assertRaises(UnreachableNetwork, lambda: inst.remove_router(1))
+        self.assertRaises(UnreachableNetwork, lambda: inst.add_subnetwork('E', "172.16.0.0/16", {}))
+        # nothing changed
+        self.assertSameAsExecuted(inst, self.subnets, self.routers, self.links)
+
+    def test_crash_unreachable_groups(self):
+        inst = self.changed()
+
+        with self.assertRaises(UnreachableNetwork) as error:
+            inst.remove_link(2, 'B')
+        self.assertEqual([['A']], error.exception.groups)
+
+        # the same error as when executing the changed network
+        with self.assertRaises(UnreachableNetwork) as error:
+            inst.remove_router(1)
+        with self.assertRaises(UnreachableNetwork) as expected:
+            Dispatcher().execute(self.subnets, {r: self.routers[r] for r in (2, 3, 4)},
+                                 {r: self.links[r] for r in (2, 3, 4)})
+        self.assertEqual([['A', 'B']], error.exception.groups)
+        self.assertEqual(str(expected.exception), str(error.exception))
+
+    def test_crash_master_router(self):
+        inst = self.changed()
+
+        self.assertRaises(MasterRouterError, lambda: inst.add_link(4, 'A'))
+        self.assertRaises(MasterRouterError, lambda: inst.remove_router(4))
+        self.assertRaises(MasterRouterError, lambda: inst.remove_subnetwork('D'))
+
+    def test_crash_wrong_names(self):
+        inst = self.changed()
+
+        self.assertRaises(NameNotFound, lambda: inst.add_link(9, 'A'))
+        self.assertRaises(NameNotFound, lambda: inst.remove_link(1, 'A'))
+        self.assertRaises(WronglyFormedLinksData, lambda: inst.add_link(1, 'B'))
+        self.assertRaises(WronglyFormedLinksData, lambda: inst.add_router(5, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
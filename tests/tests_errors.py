@@ -56,11 +56,19 @@ class NetworkCreatorTests(unittest.TestCase):
         e = NameAlreadyExists("A random name")
         self.assertEqual("Name 'A random name' already exists", e.__str__())
 
+    def test_procerr_name_not_found(self):
+        e = NameNotFound("A random name")
+        self.assertEqual("Name 'A random name' does not exist", e.__str__())
+
     def test_procerr_unreachable_network(self):
         e = UnreachableNetwork("Random name again", "192.168.1.0/24", 3)
         self.assertEqual("The subnetwork 'Random name again' (CIDR 192.168.1.0/24) is unreachable from master router. "
                          "Total number of unreachable subnetworks: 3", e.__str__())
 
+        e = UnreachableNetwork("A", "10.0.0.0/24", 3, [['A', 'B'], ['C']])
+        self.assertEqual("The subnetwork 'A' (CIDR 10.0.0.0/24) is unreachable from master router. "
+                         "Total number of unreachable subnetworks: 3. Disconnected groups: [A, B], [C]", e.__str__())
+
 
 if __name__ == '__main__':
     unittest.main()
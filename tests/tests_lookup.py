@@ -0,0 +1,149 @@
+import random
+import unittest
+from rth.core.dispatcher import Dispatcher
+from rth.core.errors import NameNotFound
+from rth.virtual_building.ipv4 import ip_to_int, mask_length, network_bounds
+from rth.virtual_building.route_lookup import RouteTrie
+from rth.virtual_building.route_compression import compress, equivalent
+from rth.virtual_building.routing_table import RoutingTable
+
+
+class LookupTests(unittest.TestCase):
+    """
+    The lookups are checked against a scan of the routing tables.
+    """
+
+    def setUp(self) -> None:
+        self.subnets = {
+            'A': "10.0.0.0/24",
+            'B': "192.168.0.0/24",
+            'C': "192.168.1.0/24",
+            'D': "10.0.1.0/24"
+        }
+        self.routers = {1: None, 2: None, 3: None, 4: True}
+        self.links = {
+            1: {'B': "192.168.0.1", 'C': "192.168.1.1"},
+            2: {'A': "10.0.0.2", 'B': "192.168.0.2"},
+            4: {'D': "10.0.1.4"},
+            3: {'C': "192.168.1.3", 'D': "10.0.1.3"}
+        }
+
+    @staticmethod
+    def scan(routing_table, ip):
+        # the longest matching prefix, by reading every route
+        best, best_length = None, -1
+        for cidr in routing_table:
+            address, mask = cidr.split('/')
+            length = mask_length(mask)
+            start, end = network_bounds(ip_to_int(address), length)
+            if start <= ip_to_int(ip) <= end and length > best_length:
+                best, best_length = routing_table[cidr], length
+        return best
+
+    def test_trie(self):
+        table = {
+            "0.0.0.0/0": 'default',
+            "10.0.0.0/8": 'ten',
+            "10.0.0.0/24": 'ten-zero',
+            "10.0.0.128/25": 'ten-zero-high',
+            "10.1.0.0/13": 'ten-one',
+            "10.2.3.4/32": 'host',
+        }
+        trie = RouteTrie.from_routing_table(table)
+
+        self.assertEqual('ten-zero-high', trie.lookup("10.0.0.200"))
+        self.assertEqual('ten-zero', trie.lookup("10.0.0.1"))
+        self.assertEqual('ten-one', trie.lookup("10.7.255.1"))
+        self.assertEqual('ten', trie.lookup("10.8.0.1"))
+        self.assertEqual('host', trie.lookup("10.2.3.4"))
+        self.assertEqual('ten-one', trie.lookup("10.2.3.5"))
+        self.assertEqual('default', trie.lookup(ip_to_int("11.0.0.1")))
+        self.assertIsNone(RouteTrie().lookup("10.0.0.1"))
+
+        # longer prefixes win whatever the insertion order
+        reversed_trie = RouteTrie.from_routing_table(dict(reversed(list(table.items()))))
+        self.assertEqual('ten-zero-high', reversed_trie.lookup("10.0.0.200"))
+
+    def test_trie_random(self):
+        rand = random.Random(4)
+        table = {}
+        for _ in range(300):
+            length = rand.randint(1, 32)
+            start, _ = network_bounds(rand.getrandbits(32) & 0x0AFFFFFF, length)
+            table[f"{start >> 24}.{start >> 16 & 255}.{start >> 8 & 255}.{start & 255}/{length}"] = len(table)
+        trie = RouteTrie.from_routing_table(table)
+
+        for _ in range(2000):
+            ip = rand.getrandbits(32) & 0x0AFFFFFF
+            self.assertEqual(self.scan(table, ip), trie.lookup(ip), ip)
+
+    def test_dispatcher_lookup(self):
+        inst = Dispatcher()
+        inst.execute(self.subnets, self.routers, self.links)
+
+        self.assertEqual({'gateway': '192.168.0.2', 'interface': '192.168.0.1'}, inst.lookup(1, "10.0.0.42"))
+        self.assertEqual({'gateway': '192.168.1.3', 'interface': '192.168.1.1'}, inst.lookup(1, "8.8.8.8"))
+        self.assertEqual([inst.lookup(2, ip) for ip in ("10.0.1.7", "192.168.1.9")],
+                         inst.lookup_many(2, ["10.0.1.7", "192.168.1.9"]))
+
+        self.assertRaises(NameNotFound, lambda: inst.lookup(42, "10.0.0.1"))
+        self.assertRaises(ValueError, lambda: inst.lookup(1, "10.0.0"))
+
+    def test_lookup_after_change(self):
+        inst = Dispatcher()
+        inst.execute(self.subnets, self.routers, self.links)
+        self.assertEqual('192.168.1.1', inst.lookup(3, "10.0.0.1")['gateway'])
+
+        inst.add_link(3, 'A', "10.0.0.3")
+        self.assertEqual('10.0.0.3', inst.lookup(3, "10.0.0.1")['gateway'])
+        self.assertEqual(self.scan(inst.routing_table(1), "10.0.0.1"), inst.lookup(1, "10.0.0.1"))
+
+    def test_compression(self):
+        table = RoutingTable()
+        for cidr, gateway in (("10.0.0.0/24", "10.0.0.1"), ("0.0.0.0/0", "10.0.0.9"), ("10.1.0.0/24", "10.0.0.2"),
+                              ("10.1.1.0/24", "10.0.0.2"), ("10.1.2.0/23", "10.0.0.2"), ("10.2.0.0/24", "10.0.0.9")):
+            address, mask = cidr.split('/')
+            table.append(ip_to_int(address), int(mask), ip_to_int(gateway), ip_to_int("10.0.0.1"))
+
+        compressed = compress(table)
+        # the siblings are merged twice, the route of the default gateway goes
+        self.assertEqual(["10.0.0.0/24", "0.0.0.0/0", "10.1.0.0/22"], list(compressed))
+        self.assertTrue(equivalent(table, compressed))
+
+        table.append(ip_to_int("10.1.3.0"), 24, ip_to_int("10.0.0.3"), ip_to_int("10.0.0.1"))
+        self.assertFalse(equivalent(table, compressed))
+
+    def test_compression_random(self):
+        rand = random.Random(7)
+        for _ in range(50):
+            table = RoutingTable()
+            table.append(0, 0, 1, 2)
+            for _ in range(rand.randint(1, 60)):
+                length = rand.randint(16, 26)
+                start, _ = network_bounds(0x0A000000 | rand.getrandbits(12) << 8, length)
+                table.append(start, length, rand.choice((1, 3)), rand.choice((2, 4)))
+
+            compressed = compress(table)
+            self.assertLessEqual(len(compressed), len(table))
+            self.assertTrue(equivalent(table, compressed))
+            for _ in range(200):
+                ip = 0x0A000000 | rand.getrandbits(20)
+                self.assertEqual(self.scan(table, ip), self.scan(compressed, ip), ip)
+
+    def test_dispatcher_compression(self):
+        inst = Dispatcher()
+        inst.execute(self.subnets, self.routers, self.links)
+        expected = {name: routing_table.to_dict() for name, routing_table in inst.formatted_raw_routing_tables.items()}
+
+        saved = inst.compress_routing_tables(verify=True)
+        self.assertEqual(set(expected), set(saved))
+        for name in expected:
+            self.assertEqual(len(expected[name]) - saved[name], len(inst.routing_table(name)))
+            self.assertTrue(equivalent(expected[name], inst.routing_table(name)))
+        # router 1 reaches D through router 3, like the master router
+        self.assertNotIn("10.0.1.0/24", inst.routing_table(1))
+        self.assertEqual({'gateway': '192.168.1.3', 'interface': '192.168.1.1'}, inst.lookup(1, "10.0.1.4"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
+import unittest.mock as m
 from rth.virtual_building.network_creator import NetworkCreator
-from rth.core.errors import NameAlreadyExists, OverlappingError
+from rth.core.errors import NameAlreadyExists, OverlappingError, IPAlreadyAttributed, NameNotFound
+from rth.virtual_building.ipv4 import ip_to_int, int_to_ip, mask_length, AddressAllocator
 from nettools.utils.ip_class import FourBytesLiteral
 from nettools.utils.utils import Utils
+from nettools.utils.errors import IPOffNetworkRangeException
 
 
 class NetworkCreatorTests(unittest.TestCase):
@@ -67,6 +70,103 @@ class NetworkCreatorTests(unittest.TestCase):
         self.assertEqual(True, r.internet, msg="Router internet connection")
         self.assertEqual({}, r.connected_networks, msg="Router connected networks")
 
+    def test_verify_router_ips(self):
+        i = NetworkCreator()
+        i.create_network('192.168.1.0', 24, name="A")
+        i.create_router(name="r1")
+        i.create_router(name="r2")
+        i.connect_router_to_networks("r1", {"A": None})
+        i.connect_router_to_networks("r2", {"A": "192.168.1.10"})
+
+        # IPs are kept as integers, and only turned into strings for the output
+        self.assertEqual({0: ip_to_int("192.168.1.254"), 1: ip_to_int("192.168.1.10")},
+                         i.subnetworks[0]['instance'].routers)
+        self.assertEqual({0: "192.168.1.254", 1: "192.168.1.10"},
+                         i.network_raw_output()['subnets'][0]['connected_routers'])
+
+    def test_ipv4(self):
+        self.assertEqual("10.5.1.130", int_to_ip(ip_to_int("10.5.1.130")))
+        self.assertEqual(24, mask_length("255.255.255.0"))
+        self.assertEqual(24, mask_length(24))
+
+        for wrong in ("10.5.1", "10.5.1.256", "10.a.1.1", 2 ** 32):
+            self.assertRaises(ValueError, lambda: ip_to_int(wrong))
+        self.assertRaises(ValueError, lambda: mask_length("255.0.255.0"))
+
+    def test_address_allocator(self):
+        a = AddressAllocator(ip_to_int("10.0.0.0"), ip_to_int("10.0.0.15"))
+
+        self.assertEqual("10.0.0.14", int_to_ip(a.allocate()))
+        a.mark(ip_to_int("10.0.0.13"))
+        self.assertEqual(["10.0.0.12", "10.0.0.11"], [int_to_ip(ip) for ip in a.allocate_many(2)])
+
+        # released addresses are handed out again first
+        a.release(ip_to_int("10.0.0.13"))
+        self.assertEqual("10.0.0.13", int_to_ip(a.allocate()))
+        self.assertEqual({'size': 14, 'used': 4, 'free': 10, 'utilization': 4 / 14}, a.stats())
+
+        self.assertIsNone(a.allocate_many(11))
+        self.assertEqual(10, len(a.allocate_many(10)))
+        self.assertIsNone(a.allocate())
+        self.assertFalse(a.is_used(ip_to_int("10.0.0.15")))
+
+    def test_bulk_connection(self):
+        i = NetworkCreator()
+        i.create_network('10.5.0.0', 16, name="A")
+        for k in range(300):
+            i.create_router(name=f"r{k}")
+        i.connect_router_to_networks("r0", {"A": "10.5.255.253"})
+        i.connect_routers_to_network("A", [f"r{k}" for k in range(1, 300)])
+
+        routers = i.subnetworks[0]['instance'].routers
+        self.assertEqual(ip_to_int("10.5.255.254"), routers[1])
+        self.assertEqual(ip_to_int("10.5.255.252"), routers[2])
+        self.assertEqual(300, len(set(routers.values())))
+        self.assertEqual(300, i.addresses_usage()[0]['used'])
+
+        i.create_network('10.6.0.0', 30, name="B")
+        self.assertRaises(IPOffNetworkRangeException, lambda: i.connect_routers_to_network("B", ["r1", "r2", "r3"]))
+        self.assertEqual({}, i.subnetworks[1]['instance'].routers)
+
+    def test_bulk_connection_failures(self):
+        i = NetworkCreator()
+        i.create_network('10.0.0.0', 24, name="A")
+        i.create_network('10.1.0.0', 24, name="B")
+        i.create_router(True, name="master")
+        for k in range(3):
+            i.create_router(name=f"r{k}")
+        i.connect_router_to_networks("master", {"B": None})
+        i.connect_router_to_networks("r2", {"A": None})
+
+        def state():
+            return (dict(i.subnetworks[0]['instance'].routers),
+                    {uid: dict(i.routers[uid].connected_networks) for uid in i.routers}, i.addresses_usage())
+
+        before = state()
+        self.assertRaises(Exception, lambda: i.connect_routers_to_network("A", ["r0", "r1", "master"]))
+        self.assertEqual(before, state())
+        self.assertRaises(ValueError, lambda: i.connect_routers_to_network("A", ["r0", "r1", "r0"]))
+        self.assertEqual(before, state())
+        self.assertRaises(ValueError, lambda: i.connect_routers_to_network("A", ["r0", "r2"]))
+        self.assertEqual(before, state())
+        self.assertRaises(NameNotFound, lambda: i.connect_routers_to_network("A", ["r0", "r9"]))
+        self.assertEqual(before, state())
+
+        # a failure while connecting undoes the connections already made
+        connect = NetworkCreator.Router.connect
+
+        def failing_connect(router, subnet_uid, router_ip):
+            if router.name == "r1":
+                raise RuntimeError()
+            connect(router, subnet_uid, router_ip)
+
+        with m.patch.object(NetworkCreator.Router, 'connect', failing_connect):
+            self.assertRaises(RuntimeError, lambda: i.connect_routers_to_network("A", ["r0", "r1"]))
+        self.assertEqual(before, state())
+
+        i.connect_routers_to_network("A", ["r0", "r1"])
+        self.assertEqual(3, i.addresses_usage()[0]['used'])
+
     #
     # Name
     #
@@ -89,6 +189,28 @@ class NetworkCreatorTests(unittest.TestCase):
         self.assertEqual(1, i.name_to_uid('subnet', "My second network"))
         self.assertEqual("My network", i.uid_to_name('subnet', 0))
 
+    def test_name_indexes(self):
+        i = NetworkCreator()
+        i.create_network('192.168.1.0', 24, name="A")
+        i.create_network('192.168.2.0', 24, name="B")
+        i.create_router(False, name="r")
+
+        # unknown names do not silently give the UID 0
+        self.assertRaises(NameNotFound, lambda: i.name_to_uid('subnet', "C"))
+        self.assertRaises(NameNotFound, lambda: i.name_to_uid('router', "A"))
+        self.assertIsNone(i.uid_to_name('subnet', 2))
+
+        # the name of a removed subnetwork can be given again, not its UID
+        i.remove_network(0)
+        self.assertFalse(i.is_name_existing('subnet', "A"))
+        self.assertIsNone(i.uid_to_name('subnet', 0))
+        self.assertEqual(2, i.create_network('192.168.1.0', 24, name="A"))
+        self.assertEqual(2, i.name_to_uid('subnet', "A"))
+        self.assertEqual("A", i.uid_to_name('subnet', 2))
+
+        i.remove_router(0)
+        self.assertRaises(NameNotFound, lambda: i.name_to_uid('router', "r"))
+
     def test_name_routers(self):
         i = NetworkCreator()
 
@@ -126,6 +248,50 @@ class NetworkCreatorTests(unittest.TestCase):
         self.assertRaises(OverlappingError, lambda: i.create_network('10.5.0.0', 16))
         self.assertRaises(OverlappingError, lambda: i.create_network('10.5.1.0', 19))
 
+    def test_network_no_overlap(self):
+        i = NetworkCreator()
+        i.create_network('10.5.1.0', 24)
+
+        # Neighbouring networks, whatever their masks
+        i.create_network('10.5.2.0', 24)
+        i.create_network('10.6.1.128', 28)
+        i.create_network('10.5.0.0', 24)
+
+        self.assertEqual(4, len(i.subnetworks))
+
+    def test_network_overlap_index(self):
+        i = NetworkCreator()
+        for k in range(256):
+            i.create_network(f'10.5.{k}.0', 24)
+
+        self.assertRaises(OverlappingError, lambda: i.create_network('10.5.0.0', 16))
+        self.assertRaises(OverlappingError, lambda: i.create_network('10.5.255.255', 32))
+        i.create_network('10.4.255.252', 30)
+        i.create_network('10.6.0.0', 16)
+
+        # the range of a removed network is available again
+        i.remove_network(3)
+        i.create_network('10.5.3.0', 25)
+        self.assertEqual(258, len(i.ranges))
+
+    def test_wrong_router_ips(self):
+        i = NetworkCreator()
+        i.create_network('10.5.1.0', 24, name="A")
+        i.create_router(name="r1")
+        i.create_router(name="r2")
+        i.connect_router_to_networks("r1", {"A": "10.5.1.1"})
+
+        # Off the range of the subnetwork, network and broadcast addresses, wrongly formed
+        for ip in ("10.5.2.1", "10.5.1.0", "10.5.1.255", "10.5.1"):
+            self.assertRaises(IPOffNetworkRangeException, lambda: i.connect_router_to_networks("r2", {"A": ip}))
+
+        self.assertRaises(IPAlreadyAttributed, lambda: i.connect_router_to_networks("r2", {"A": "10.5.1.1"}))
+
+        # the IP of a disconnected router can be given again
+        i.remove_router(0)
+        i.connect_router_to_networks("r2", {"A": "10.5.1.1"})
+        self.assertEqual({ip_to_int("10.5.1.1"): 1}, i.subnetworks[0]['instance'].assigned)
+
     def test_master_router_multiple_connections(self):
         i = NetworkCreator()
         network_1_id = i.create_network("10.5.1.0", 24)
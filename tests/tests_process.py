@@ -1,5 +1,13 @@
+import io
+import os
+import pickle
+import tempfile
 import unittest
+import unittest.mock as m
 from rth.core.dispatcher import Dispatcher
+from rth.virtual_building.ants import AntsDiscovery
+from rth.virtual_building.routing_tables_generator import RoutingTablesGenerator
+from rth.virtual_building.routing_table import RoutingTable
 
 
 class ProcessTests(unittest.TestCase):
@@ -343,6 +351,184 @@ class ProcessTests(unittest.TestCase):
             if self.debug_print:
                 print(f'Passed {n["name"]}')
 
+    def test_4_compact_hops(self):
+        for number in self.networks:
+            n = self.networks[number]
+
+            inst = Dispatcher(hops_storage='array')
+            inst.execute(n['subnets'], n['routers'], n['links'])
+
+            for router in n['expected_result']:
+                self.assertEqual(n['expected_result'][router], inst.formatted_raw_routing_tables[str(router)],
+                                 f'{n["name"]} : Compact hops table : router {router}')
+
+    def test_5_default_route_to_master(self):
+        # Router 'r' shares the subnetwork of the master router, its default route must point to the master router
+        inst = Dispatcher()
+        inst.execute(
+            {'A': "10.0.0.0/24", 'B': "10.0.1.0/24"},
+            {'r': None, 'x': None, 'gw': True},
+            {
+                'r': {'A': "10.0.0.2", 'B': "10.0.1.2"},
+                'x': {'B': "10.0.1.3"},
+                'gw': {'B': "10.0.1.1"}
+            }
+        )
+
+        self.assertEqual({'gateway': '10.0.1.1', 'interface': '10.0.1.2'},
+                         inst.formatted_raw_routing_tables['r']['0.0.0.0/0'])
+        self.assertEqual({'gateway': '10.0.1.2', 'interface': '10.0.1.3'},
+                         inst.formatted_raw_routing_tables['x']['10.0.0.0/24'])
+
+    @m.patch.object(RoutingTablesGenerator, 'parallel_threshold', 0)
+    @m.patch.object(AntsDiscovery, 'parallel_threshold', 0)
+    def test_6_parallel_routing_tables(self):
+        for number in self.networks:
+            n = self.networks[number]
+
+            inst = Dispatcher()
+            inst.execute(n['subnets'], n['routers'], n['links'], workers=2)
+
+            self.assertEqual(n['instance'].routing_tables, inst.routing_tables, f'{n["name"]} : Parallel tables')
+            for router in n['expected_result']:
+                self.assertEqual(n['expected_result'][router], inst.formatted_raw_routing_tables[str(router)],
+                                 f'{n["name"]} : Parallel table : router {router}')
+
+    def test_7_lazy_routing_tables(self):
+        for number in self.networks:
+            n = self.networks[number]
+
+            inst = Dispatcher(hops_storage='lazy')
+            inst.execute(n['subnets'], n['routers'], n['links'])
+
+            for router in n['expected_result']:
+                self.assertEqual(n['expected_result'][router], inst.routing_table(router),
+                                 f'{n["name"]} : Lazy table : router {router}')
+
+    def test_8_lazy_single_routing_table(self):
+        n = self.networks[1]
+        router = next(iter(n['expected_result']))
+
+        inst = Dispatcher(hops_storage='lazy')
+        inst.execute(n['subnets'], n['routers'], n['links'])
+        inst.routing_table(router)
+
+        # only the discoveries from the subnetworks attached to the router ran
+        self.assertEqual(len(n['links'][router]), inst.hops.cache_info()['misses'])
+        self.assertEqual([str(router)], list(inst.formatted_raw_routing_tables))
+
+        # the other ones are calculated as they are iterated, and not kept
+        self.assertEqual(list(n['instance'].formatted_raw_routing_tables.items()), list(inst.iter_routing_tables()))
+        self.assertEqual([str(router)], list(inst.formatted_raw_routing_tables))
+
+    def test_9_addresses_usage(self):
+        inst = Dispatcher()
+        inst.execute({'A': "10.0.0.0/24", 'B': "10.0.1.0/30"}, {'r': None, 'gw': True},
+                     {'r': {'A': None, 'B': None}, 'gw': {'B': None}})
+
+        self.assertEqual({'A': {'size': 254, 'used': 1, 'free': 253, 'utilization': 1 / 254},
+                          'B': {'size': 2, 'used': 2, 'free': 0, 'utilization': 1.0}}, inst.addresses_usage())
+
+    def test_10_rendering(self):
+        n = self.networks[1]
+        inst = n['instance']
+
+        with tempfile.TemporaryDirectory() as directory:
+            inst.output_routing_tables(os.path.join(directory, "output.txt"))
+            with open(os.path.join(directory, "output.txt"), encoding="utf-8") as f:
+                written = f.read().split("\n")
+
+        displayed = io.StringIO()
+        with m.patch("sys.stdout", displayed):
+            inst.display_routing_tables()
+        displayed = displayed.getvalue().split("\n")
+
+        # the same lines, but for the wording of the paths and the blank line before each router
+        self.assertEqual(len(inst.formatted_raw_routing_tables), len(written) - len(displayed))
+        self.assertEqual(displayed[1].replace("From subnetwork", "Subnet").replace("to subnetwork", "to subnet"),
+                         written[1])
+        self.assertEqual([line for line in displayed if line.startswith("  - ")],
+                         [line for line in written if line.startswith("  - ")])
+        self.assertIn("  - 0.0.0.0/0           : ", [line[:26] for line in written])
+
+    def test_11_iter_routing_tables(self):
+        for number in self.networks:
+            n = self.networks[number]
+            expected = list(n['instance'].formatted_raw_routing_tables.items())
+
+            self.assertEqual(expected, list(n['instance'].iter_routing_tables()), f'{n["name"]} : Iterated tables')
+
+            for hops_storage in ('dict', 'array'):
+                inst = Dispatcher(hops_storage=hops_storage)
+                inst.execute(n['subnets'], n['routers'], n['links'], defer_routing_tables=True)
+
+                self.assertEqual({}, inst.formatted_raw_routing_tables)
+                self.assertEqual(expected, list(inst.iter_routing_tables()), f'{n["name"]} : Deferred tables')
+                self.assertIsNone(inst._Dispatcher__generator_instance.next_hops)
+
+    def test_12_compact_routing_tables(self):
+        for number in self.networks:
+            n = self.networks[number]
+            inst = n['instance']
+
+            for router in n['expected_result']:
+                table = inst.formatted_raw_routing_tables[str(router)]
+                self.assertIsInstance(table, RoutingTable)
+
+                # read like the dictionary, and exported to it on request
+                self.assertEqual(n['expected_result'][router], table.to_dict())
+
+                # in the order of the routes: attached subnetworks, master route, then the other subnetworks by UID
+                uid = next(u for u in inst.gend_routers if str(inst.gend_routers[u].name) == str(router))
+                attached = list(inst.links['routers'][uid])
+                order = [inst.gend_subnetworks[s]['instance'].cidr for s in attached] + ['0.0.0.0/0'] + \
+                        [inst.gend_subnetworks[s]['instance'].cidr for s in inst.gend_subnetworks if s not in attached]
+                self.assertEqual(order, list(table))
+                self.assertEqual([(cidr, n['expected_result'][router][cidr]) for cidr in order], list(table.items()))
+                self.assertEqual(table, pickle.loads(pickle.dumps(table)))
+                self.assertRaises(KeyError, lambda: table["1.2.3.0/24"])
+
+    def test_13_exports(self):
+        inst = Dispatcher()
+        inst.execute(
+            {'A': "10.0.0.0/24", 'B': "10.0.1.0/24"},
+            {'r': None, 'x': None, 'gw': True},
+            {
+                'r': {'A': "10.0.0.2", 'B': "10.0.1.2"},
+                'x': {'B': "10.0.1.3"},
+                'gw': {'B': "10.0.1.1"}
+            }
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = inst.export_routing_tables(os.path.join(directory, "ip"), workers=2)
+            self.assertEqual([os.path.join(directory, "ip", f"{name}.batch") for name in ('r', 'x', 'gw')], paths)
+            with open(paths[0], encoding="utf-8") as f:
+                self.assertEqual(["# Routes of router r", "route replace 0.0.0.0/0 via 10.0.1.1"],
+                                 f.read().splitlines())
+            with open(paths[1], encoding="utf-8") as f:
+                self.assertIn("route replace 10.0.0.0/24 via 10.0.1.2", f.read().splitlines())
+
+            paths = inst.export_routing_tables(directory, format_='frr')
+            with open(paths[2], encoding="utf-8") as f:
+                # the master router only has attached subnetworks
+                self.assertEqual(["! Static routes of router gw", "!", "ip route 10.0.0.0/24 10.0.1.2", "!"],
+                                 f.read().splitlines())
+
+        self.assertRaises(ValueError, inst.export_routing_tables, "", format_='cisco')
+
+    def test_14_exports_network_addresses(self):
+        inst = Dispatcher()
+        inst.execute({'A': "10.0.0.5/24", 'B': "10.0.1.0/24"}, {'r': None, 'gw': True},
+                     {'r': {'A': "10.0.0.2", 'B': "10.0.1.2"}, 'gw': {'B': "10.0.1.1"}})
+
+        with tempfile.TemporaryDirectory() as directory:
+            for format_, line in (('ip', "route replace 10.0.0.0/24 via 10.0.1.2"),
+                                  ('frr', "ip route 10.0.0.0/24 10.0.1.2")):
+                paths = inst.export_routing_tables(directory, format_=format_)
+                with open(paths[1], encoding="utf-8") as f:
+                    self.assertIn(line, f.read().splitlines())
+
 
 if __name__ == '__main__':
     unittest.main()
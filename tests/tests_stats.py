@@ -0,0 +1,115 @@
+import os
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from rth.core.dispatcher import Dispatcher
+from rth.core.cache import ResultCache
+from rth.core.stats import Stats
+
+
+def busy(seconds):
+    end = time.process_time() + seconds
+    while time.process_time() < end:
+        pass
+
+
+class StatsTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.subnets = {
+            'A': "10.0.0.0/24",
+            'B': "192.168.0.0/24",
+            'C': "192.168.1.0/24",
+            'D': "10.0.1.0/24"
+        }
+        self.routers = {1: None, 2: None, 3: None, 4: True}
+        self.links = {
+            1: {'B': "192.168.0.1", 'C': "192.168.1.1"},
+            2: {'A': "10.0.0.2", 'B': "192.168.0.2"},
+            4: {'D': "10.0.1.4"},
+            3: {'C': "192.168.1.3", 'D': "10.0.1.3"}
+        }
+
+    def test_measure(self):
+        stats = Stats(trace_memory=True)
+        for _ in range(2):
+            with stats.measure('build'):
+                kept = [bytearray(1 << 16)]
+        del kept
+
+        self.assertEqual(['build'], list(stats.stages))
+        self.assertEqual(2, stats.stages['build']['calls'])
+        self.assertGreaterEqual(stats.stages['build']['peak_memory'], 1 << 16)
+        self.assertGreaterEqual(stats.stages['build']['wall'], 0)
+
+        with self.assertRaises(KeyError):
+            with Stats().measure('failing'):
+                raise KeyError()
+
+    def test_dispatcher_stats(self):
+        inst = Dispatcher()
+        inst.execute(self.subnets, self.routers, self.links)
+        stats = inst.stats.as_dict()
+
+        self.assertEqual(['checks', 'virtual_network', 'hops', 'routing_tables'], list(stats['stages']))
+        self.assertIsNone(stats['stages']['hops']['peak_memory'])
+        self.assertEqual(4, stats['counters']['subnetworks'])
+        self.assertEqual(4, stats['counters']['discoveries'])
+        self.assertEqual(12, stats['counters']['hops'])
+        self.assertEqual(4, stats['counters']['routing_tables'])
+        self.assertGreater(stats['counters']['ants'], 0)
+        self.assertGreater(stats['counters']['max_frontier'], 0)
+
+        inst.add_link(3, 'A', "10.0.0.3")
+        self.assertEqual(1, inst.stats.stages['change']['calls'])
+
+    def test_dispatcher_stats_caches(self):
+        cache = ResultCache()
+        for _ in range(2):
+            inst = Dispatcher(cache=cache, trace_memory=True)
+            inst.execute(self.subnets, self.routers, self.links)
+
+        self.assertEqual(['cache_lookup'], list(inst.stats.stages))
+        self.assertIsNotNone(inst.stats.stages['cache_lookup']['peak_memory'])
+        self.assertEqual(1, inst.stats.counters['result_cache_hits'])
+
+        inst = Dispatcher(hops_storage='lazy')
+        inst.execute(self.subnets, self.routers, self.links)
+        list(inst.iter_routing_tables())
+        self.assertGreater(inst.stats.counters['hops_cache_misses'], 0)
+
+    @unittest.skipIf(os.name == 'nt', "Windows does not report the CPU time of the worker processes")
+    def test_measure_workers(self):
+        stats = Stats()
+        with stats.measure('pool'):
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                list(executor.map(busy, [0.2, 0.2]))
+
+        self.assertGreaterEqual(stats.stages['pool']['cpu'], 0.3)
+
+    def test_dispatcher_stats_snapshot(self):
+        inst = Dispatcher()
+        inst.execute(self.subnets, self.routers, self.links)
+        stats = inst.stats
+
+        self.assertIsNot(stats, inst.stats)
+        self.assertEqual(stats.as_dict(), inst.stats.as_dict())
+
+        inst.add_link(3, 'A', "10.0.0.3")
+        self.assertNotIn('change', stats.stages)
+        self.assertEqual(4, stats.counters['discoveries'])
+        self.assertIn('change', inst.stats.stages)
+
+    def test_prometheus(self):
+        inst = Dispatcher(trace_memory=True)
+        inst.execute(self.subnets, self.routers, self.links)
+        lines = inst.stats.to_prometheus().splitlines()
+
+        self.assertIn("# TYPE rth_stage_wall_seconds gauge", lines)
+        self.assertIn("# HELP rth_ants Number of ants spawned", lines)
+        self.assertIn("rth_routers 4", lines)
+        self.assertEqual(4, len([line for line in lines if line.startswith('rth_stage_peak_memory_bytes{stage="')]))
+
+
+if __name__ == '__main__':
+    unittest.main()